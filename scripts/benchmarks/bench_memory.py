@@ -0,0 +1,92 @@
+# Memory benchmark for the loaded catalog and quests, reported as bytes per entity.
+#
+# The data is parsed and built while tracemalloc is running, then the raw JSON is dropped,
+# so the numbers are what a long-lived process keeps hold of after loading.
+#
+# Usage: python scripts/benchmarks/bench_memory.py [--items N [N ...]]
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import generateWikiArticleTemplate as wiki
+import quests
+import synthetic
+from wiki_metadata import WikiMetadata
+
+
+def build(texts):
+    """Parse the JSON texts and build the catalog and quests from them, dropping the raw data."""
+    data, marketplace_data, wiki_data, quest_data = (json.loads(text) for text in texts)
+    wiki_metadata = WikiMetadata(wiki_data)
+    catalog = wiki.build_catalog(data, marketplace_data, wiki_metadata)
+    catalog.attach_quests(quests.QuestRegistry(quests.build_quest(quest, wiki_metadata) for quest in quest_data))
+    return catalog
+
+
+def measure(texts):
+    """Build the catalog with tracemalloc running.
+
+    Returns the catalog, the bytes still allocated once the raw data is gone, and the peak.
+    """
+    gc.collect()
+    tracemalloc.start()
+    catalog = build(texts)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return catalog, retained, peak
+
+
+def instance_sizes():
+    """Get the size of a single instance of each model, not counting the values it points to."""
+    records = {
+        'Item': wiki.Item(1, 'Sample Hat', 'A hat.', 'ACCESSORY', 40, 'RARE', [], 'uuid'),
+        'Recipe': wiki.Recipe('Sample Hat', ['Smooth Silk'], [], ''),
+        'Source': wiki.Source('Mystery Box'),
+        'MarketplaceItem': wiki.MarketplaceItem('Sample Hat', 'Accessories', 500),
+        'Quest': quests.Quest(quest_name='Sample Quest'),
+        'QuestRequiredItem': quests.QuestRequiredItem('id', 5, 'Sample Hat'),
+        'QuestReward': quests.QuestReward('id', 'item', 'Sample Hat', 1),
+    }
+    return {name: sys.getsizeof(record) + (sys.getsizeof(record.__dict__) if hasattr(record, '__dict__') else 0)
+            for name, record in records.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the memory held by the loaded catalog and quests.')
+    parser.add_argument('--items', type=int, nargs='+', default=[436, 100000], help='The item counts to measure at.')
+    args = parser.parse_args()
+
+    print('Instance sizes')
+    for name, size in instance_sizes().items():
+        print(f'{name:>20}: {size} bytes')
+    print()
+
+    real = synthetic.load_real_data()
+    real_item_count = len(real[0]['items'])
+
+    for item_count in args.items:
+        copies = synthetic.copies_for(item_count, real_item_count)
+        texts = [json.dumps(content) for content in synthetic.synthetic_data(*real, copies)]
+
+        catalog, retained, peak = measure(texts)
+        entities = (len(catalog.items) + len(catalog.recipes) + len(catalog.sources)
+                    + len(catalog.marketplace_items) + len(catalog.marketplace_recipes) + len(catalog.quests))
+
+        print(f'{len(catalog.items)} items ({copies} copies of the real data)')
+        print(f'  {catalog} {len(catalog.quests)} quests.')
+        print(f'  retained: {retained / 1024 / 1024:.2f} MiB, peak while loading: {peak / 1024 / 1024:.2f} MiB')
+        print(f'  {retained / len(catalog.items):.0f} bytes per item, {retained / entities:.0f} bytes per entity ({entities} entities)')
+
+        del catalog
+        gc.collect()
+
+
+if __name__ == '__main__':
+    main()
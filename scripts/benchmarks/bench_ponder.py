@@ -0,0 +1,69 @@
+# Micro-benchmark comparing the batch ponder against checking every recipe one inventory at a time.
+#
+# The inventories are random: each holds a few dozen of the items the recipes use, a few of each.
+# The one-at-a-time check does what the userscript's Ponder does for each recipe, with counts, and
+# is timed on a sample and scaled up, as it's far too slow to run on every inventory.
+#
+# Usage: python scripts/benchmarks/bench_ponder.py [--inventories N] [--sample N]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+import ponder
+
+
+def random_inventories(matrix, count, items_each=40, seed=0):
+    """Make an inventory matrix of random inventories with the matrix's columns."""
+    rng = np.random.default_rng(seed)
+    inventory = np.zeros((count, len(matrix.items)), dtype=np.int32)
+    rows = np.repeat(np.arange(count), items_each)
+    columns = rng.integers(0, len(matrix.items), size=count * items_each)
+    np.add.at(inventory, (rows, columns), rng.integers(1, 4, size=count * items_each, dtype=np.int32))
+    return inventory
+
+
+def ponder_one(recipes, counts):
+    """Work out how many times one inventory can craft each recipe, one recipe at a time."""
+    crafts = []
+    for recipe in recipes:
+        if not recipe.ingredients or any(counts.get(tool, 0) <= 0 for tool in recipe.tools):
+            crafts.append(0)
+            continue
+        crafts.append(min(counts.get(name, 0) // recipe.ingredients.count(name) for name in recipe.ingredients))
+    return crafts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the batch ponder against checking one inventory at a time.')
+    parser.add_argument('--inventories', type=int, default=100000, help='The number of inventories to ponder.')
+    parser.add_argument('--sample', type=int, default=2000, help='The number of inventories to check one at a time.')
+    args = parser.parse_args()
+
+    matrix = ponder.RecipeMatrix.load()
+    inventory = random_inventories(matrix, args.inventories)
+    print(f'{matrix}, {args.inventories} inventories')
+
+    start = time.perf_counter()
+    result = matrix.ponder(inventory)
+    batch_seconds = time.perf_counter() - start
+    print(f'{"batch ponder":>16}: {batch_seconds:.3f}s ({batch_seconds / args.inventories * 1e6:.2f} us per inventory)')
+
+    sample = inventory[:args.sample]
+    start = time.perf_counter()
+    expected = [ponder_one(matrix.recipes, {matrix.items[column]: int(row[column]) for column in np.flatnonzero(row)}) for row in sample]
+    one_seconds = time.perf_counter() - start
+    print(f'{"one at a time":>16}: {one_seconds / len(sample) * args.inventories:.3f}s estimated '
+          f'({one_seconds / len(sample) * 1e6:.2f} us per inventory, timed on {len(sample)})')
+
+    print(f'Outputs match: {np.array_equal(result.crafts[:args.sample], np.array(expected))}')
+    print(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Micro-benchmark comparing the compiled Template engine against the old replace_text() path.
+#
+# Usage: python scripts/benchmarks/bench_templates.py [--number N]
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import generateWikiArticleTemplate as wiki
+
+
+def sample_values():
+    """Build a set of placeholder values roughly the size of a real item page."""
+    cards = ''.join(
+        wiki.card_template.render(NAME=f'Ingredient {i}', IMAGE=f'Ingredient_{i}', NAMEHYPHENED=f'Ingredient_{i}')
+        for i in range(6)
+    )
+    return {
+        'AAN': 'an',
+        'NAME': 'Sample Hat',
+        'ID': 123,
+        'NAMEHYPHENED': 'Sample_Hat',
+        'RARITY': 'Rare',
+        'TYPE': 'Accessory',
+        'TYPES': 'Accessories',
+        'DESCRIPTION': 'A hat that is mostly brim, with a small feather tucked into the band.',
+        'PROMOCATEGORY': '',
+        'EXTRACATEGORIES': '[[Category:Hats]]',
+        'VALUE': '40 MP',
+        'DROPS': 'Yes',
+        'FOUNDIN': 'Mystery Box, Marketplace',
+        'FOUNDINBLOCK': '<div class="card-container left-align">' + cards[:200] + '\n</div>',
+        'HAS_RECIPE': 'Yes',
+        'RECIPEBLOCK': '== Recipe ==\n\n=== Ingredients ===\n\n<div class="card-container left-align">' + cards + '\n</div>\n\n',
+        'USAGEBLOCK': '== Used In ==\n\n=== Recipes ===\n\n<div class="card-container left-align">' + cards + '\n</div>\n\n',
+        'TRIVIATEXT': '* One fact.\n* Another fact.',
+        'GALLERYITEMS': '',
+        'APPEARANCEBODY': '',
+    }
+
+
+def render_with_replace_text(template, values):
+    """Render the page the way replace_template() used to, one re.sub per placeholder."""
+    page = template.text
+    for key, value in values.items():
+        page = wiki.replace_text(page, f'<{key}>', value)
+    return re.sub(r'\n{3,}', '\n\n', page)
+
+
+def render_with_template(template, values):
+    """Render the page with the compiled template in a single pass."""
+    return template.render(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare template rendering strategies.')
+    parser.add_argument('--number', type=int, default=20000, help='The number of renders to time.')
+    args = parser.parse_args()
+
+    template = wiki.itemPageTemplate
+    values = sample_values()
+
+    for name, function in [('replace_text', render_with_replace_text), ('Template.render', render_with_template)]:
+        seconds = timeit.timeit(lambda: function(template, values), number=args.number)
+        print(f'{name:>16}: {seconds:.3f}s for {args.number} renders ({seconds / args.number * 1e6:.1f} us each)')
+
+    print(f'Outputs match: {render_with_replace_text(template, values) == render_with_template(template, values)}')
+
+    # the old path treats backslashes in the values as regex escapes
+    values['DESCRIPTION'] = 'A hat with a C:\\path\\to\\file in its description.'
+    try:
+        mangled = values['DESCRIPTION'] not in render_with_replace_text(template, values)
+        print(f'replace_text mangles backslashes: {mangled}')
+    except re.error as e:
+        print(f'replace_text fails on backslashes: {e}')
+    print(f'Template.render keeps backslashes: {values["DESCRIPTION"] in render_with_template(template, values)}')
+
+
+if __name__ == '__main__':
+    main()
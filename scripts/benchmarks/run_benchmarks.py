@@ -0,0 +1,316 @@
+# Benchmark runner that times every stage of the wiki build on synthetic data at several scales.
+#
+# Each scale runs in its own process, in a scratch folder holding that scale's data files and
+# wiki output, so the real wiki is never touched. A scale that runs past the timeout is stopped
+# and the stage it was on is reported as timed out, which shows which stage breaks first.
+#
+# Peak memory is measured with tracemalloc, which slows down allocation-heavy stages.
+# Pass --no-tracemalloc for clean timings.
+#
+# Usage:
+#   python scripts/benchmarks/run_benchmarks.py --scales 1 10 100 --save-baseline baseline.json
+#   python scripts/benchmarks/run_benchmarks.py --scales 1 10 100 --baseline baseline.json
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import instrumentation
+import synthetic
+
+default_scales = [1, 10, 100, 1000]
+
+# the stages in the order __main__ and quests.py run them
+stage_names = [
+    'load_wiki_metadata',
+    'load_data',
+    'load_quests',
+    'validate_data',
+    'build_recipe_graph',
+    'generate_wiki_articles',
+    'build_views',
+    'generate_recipe_table',
+    'generate_cards_lists',
+    'generate_page_tables',
+    'generate_loot_pages',
+    'generate_sources_json',
+    'sort_quests',
+    'create_quest_pages',
+]
+
+
+class StageTimer:
+    """A class to run the stages of one scale and record how long each one takes.
+
+    Attributes
+        results : dict
+            The result of each stage run so far, keyed by stage name.
+        results_path : str
+            The file each result is appended to as a JSON line, so the parent process
+            keeps the finished stages if this one is stopped.
+        use_tracemalloc : bool
+            Whether to record the peak memory of each stage.
+    """
+    def __init__(self, results_path, use_tracemalloc=True):
+        self.results = {}
+        self.results_path = results_path
+        self.use_tracemalloc = use_tracemalloc
+
+    def run(self, name, function):
+        """Run a stage with its console output hidden, recording its time and peak memory."""
+        self._record(name, {'status': 'running'})
+
+        if self.use_tracemalloc:
+            tracemalloc.reset_peak()
+        snapshot = dict(instrumentation.counters)
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                value = function()
+            status = 'ok'
+        except Exception as e:
+            value = None
+            status = f'error: {type(e).__name__}: {e}'
+
+        result = {
+            'status': status,
+            'seconds': time.perf_counter() - start,
+            'cpu_seconds': time.process_time() - cpu_start,
+            'counters': instrumentation.counters_since(snapshot),
+        }
+        if self.use_tracemalloc:
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        self._record(name, result)
+        return value
+
+    def _record(self, name, result):
+        self.results[name] = result
+        with open(self.results_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'stage': name, **result}) + '\n')
+
+
+def run_stages(root, results_path, use_tracemalloc=True):
+    """Run every stage against the data in root/data, writing the wiki to root/wiki.
+
+    This is run in a child process, one per scale.
+    """
+    import generateWikiArticleTemplate as wiki
+    import quests
+    from recipe_graph import RecipeGraph
+    from wiki_metadata import WikiMetadata
+
+    # point the generator at the scratch folder, which is laid out like the repo
+    os.makedirs(os.path.join(root, 'scripts'), exist_ok=True)
+    os.makedirs(os.path.join(root, 'wiki'), exist_ok=True)
+    os.chdir(root)
+    wiki.script_dir = os.path.join(root, 'scripts')
+    wiki.data_path = os.path.join(root, 'data', 'MoonbouncePlus.json')
+    wiki.marketplace_data_path = os.path.join(root, 'data', 'marketplace.json')
+    wiki.wiki_data_path = os.path.join(root, 'data', 'wiki_data.json')
+    wiki.quests_data_path = quests.quests_data_path = os.path.join(root, 'data', 'quests.json')
+    quests.wiki_path = os.path.join(root, 'wiki')
+
+    # the stages' progress messages are hidden anyway, so don't spend time on them
+    instrumentation.log.level = instrumentation.WARNING
+
+    if use_tracemalloc:
+        tracemalloc.start()
+    timer = StageTimer(results_path, use_tracemalloc)
+
+    # the generators read the catalog, items and sources from module globals, as __main__ sets them
+    wiki_metadata = timer.run('load_wiki_metadata', lambda: WikiMetadata.load(wiki.wiki_data_path))
+    if wiki_metadata is None:
+        return
+    catalog = timer.run('load_data', lambda: wiki.load_data(wiki.data_path, wiki.marketplace_data_path, wiki_metadata))
+    if catalog is None:
+        return
+    wiki.catalog = catalog
+    wiki.items, wiki.sources = catalog.items, catalog.sources
+
+    registry = timer.run('load_quests', lambda: quests.load_quests(wiki.quests_data_path, wiki_metadata))
+    if registry is not None:
+        catalog.attach_quests(registry)
+    wiki.build_slug_table(catalog)
+    timer.run('validate_data', lambda: wiki.validate_catalog(catalog, wiki_metadata))
+    # timed apart from the build, so the articles stay comparable with runs that don't have the Total Materials section
+    values = {item.name: item.value for item in catalog.items}
+    timer.run('build_recipe_graph', lambda: RecipeGraph(catalog.recipes, values).bills())
+
+    timer.run('generate_wiki_articles', lambda: wiki.generate_wiki_articles(catalog.items))
+    views = timer.run('build_views', lambda: wiki.CatalogViews(catalog.items, catalog.recipes))
+    if views is None:
+        return
+
+    timer.run('generate_recipe_table', lambda: wiki.generate_recipe_table(views))
+
+    catalog.items.sort(key=lambda x: x.name)
+
+    timer.run('generate_cards_lists', lambda: wiki.generate_cards_lists(views))
+    timer.run('generate_page_tables', lambda: wiki.generate_page_tables(views))
+    timer.run('generate_loot_pages', lambda: wiki.generate_loot_pages(views))
+    timer.run('generate_sources_json', lambda: wiki.generate_sources_json(catalog.items, catalog.sources))
+
+    if registry is not None:
+        sorted_quests = timer.run('sort_quests', lambda: quests.sort_quests(registry))
+        if sorted_quests is not None:
+            timer.run('create_quest_pages', lambda: quests.create_quest_pages(sorted_quests, registry=registry))
+
+
+def run_scale(scale, data_root, timeout, use_tracemalloc):
+    """Write the data for a scale if needed, then run its stages in a child process.
+
+    Returns the result of each stage, keyed by stage name.
+    """
+    root = os.path.join(data_root, f'{scale}x')
+    data_dir = os.path.join(root, 'data')
+    if not os.path.exists(os.path.join(data_dir, 'quests.json')):
+        print(f'Writing {scale}x data to {data_dir}')
+        synthetic.write_synthetic_data(data_dir, scale)
+
+    shutil.rmtree(os.path.join(root, 'wiki'), ignore_errors=True)
+    results_path = os.path.join(root, 'results.jsonl')
+    if os.path.exists(results_path):
+        os.remove(results_path)
+
+    command = [sys.executable, __file__, '--child', root, results_path]
+    if not use_tracemalloc:
+        command.append('--no-tracemalloc')
+
+    timed_out = False
+    try:
+        subprocess.run(command, timeout=timeout, check=False)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+
+    results = {}
+    if os.path.exists(results_path):
+        with open(results_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                results[entry.pop('stage')] = entry
+
+    for name, result in results.items():
+        if result['status'] == 'running':
+            result['status'] = 'timeout' if timed_out else 'crashed'
+            result['seconds'] = None
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Compare the results against a baseline, returning the stages that got slower than the threshold allows.
+
+    Stages that took under a twentieth of a second in the baseline are too noisy to compare.
+    """
+    regressions = []
+    for scale, stages in results.items():
+        for name, result in stages.items():
+            before = baseline.get(scale, {}).get(name)
+            if not before or not before.get('seconds') or before['seconds'] < 0.05:
+                continue
+            if result.get('seconds') is None:
+                regressions.append((scale, name, None))
+                continue
+            ratio = result['seconds'] / before['seconds']
+            if ratio > threshold:
+                regressions.append((scale, name, ratio))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    """Print a table of the results, with the change from the baseline if there is one."""
+    print(f'{"scale":>6} {"stage":<28} {"seconds":>9} {"cpu":>9} {"peak MiB":>9} {"vs base":>8}  status')
+    for scale, stages in results.items():
+        for name in stage_names:
+            result = stages.get(name)
+            if result is None:
+                continue
+
+            seconds = result.get('seconds')
+            cpu_seconds = result.get('cpu_seconds')
+            peak = result.get('peak_bytes')
+            change = ''
+            before = (baseline or {}).get(scale, {}).get(name)
+            if before and before.get('seconds') and seconds is not None:
+                change = f'{seconds / before["seconds"]:.2f}x'
+
+            print(f'{scale:>6} {name:<28} {_cell(seconds, ".3f")} {_cell(cpu_seconds, ".3f")} '
+                  f'{_cell(peak / 1024 / 1024 if peak is not None else None, ".1f")} {change:>8}  {result["status"]}')
+
+
+def _cell(value, format_spec):
+    return f'{"-" if value is None else format(value, format_spec):>9}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time every stage of the wiki build on synthetic data.')
+    parser.add_argument('--scales', type=int, nargs='+', default=default_scales, help='The multiples of the real data to run at.')
+    parser.add_argument('--data-dir', help='A folder to keep the synthetic data in between runs. A temporary folder is used if not given.')
+    parser.add_argument('--timeout', type=float, default=600, help='The most seconds to spend on each scale.')
+    parser.add_argument('--no-tracemalloc', action='store_true', help="Don't record peak memory, for clean timings.")
+    parser.add_argument('--output', help='Write the results to a JSON file.')
+    parser.add_argument('--save-baseline', help='Write the results to a JSON file to compare later runs against.')
+    parser.add_argument('--baseline', help='Compare the results against a baseline written by --save-baseline.')
+    parser.add_argument('--threshold', type=float, default=1.25, help='How many times slower a stage can get before it counts as a regression.')
+    parser.add_argument('--child', nargs=2, metavar=('ROOT', 'RESULTS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    use_tracemalloc = not args.no_tracemalloc
+
+    if args.child:
+        run_stages(*args.child, use_tracemalloc=use_tracemalloc)
+        return
+
+    data_root = args.data_dir or tempfile.mkdtemp(prefix='moonbounce-bench-')
+    try:
+        results = {}
+        for scale in args.scales:
+            print(f'Running {scale}x ...')
+            results[str(scale)] = run_scale(scale, data_root, args.timeout, use_tracemalloc)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_root, ignore_errors=True)
+
+    report = {
+        'settings': {'tracemalloc': use_tracemalloc, 'python': sys.version.split()[0], 'timeout': args.timeout},
+        'results': results,
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline_report = json.load(f)
+        if baseline_report['settings'].get('tracemalloc') != use_tracemalloc:
+            print('Warning: the baseline was recorded with different tracemalloc settings, so the timings are not comparable.')
+        baseline = baseline_report['results']
+
+    print()
+    print_results(results, baseline)
+
+    for path in [args.output, args.save_baseline]:
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=4)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print()
+            for scale, name, ratio in regressions:
+                slower = 'did not finish' if ratio is None else f'{ratio:.2f}x slower'
+                print(f'Regression at {scale}x: {name} {slower}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
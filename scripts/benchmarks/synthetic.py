@@ -0,0 +1,211 @@
+# Synthetic data for the benchmarks, made by copying the real data files over and over with renamed entries.
+#
+# Every copy keeps the shape of the real data: the same recipes, drops, marketplace entries,
+# wiki data and quest chains, pointing at the renamed items of that copy.
+#
+# Usage: python scripts/benchmarks/synthetic.py --scale 10 --output path/to/data
+
+import argparse
+import copy
+import json
+import os
+import shutil
+import tempfile
+
+data_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+data_file_names = ['MoonbouncePlus.json', 'marketplace.json', 'wiki_data.json', 'quests.json']
+
+# the arrays in each data file, in the order they're written, as (file name, keys of the array)
+data_file_sections = [
+    ('MoonbouncePlus.json', ('items',)),
+    ('MoonbouncePlus.json', ('recipes',)),
+    ('marketplace.json', ('marketplace', 'items')),
+    ('marketplace.json', ('marketplace', 'recipes')),
+    ('wiki_data.json', ('items',)),
+    ('wiki_data.json', ('quests',)),
+    ('wiki_data.json', ('sources',)),
+    ('quests.json', ()),
+]
+
+
+def load_real_data(directory=data_dir):
+    """Load the real data files.
+
+    Returns the item data, marketplace data, wiki data and quest data, as loaded from JSON.
+    """
+    loaded = []
+    for file_name in data_file_names:
+        with open(os.path.join(directory, file_name), 'r', encoding='utf-8') as f:
+            loaded.append(json.load(f))
+    return tuple(loaded)
+
+
+def copies_for(item_count, real_item_count):
+    """Get the number of copies of the real data needed to reach at least item_count items."""
+    return max(1, -(-item_count // real_item_count))
+
+
+def synthetic_copy(data, marketplace_data, wiki_data, quest_data, index):
+    """Make one renamed copy of the real data.
+
+    The copy with index 0 keeps the original names, so it is the real data.
+
+    Returns a dict of the copied entries of each section, keyed like data_file_sections.
+    """
+    rename = _renamer(index)
+    item_count = len(data['items'])
+    sections = {}
+
+    items = []
+    for item in data['items']:
+        new_item = dict(item, name=rename(item['name']), sources=[rename(name) for name in item['sources']])
+        new_item['id'] = item['id'] + index * item_count if isinstance(item['id'], int) else item['id']
+        items.append(new_item)
+    sections['MoonbouncePlus.json', ('items',)] = items
+
+    sections['MoonbouncePlus.json', ('recipes',)] = [
+        dict(
+            recipe,
+            result=rename(recipe['result']),
+            ingredients=[rename(name) for name in recipe['ingredients']],
+            tools=[rename(name) for name in recipe['tools']],
+        )
+        for recipe in data['recipes']
+    ]
+
+    for section in ['items', 'recipes']:
+        sections['marketplace.json', ('marketplace', section)] = [
+            dict(entry, name=rename(entry['name'])) for entry in marketplace_data['marketplace'][section]
+        ]
+
+    for section in ['items', 'quests', 'sources']:
+        sections['wiki_data.json', (section,)] = [
+            dict(copy.deepcopy(entry), name=rename(entry['name'])) for entry in wiki_data[section]
+        ]
+
+    quests = []
+    for quest in quest_data:
+        new_quest = copy.deepcopy(quest)
+        new_quest['quest_id'] = rename(quest['quest_id'])
+        new_quest['quest_name'] = rename(quest['quest_name'])
+        new_quest['prerequisites'] = [rename(quest_id) for quest_id in quest['prerequisites']]
+        for entry in (new_quest['required_items'] or []) + (new_quest['rewards'] or []):
+            if entry['item_name']:
+                entry['item_name'] = rename(entry['item_name'])
+        quests.append(new_quest)
+    sections['quests.json', ()] = quests
+
+    return sections
+
+
+def synthetic_data(data, marketplace_data, wiki_data, quest_data, copies):
+    """Repeat the real data a number of times, renaming every item, source and quest in each copy.
+
+    Returns the item data, marketplace data, wiki data and quest data, shaped like the real files.
+    """
+    new_data = {'items': [], 'recipes': []}
+    new_marketplace = {'marketplace': {'items': [], 'recipes': []}}
+    new_wiki = {'items': [], 'quests': [], 'sources': []}
+    new_quests = []
+
+    targets = {
+        ('MoonbouncePlus.json', ('items',)): new_data['items'],
+        ('MoonbouncePlus.json', ('recipes',)): new_data['recipes'],
+        ('marketplace.json', ('marketplace', 'items')): new_marketplace['marketplace']['items'],
+        ('marketplace.json', ('marketplace', 'recipes')): new_marketplace['marketplace']['recipes'],
+        ('wiki_data.json', ('items',)): new_wiki['items'],
+        ('wiki_data.json', ('quests',)): new_wiki['quests'],
+        ('wiki_data.json', ('sources',)): new_wiki['sources'],
+        ('quests.json', ()): new_quests,
+    }
+    for index in range(copies):
+        for section, entries in synthetic_copy(data, marketplace_data, wiki_data, quest_data, index).items():
+            targets[section].extend(entries)
+
+    return new_data, new_marketplace, new_wiki, new_quests
+
+
+def write_synthetic_data(directory, copies, real_data=None):
+    """Write the four data files for a number of copies of the real data to a folder.
+
+    Each copy is written as soon as it's made, so even the largest scales never hold
+    more than one copy in memory.
+    """
+    if real_data is None:
+        real_data = load_real_data()
+    os.makedirs(directory, exist_ok=True)
+
+    parts_dir = tempfile.mkdtemp(prefix='synthetic-', dir=directory)
+    try:
+        parts = {section: open(os.path.join(parts_dir, f'{index}.json'), 'w', encoding='utf-8')
+                 for index, section in enumerate(data_file_sections)}
+        try:
+            for index in range(copies):
+                for section, entries in synthetic_copy(*real_data, index).items():
+                    part = parts[section]
+                    for entry in entries:
+                        part.write(',\n' if part.tell() else '\n')
+                        part.write(json.dumps(entry, ensure_ascii=False))
+        finally:
+            for part in parts.values():
+                part.close()
+
+        for file_name in data_file_names:
+            # lay the parts out under their keys, e.g. {'marketplace': {'items': part, 'recipes': part}}
+            layout = None
+            for index, (section_file, keys) in enumerate(data_file_sections):
+                if section_file != file_name:
+                    continue
+                part_path = os.path.join(parts_dir, f'{index}.json')
+                if not keys:
+                    layout = part_path
+                    continue
+                node = layout if layout is not None else {}
+                layout = node
+                for key in keys[:-1]:
+                    node = node.setdefault(key, {})
+                node[keys[-1]] = part_path
+
+            with open(os.path.join(directory, file_name), 'w', encoding='utf-8') as f:
+                _write_layout(f, layout)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+
+def _write_layout(f, layout):
+    """Write nested objects whose leaves are the paths of written array parts."""
+    if isinstance(layout, dict):
+        f.write('{')
+        for index, (key, value) in enumerate(layout.items()):
+            if index > 0:
+                f.write(', ')
+            f.write(f'{json.dumps(key)}: ')
+            _write_layout(f, value)
+        f.write('}')
+        return
+
+    f.write('[')
+    with open(layout, 'r', encoding='utf-8') as part:
+        shutil.copyfileobj(part, f)
+    f.write('\n]')
+
+
+def _renamer(index):
+    if index == 0:
+        return lambda name: name
+    return lambda name: f'{name} {index}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write synthetic data files made of renamed copies of the real data.')
+    parser.add_argument('--scale', type=int, default=10, help='The number of copies of the real data to write.')
+    parser.add_argument('--output', required=True, help='The folder to write the data files to.')
+    args = parser.parse_args()
+
+    write_synthetic_data(args.output, args.scale)
+    print(f'Wrote {args.scale}x the real data to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# Dependency tracking for incremental wiki builds
+
+import hashlib
+import json
+import os
+
+
+def hash_content(content):
+    """Hash any JSON-serialisable content into a short, stable hex digest."""
+    encoded = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+class DependencyGraph:
+    """A class to track which inputs each output is rendered from.
+
+    Inputs are named by keys such as 'item:Wizard Hat' or 'recipe:Wizard Hat:0', and
+    outputs by their path relative to the wiki folder. The graph is kept in both
+    directions so a changed input can be mapped straight to the outputs it affects.
+
+    Attributes
+        inputs : dict
+            The content hash of each input, keyed by input key.
+        dependencies : dict
+            The set of input keys each output depends on, keyed by output.
+        dependents : dict
+            The set of outputs that depend on each input, keyed by input key.
+    """
+    def __init__(self):
+        self.inputs = {}
+        self.dependencies = {}
+        self.dependents = {}
+
+    def add_input(self, key, content):
+        """Record an input and the content it hashes to."""
+        self.inputs[key] = hash_content(content)
+
+    def add_output(self, output, keys):
+        """Record an output and the input keys it depends on."""
+        dependencies = self.dependencies.setdefault(output, set())
+        for key in keys:
+            dependencies.add(key)
+            self.dependents.setdefault(key, set()).add(output)
+
+    def output_hash(self, output):
+        """Get the combined hash of every input an output depends on."""
+        return hash_content(sorted((key, self.inputs.get(key)) for key in self.dependencies[output]))
+
+    def invalidated_by(self, keys):
+        """Get every output that depends on any of the given input keys."""
+        outputs = set()
+        for key in keys:
+            outputs |= self.dependents.get(key, set())
+        return outputs
+
+    def __str__(self):
+        return f'{len(self.inputs)} inputs and {len(self.dependencies)} outputs.'
+
+
+class BuildManifest:
+    """A class to record the inputs of the last build, so the next build can skip unchanged outputs.
+
+    Attributes
+        path : str
+            The path of the manifest file.
+        inputs : dict
+            The content hash of each input from the last build.
+        outputs : dict
+            The combined input hash of each output from the last build.
+        dependents : dict
+            The outputs that depended on each input in the last build. This lets an
+            edit invalidate outputs that no longer depend on the input, such as the
+            "Used In" section of an ingredient that was removed from a recipe.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.inputs = {}
+        self.outputs = {}
+        self.dependents = {}
+
+    @classmethod
+    def load(cls, path):
+        """Load the manifest from the path, or start an empty one if it doesn't exist."""
+        manifest = cls(path)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            manifest.inputs = data.get('inputs', {})
+            manifest.outputs = data.get('outputs', {})
+            manifest.dependents = data.get('dependents', {})
+        return manifest
+
+    def changed_inputs(self, graph):
+        """Get the input keys that were added, removed or changed since the last build."""
+        changed = {key for key, digest in graph.inputs.items() if self.inputs.get(key) != digest}
+        changed |= set(self.inputs) - set(graph.inputs)
+        return changed
+
+    def dirty_outputs(self, graph, root=None):
+        """Get the outputs that need to be rendered again.
+
+        Args:
+            graph (DependencyGraph): The dependency graph of the current build.
+            root (str): The folder the outputs are written to. If given, outputs whose
+                file has gone missing are rendered again too.
+        """
+        changed = self.changed_inputs(graph)
+
+        # walk the reverse dependencies of both this build and the last one
+        dirty = graph.invalidated_by(changed)
+        for key in changed:
+            dirty.update(self.dependents.get(key, []))
+
+        for output in graph.dependencies:
+            if output not in self.outputs or self.outputs[output] != graph.output_hash(output):
+                dirty.add(output)
+            elif root and not os.path.exists(os.path.join(root, output)):
+                dirty.add(output)
+
+        # outputs that are no longer produced can't be rendered
+        return {output for output in dirty if output in graph.dependencies}
+
+    def update(self, graph):
+        """Replace the recorded state with the state of the current build."""
+        self.inputs = dict(graph.inputs)
+        self.outputs = {output: graph.output_hash(output) for output in graph.dependencies}
+        self.dependents = {key: sorted(outputs) for key, outputs in graph.dependents.items()}
+
+    def save(self):
+        """Write the manifest to its path."""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'inputs': self.inputs, 'outputs': self.outputs, 'dependents': self.dependents}, f, indent=4, sort_keys=True)
+
+    def __str__(self):
+        return f'{len(self.outputs)} outputs recorded in {self.path}'
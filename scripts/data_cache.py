@@ -0,0 +1,158 @@
+# A warm-start cache for the built catalog, so unchanged data files aren't parsed and rebuilt on every run
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+
+def file_hash(path):
+    """Hash a file's contents into a short hex digest."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    """Get the modification time, size and content hash of a file."""
+    stat = os.stat(path)
+    return {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': file_hash(path)}
+
+
+def code_version(paths):
+    """Hash the source files that define the cached objects, along with the Python version.
+
+    Any change to the classes or the code that builds them gives a new version, so a
+    cache written by older code is never loaded.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{sys.version_info.major}.{sys.version_info.minor}:{pickle.HIGHEST_PROTOCOL}'.encode())
+    for path in paths:
+        digest.update(file_hash(path).encode())
+    return digest.hexdigest()
+
+
+class DataCache:
+    """A class to cache fully built objects as pickles, invalidated when the files they were built from change.
+
+    Each entry is two files in the cache folder: <name>.pickle holds the objects and
+    <name>.meta.json holds the code version and the fingerprint of each source file.
+    A file whose modification time and size are unchanged is trusted without reading it.
+    Otherwise its hash is checked, so rewriting a file with the same contents keeps the
+    entry valid.
+
+    Attributes
+        directory : str
+            The folder the cache files are kept in.
+        version : str
+            The version of the code that builds the objects. Entries from other versions are ignored.
+    """
+    def __init__(self, directory, version=''):
+        self.directory = directory
+        self.version = version
+
+    def load(self, name, paths):
+        """Load a cached entry if it was built from the current contents of the paths.
+
+        Returns the cached objects, or None if the entry is missing or out of date.
+        """
+        meta_path, pickle_path = self._paths(name)
+        if not os.path.exists(meta_path) or not os.path.exists(pickle_path):
+            return None
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if meta.get('version') != self.version:
+            return None
+
+        files = meta.get('files', {})
+        if sorted(files) != sorted(os.path.abspath(path) for path in paths):
+            return None
+
+        refreshed = False
+        for path, recorded in files.items():
+            if not os.path.exists(path):
+                return None
+
+            stat = os.stat(path)
+            if stat.st_mtime_ns == recorded['mtime'] and stat.st_size == recorded['size']:
+                continue
+
+            # the file was touched or rewritten, so only a content change counts
+            if stat.st_size != recorded['size'] or file_hash(path) != recorded['hash']:
+                return None
+            recorded['mtime'] = stat.st_mtime_ns
+            refreshed = True
+
+        try:
+            with open(pickle_path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+
+        # remember the new modification times so the files aren't hashed again next time
+        if refreshed:
+            self._write_meta(meta_path, meta)
+
+        return value
+
+    def store(self, name, paths, value, fingerprints=None):
+        """Cache the objects built from the paths.
+
+        Args:
+            name (str): The name of the entry.
+            paths (list): The files the objects were built from.
+            value: The objects to cache.
+            fingerprints (dict): The fingerprint of each file, keyed by absolute path, taken
+                before the objects were built. Taken now if not given.
+        """
+        meta_path, pickle_path = self._paths(name)
+        os.makedirs(self.directory, exist_ok=True)
+
+        # drop the old metadata first, so a run killed mid-write can't pair it with the new pickle
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        temp_path = pickle_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, pickle_path)
+
+        if fingerprints is None:
+            fingerprints = {os.path.abspath(path): file_fingerprint(path) for path in paths}
+        meta = {'version': self.version, 'files': fingerprints}
+        self._write_meta(meta_path, meta)
+
+    def load_or_build(self, name, paths, build):
+        """Load a cached entry, or call build() and cache what it returns.
+
+        Returns the objects and whether they came from the cache.
+        """
+        value = self.load(name, paths)
+        if value is not None:
+            return value, True
+
+        # fingerprint the files before building, so an edit made mid-build isn't cached as seen
+        fingerprints = {os.path.abspath(path): file_fingerprint(path) for path in paths}
+        value = build()
+        self.store(name, paths, value, fingerprints)
+        return value, False
+
+    def _paths(self, name):
+        return os.path.join(self.directory, f'{name}.meta.json'), os.path.join(self.directory, f'{name}.pickle')
+
+    def _write_meta(self, meta_path, meta):
+        temp_path = meta_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=4, sort_keys=True)
+        os.replace(temp_path, meta_path)
+
+    def __str__(self):
+        return f'Data cache in {self.directory}'
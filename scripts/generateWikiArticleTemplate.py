@@ -1,11 +1,25 @@
+import argparse
+import hashlib
+import itertools
 import json
 import os
 import re
-import requests
-import time
+import sys
 
 # import Quests from ../quests/quests.py
 import quests
+from build_manifest import BuildManifest, DependencyGraph
+from data_cache import DataCache, code_version
+import instrumentation
+from instrumentation import DEBUG, counters, counters_since, log
+from recipe_graph import RecipeGraph
+from records import Immutable, intern_name, intern_names
+from streaming import SpillStore, iter_json_array
+import output_writer
+from output_writer import output
+from templating import FragmentCache, Template
+from validation import ValidationError, ValidationReport
+from wiki_metadata import WikiMetadata, normalize_name
 
         
 # Initialize the path to the JSON file
@@ -13,10 +27,25 @@ script_dir = os.path.dirname(__file__)
 data_path = os.path.join(script_dir, '..', 'data', 'MoonbouncePlus.json')
 marketplace_data_path = os.path.join(script_dir, '..', 'data', 'marketplace.json')
 quests_data_path = os.path.join(script_dir, '..', 'data', 'quests.json')
+wiki_data_path = os.path.join(script_dir, '..', 'data', 'wiki_data.json')
+cache_path = os.path.join(script_dir, '..', '.cache')
+wiki_path = os.path.join(script_dir, '..', 'wiki')
+manifest_path = os.path.join(wiki_path, '.build_manifest.json')
 
 recipes_enabled = True
 usages_enabled = True
+total_materials_enabled = False
 timeout = 10
+fragment_cache_size = 8192
+
+# the page name of every name in the loaded catalog, filled by build_slug_table()
+slugs = {}
+
+# the cards shown on many pages, rendered once each
+fragments = FragmentCache(fragment_cache_size)
+
+# the raw materials of every recipe, built by build_recipe_graph() when the Total Materials section is enabled
+recipe_graph = None
 
 #region Classes
 class Item:
@@ -40,14 +69,16 @@ class Item:
         uuid : str
             The UUID of the item's image.
     """
+    __slots__ = ('id', 'name', 'description', 'type', 'value', 'rarity', 'sources', 'uuid',
+                 'promo', 'trivia', 'categories', 'gallery', 'appearance', 'name_formatted')
     
     def __init__(self, id, name, description, type, value, rarity, sources, uuid=None):
         self.id = id
-        self.name = name
+        self.name = intern_name(name)
         self.description = description
-        self.type = type.lower().capitalize()
+        self.type = intern_name(type.lower().capitalize())
         self.value = value
-        self.rarity = rarity.lower().capitalize()
+        self.rarity = intern_name(rarity.lower().capitalize())
         self.sources = sources
         self.uuid = uuid
         
@@ -63,29 +94,31 @@ class Item:
     def __str__(self):
         return f'# {self.id} - {self.name} [{self.type}] [{self.rarity}]'
     
-class Recipe:
+class Recipe(Immutable):
     """A class to represent a recipe in Moonbounce.
     
     Attributes
         result : str
             The name of the item that the recipe creates.
-        ingredients : list
-            A list of ingredients required for the recipe.
-        tools : list
-            A list of tools required for the recipe.
+        ingredients : tuple
+            The ingredients required for the recipe.
+        tools : tuple
+            The tools required for the recipe.
         type : str
             The type of the recipe. (Seasonal, Event, etc.)
     """
+    __slots__ = ('result', 'ingredients', 'tools', 'type')
+    
     def __init__(self, result, ingredients, tools, type):
-        self.result = result
-        self.ingredients = ingredients
-        self.tools = tools
-        self.type = type
+        self._set('result', intern_name(result))
+        self._set('ingredients', intern_names(ingredients))
+        self._set('tools', intern_names(tools))
+        self._set('type', intern_name(type))
         
     def __str__(self):
         inputs = self.ingredients + self.tools
         
-        return f'# {self.id} - {self.result} [{"+".join(inputs)}]'
+        return f'{self.result} [{"+".join(inputs)}]'
 
 class Source:
     """A class to represent a source where an item can be found.
@@ -94,8 +127,10 @@ class Source:
         name : str
             The name of the source.
     """
+    __slots__ = ('name', 'name_formatted', 'drops', 'is_quest', 'promo', 'trivia', 'categories')
+    
     def __init__(self, name):
-        self.name = name
+        self.name = intern_name(name)
         self.name_formatted = format_name(name)
         self.drops = []
         self.is_quest = False
@@ -116,6 +151,8 @@ class Marketplace:
         recipes : list
             A list of recipes that can be purchased in the marketplace.
     """
+    __slots__ = ('items', 'recipes')
+    
     def __init__(self, items, recipes):
         self.items = items
         self.recipes = recipes
@@ -123,13 +160,164 @@ class Marketplace:
     def __str__(self):
         return f'{len(self.items)} items in the marketplace.'
 
-class MarketplaceItem:
+class MarketplaceItem(Immutable):
     """A class to represent an item in the marketplace."""
+    __slots__ = ('name', 'section', 'cost', 'info')
+    
     def __init__(self, name, section, cost, info=None):
-        self.name = name
-        self.section = section
-        self.cost = cost,
-        self.info = info
+        self._set('name', intern_name(name))
+        self._set('section', intern_name(section))
+        self._set('cost', cost)
+        self._set('info', info)
+
+class Catalog:
+    """A class to hold the loaded data along with hash indexes for fast lookups.
+    
+    Every generator reads from the catalog instead of scanning the raw lists, so
+    building the wiki stays linear in the size of the data.
+    
+    Attributes
+        items : list
+            A list of all the items.
+        recipes : list
+            A list of all the recipes.
+        sources : list
+            A list of all the sources, including the Marketplace.
+        marketplace_items : list
+            A list of the items that can be bought in the marketplace.
+        marketplace_recipes : list
+            A list of the recipes that can be bought in the marketplace.
+    """
+    def __init__(self, items, recipes, sources, marketplace_items=None, marketplace_recipes=None):
+        self.items = items
+        self.recipes = recipes
+        self.sources = sources
+        self.marketplace_items = marketplace_items if marketplace_items is not None else []
+        self.marketplace_recipes = marketplace_recipes if marketplace_recipes is not None else []
+        
+        # item indexes, keeping the first item when a key appears more than once
+        self.items_by_name = {}
+        self.items_by_id = {}
+        self.items_by_slug = {}
+        for item in items:
+            self.items_by_name.setdefault(item.name, item)
+            self.items_by_id.setdefault(item.id, item)
+            self.items_by_slug.setdefault(item.name_formatted, item)
+        
+        # recipe indexes, each list kept in the same order as the recipes list
+        self.recipes_by_result = {}
+        self.recipes_by_ingredient = {}
+        self.recipes_by_tool = {}
+        self.recipes_by_usage = {}
+        for recipe in recipes:
+            self.recipes_by_result.setdefault(recipe.result, []).append(recipe)
+            for ingredient in dict.fromkeys(recipe.ingredients):
+                self.recipes_by_ingredient.setdefault(ingredient, []).append(recipe)
+                self.recipes_by_usage.setdefault(ingredient, []).append(recipe)
+            for tool in dict.fromkeys(recipe.tools):
+                self.recipes_by_tool.setdefault(tool, []).append(recipe)
+                self.recipes_by_usage.setdefault(tool, []).append(recipe)
+        
+        self.marketplace_by_name = {}
+        for mp_item in self.marketplace_items:
+            self.marketplace_by_name.setdefault(mp_item.name, mp_item)
+        
+        self.sources_by_name = {}
+        for source in sources:
+            self.sources_by_name.setdefault(source.name, source)
+        
+        self.quests = []
+        self.quests_by_reward = {}
+        self.quests_by_requirement = {}
+        
+    def attach_quests(self, registry):
+        """Attach the quests, using the registry's indexes of the items they reward and require.
+        
+        Args:
+            registry (quests.QuestRegistry): The quests, as returned by quests.load_quests().
+        """
+        self.quests = registry.quests
+        self.quests_by_reward = registry.rewarding
+        self.quests_by_requirement = registry.requiring
+    
+    def get_item(self, name):
+        """Get the item with the given name, or None if there isn't one."""
+        counters['index_hits'] += 1
+        return self.items_by_name.get(name)
+    
+    def has_recipe(self, name):
+        """Check if there is a recipe that creates the named item."""
+        counters['index_hits'] += 1
+        return name in self.recipes_by_result
+    
+    def recipes_for(self, name):
+        """Get the recipes that create the named item."""
+        counters['index_hits'] += 1
+        return self.recipes_by_result.get(name, [])
+    
+    def recipes_using(self, name):
+        """Get the recipes that use the named item as an ingredient or a tool."""
+        counters['index_hits'] += 1
+        return self.recipes_by_usage.get(name, [])
+    
+    def quests_rewarding(self, name):
+        """Get the quests that reward the named item."""
+        counters['index_hits'] += 1
+        return self.quests_by_reward.get(name, [])
+    
+    def quests_requiring(self, name):
+        """Get the quests that require the named item, once per requirement."""
+        counters['index_hits'] += 1
+        return self.quests_by_requirement.get(name, [])
+    
+    def __str__(self):
+        return f'{len(self.items)} items, {len(self.recipes)} recipes and {len(self.sources)} sources.'
+
+class CatalogViews:
+    """A class to hold the items and recipes partitioned and sorted the ways the generators show them.
+    
+    The items are sorted by name once and partitioned in a single pass, so each
+    partition comes out sorted by name without sorting it again.
+    
+    Attributes
+        by_type : dict
+            The items of each type, keyed by the lower case type and sorted by name.
+        by_rarity : dict
+            The items of each rarity, keyed by the lower case rarity and sorted by name.
+        by_rank : list
+            Every item sorted by rarity, then by name.
+        characters_by_id : list
+            The characters sorted by their numeric id, then by name.
+        recipes_by_type : dict
+            The recipes of each type, keyed by type in the order of the recipes list.
+        recipe_types : list
+            The recipe types in the order the recipe table shows them.
+    """
+    def __init__(self, items, recipes):
+        self.by_type = {}
+        self.by_rarity = {}
+        for item in sorted(items, key=lambda x: x.name):
+            self.by_type.setdefault(item.type.lower(), []).append(item)
+            self.by_rarity.setdefault(item.rarity.lower(), []).append(item)
+        
+        # sorting is stable, so items of the same rank stay in name order
+        self.by_rank = []
+        for rarity in sorted(self.by_rarity, key=lambda x: rarity_order[x]):
+            self.by_rank += self.by_rarity[rarity]
+        
+        self.characters_by_id = sorted(self.by_type.get('character', []), key=lambda x: int(x.id))
+        
+        self.recipes_by_type = {}
+        for recipe in recipes:
+            self.recipes_by_type.setdefault(recipe.type, []).append(recipe)
+        self.recipe_types = sort_recipe_types(self.recipes_by_type)
+    
+    def items_of_type(self, item_type):
+        """Get the items of a type, sorted by name."""
+        return self.by_type.get(item_type, [])
+    
+    def __str__(self):
+        return f'{sum(len(items) for items in self.by_type.values())} items in {len(self.by_type)} types and {len(self.recipe_types)} recipe types.'
 
 #endregion
 
@@ -143,6 +331,9 @@ type_to_types_dict = {
     "unknown": "Unknown"
 }
 
+# the types that get pages, as unknown items are only listed
+page_types = [item_type for item_type in type_to_types_dict if item_type != 'unknown']
+
 # Reference to rarity order
 rarity_order = {
     "common": 1,
@@ -156,7 +347,7 @@ rarity_order = {
 
 #region Item Page Templates
 
-itemPageTemplate = """\
+itemPageTemplate = Template("""\
 [[Category:<TYPES>]][[Category:Items]][[Category:<RARITY>]]<PROMOCATEGORY><EXTRACATEGORIES>
 {{Infobox
 | name = <NAME>
@@ -183,6 +374,8 @@ The '''<NAME>''' is <AAN> [[<TYPE>]] in Moonbounce.
 
 <RECIPEBLOCK>
 
+<TOTALMATERIALSBLOCK>
+
 <USAGEBLOCK>
 
 == Trivia ==
@@ -195,9 +388,9 @@ The '''<NAME>''' is <AAN> [[<TYPE>]] in Moonbounce.
 <NAMEHYPHENED>.png | <NAME> item sprite
 <GALLERYITEMS>
 </gallery>
-"""
+""", collapse_blank_lines=True)
 
-characterTemplate = """\
+characterTemplate = Template("""\
 [[Category:Character]][[Category:Items]][[Category:<RARITY>]]<PROMOCATEGORY><EXTRACATEGORIES>
 {{Infobox
 | name = <NAME>
@@ -226,6 +419,8 @@ characterTemplate = """\
 
 <RECIPEBLOCK>
 
+<TOTALMATERIALSBLOCK>
+
 == Trivia ==
 
 <TRIVIATEXT>
@@ -236,12 +431,12 @@ characterTemplate = """\
 <NAMEHYPHENED>.png | <NAME> item sprite
 <GALLERYITEMS>
 </gallery>
-"""
+""", collapse_blank_lines=True)
 
 #endregion
 
 #region Main Page Templates
-accessoriesPageTableTemplate = """\
+accessoriesPageTableTemplate = Template("""\
 == Alternative Sortable Table ==
 {| class="wikitable sortable mw-collapsible mw-collapsed"
 |+
@@ -250,16 +445,16 @@ accessoriesPageTableTemplate = """\
 !Rarity
 |-<ITEMS>
 |}
-"""
+""")
 
-accessoriesPageTableItemTemplate = """
+accessoriesPageTableItemTemplate = Template("""
 |[[File:<NAMEFORMATTED>.png|frameless|80x80px|link=<NAME>]]
 |[[<NAME>]]
 |<RARITY>
-|-"""
+|-""")
 
 
-materialsPageTableTemplate = """\
+materialsPageTableTemplate = Template("""\
 == Alternative Sortable Table ==
 {| class="wikitable sortable mw-collapsible mw-collapsed"
 |+
@@ -268,15 +463,15 @@ materialsPageTableTemplate = """\
 !Rarity
 |-<ITEMS>
 |}
-"""
+""")
 
-materialsPageTableItemTemplate = """
+materialsPageTableItemTemplate = Template("""
 |[[File:<NAMEFORMATTED>.png|frameless|80x80px|link=<NAME>]]
 |[[<NAME>]]
 |<RARITY>
-|-"""
+|-""")
 
-petsPageTableTemplate = """\
+petsPageTableTemplate = Template("""\
 == Alternative Sortable Table ==
 {| class="wikitable sortable mw-collapsible mw-collapsed"
 |+
@@ -285,15 +480,15 @@ petsPageTableTemplate = """\
 !Rarity
 |-<ITEMS>
 |}
-"""
+""")
 
-petsPageTableItemTemplate = """
+petsPageTableItemTemplate = Template("""
 |[[File:<NAMEFORMATTED>.png|frameless|80x80px|link=<NAME>]]
 |[[<NAME>]]
 |<RARITY>
-|-"""
+|-""")
 
-toolsPageTableTemplate = """\
+toolsPageTableTemplate = Template("""\
 == Alternative Sortable Table ==
 {| class="wikitable sortable mw-collapsible mw-collapsed"
 |+
@@ -302,16 +497,16 @@ toolsPageTableTemplate = """\
 !Rarity
 |-<ITEMS>
 |}
-"""
+""")
 
-toolsPageTableItemTemplate = """
+toolsPageTableItemTemplate = Template("""
 |[[File:<NAMEFORMATTED>.png|frameless|80x80px|link=<NAME>]]
 |[[<NAME>]]
 |<RARITY>
-|-"""
+|-""")
 
 
-characterPageTableTemplate = """\
+characterPageTableTemplate = Template("""\
 == Alternative Sortable Table ==
 {| class="wikitable sortable mw-collapsible mw-collapsed"
 |+
@@ -320,84 +515,84 @@ characterPageTableTemplate = """\
 !Rarity
 |-<ITEMS>
 |}
-"""
+""")
 
-characterPageTableItemTemplate = """
+characterPageTableItemTemplate = Template("""
 |[[File:<NAMEFORMATTED>.png|frameless|80x80px|link=<NAME>]]
 |[[<NAME>]]
 |<RARITY>
-|-"""
+|-""")
 
 #endregion
 
 #region Main Page Card Templates
-accessoryCardBodyTemplate = """\
+accessoryCardBodyTemplate = Template("""\
 == Accessory List ==
 <div class="card-container">
 <ITEMS>
-</div>"""
+</div>""")
 
-accessoryCardItemTemplate = """
+accessoryCardItemTemplate = Template("""
 {{Card
 |title=<NAME>
 |image=<NAMEHYPHENED>.png
 |rarity=<RARITY>
 |linktarget=<NAMEHYPHENED>
 }}
-"""
+""")
 
-materialCardBodyTemplate = """\
+materialCardBodyTemplate = Template("""\
 == Material List ==
 <div class="card-container">
 <ITEMS>
-</div>"""
+</div>""")
 
-materialCardItemTemplate = """
+materialCardItemTemplate = Template("""
 {{Card
 |title=<NAME>
 |image=<NAMEHYPHENED>.png
 |rarity=<RARITY>
 |linktarget=<NAMEHYPHENED>
 }}
-"""
+""")
 
-petCardBodyTemplate = """\
+petCardBodyTemplate = Template("""\
 == Pet List ==
 <div class="card-container">
 <ITEMS>
-</div>"""
+</div>""")
 
-petCardItemTemplate = """
+petCardItemTemplate = Template("""
 {{Card
 |title=<NAME>
 |image=<NAMEHYPHENED>.png
 |rarity=<RARITY>
 |linktarget=<NAMEHYPHENED>
 }}
-"""
+""")
 
-toolCardBodyTemplate = """\
+toolCardBodyTemplate = Template("""\
 == Tool List ==
 <div class="card-container">
 <ITEMS>
-</div>"""
+</div>""")
 
-toolCardItemTemplate = """
+toolCardItemTemplate = Template("""
 {{Card
 |title=<NAME>
 |image=<NAMEHYPHENED>.png
 |rarity=<RARITY>
 |linktarget=<NAMEHYPHENED>
 }}
-"""
+""")
 
-characterCardBodyTemplate = """\
+characterCardBodyTemplate = Template("""\
 == Character List ==
 <div class="card-container">
 <ITEMS>
-</div>"""
+</div>""")
 
-characterCardItemTemplate = """
+characterCardItemTemplate = Template("""
 {{Character Card
 |name=<NAME>
 |image=<NAME>.png
@@ -407,25 +602,25 @@ characterCardItemTemplate = """
 |linktarget=<NAMEHYPHENED>
 |number=<ID>
 }}
-"""
+""")
 
 
-card_template = """
+card_template = Template("""
 {{Card
 |title=<NAME>
 |image=<IMAGE>.png
 |linktarget=<NAMEHYPHENED>
 }}\
-"""
+""")
 
-rarity_card_template = """
+rarity_card_template = Template("""
 {{Card
 |title=<NAME>
 |image=<NAMEHYPHENED>.png
 |rarity=<RARITY>
 |linktarget=<NAMEHYPHENED>
 }}\
-"""
+""")
 
 #endregion
 
@@ -448,10 +643,7 @@ def replace_text(body, target, replacement):
 
 def has_recipe(item):
     """Check if the item has a recipe that creates it."""
-    for recipe in recipes:
-        if recipe.result == item:
-            return 'Yes'
-    return 'No'
+    return 'Yes' if catalog.has_recipe(item) else 'No'
 
 def format_name(name):
     new_name = name.replace(" ", "_")
@@ -465,215 +657,278 @@ def format_name(name):
     
     return new_name
 
-def check_if_in_marketplace(item_name, marketplace_items):
-    """Check if the item is in the marketplace."""
-    for mp_item in marketplace_items:
-        if mp_item.name == item_name:
-            return True
-    return False
+def build_slug_table(catalog):
+    """Fill the slug table with the page name of every item, source, recipe and quest name in the catalog."""
+    slugs.clear()
+    for item in catalog.items:
+        slugs.setdefault(item.name, item.name_formatted)
+    for source in catalog.sources:
+        slugs.setdefault(source.name, source.name_formatted)
+    for recipe in catalog.recipes:
+        for name in (recipe.result, *recipe.ingredients, *recipe.tools):
+            if name not in slugs:
+                slugs[name] = format_name(name)
+    for quest in catalog.quests:
+        if quest.quest_name not in slugs:
+            slugs[quest.quest_name] = format_name(quest.quest_name)
+
+def slug(name):
+    """Get the page name of a name from the slug table, formatting it if it isn't in the table."""
+    value = slugs.get(name)
+    return value if value is not None else format_name(name)
+
+def render_card(name, image=None):
+    """Render the card linking to a page, from the fragment cache.
+    
+    Args:
+        name (str): The name of the page.
+        image (str): The name of the card's image, if it isn't the page's own, e.g. 'Quest'.
+    """
+    name_hyphened = slug(name)
+    if image is None:
+        image = name_hyphened
+    return fragments.render(card_template, (name, image), {'NAME': name, 'IMAGE': image, 'NAMEHYPHENED': name_hyphened})
 
-def download_images(items):
-    should_download = True
-    has_magick = True
+def render_rarity_card(name, rarity, name_hyphened=None):
+    """Render an item's card showing its rarity, from the fragment cache.
     
-    # check if imagemagick is available
-    try:
-        # check using windows formatting
-        os.system('magick -version >nul 2>&1')
-    except OSError:
-        print('Imagemagick is not installed. Skipping webp conversion.')
-        has_magick = False
+    Args:
+        name (str): The name of the item.
+        rarity (str): The rarity of the item.
+        name_hyphened (str): The page the card links to, if it isn't the item's own.
+    """
+    if name_hyphened is None:
+        name_hyphened = slug(name)
+    return fragments.render(rarity_card_template, (name, rarity, name_hyphened), {'NAME': name, 'RARITY': rarity, 'NAMEHYPHENED': name_hyphened})
+
+def build_recipe_graph(catalog):
+    """Build the recipe graph for the Total Materials section and work out every item's bill, once per build."""
+    global recipe_graph
+    recipe_graph = RecipeGraph(catalog.recipes, {item.name: item.value for item in catalog.items})
+    recipe_graph.bills()
+    return recipe_graph
+
+def render_total_materials(name):
+    """Render the Total Materials section of an item's page, or an empty string if it can't be broken down."""
+    bill = recipe_graph.bill(name)
+    if bill is None:
+        return ''
+    
+    block = ["== Total Materials ==\n\n"]
+    block.append("<div class=\"card-container left-align\">")
+    for material, count in bill.materials.items():
+        name_hyphened = slug(material)
+        block.append(card_template.render(NAME=f'{material} x{count}', IMAGE=name_hyphened, NAMEHYPHENED=name_hyphened))
+    block.append("\n</div>\n\n")
+    
+    if bill.tools:
+        block.append("=== Tools ===\n\n")
+        block.append("<div class=\"card-container left-align\">")
+        for tool in bill.tools:
+            block.append(render_card(tool))
+        block.append("\n</div>\n\n")
+    
+    block.append(f"Total diffuse value of the materials: {bill.value} MP")
+    if bill.unvalued:
+        block.append(f", not counting {', '.join(bill.unvalued)}, which cannot be diffused")
+    block.append(".")
+    return ''.join(block)
+
+def item_page_path(item):
+    """Get the path of the item's wiki page relative to the wiki folder, or None if the type has no page."""
+    item_type = item.type.lower()
+    if item_type not in page_types:
+        return None
+    return f'{type_to_types_dict[item_type].lower()}/{item.name_formatted}.mw'
+
+def check_if_in_marketplace(item_name, marketplace_by_name):
+    """Check if the item is in the marketplace, using a dict of marketplace items keyed by name."""
+    return item_name in marketplace_by_name
+
+def download_images(items, base_url=None, concurrency=4, rate=4.0, encode_workers=None):
+    """Download the images for the items in the items list and save them as WebP.
+    
+    Downloads run a few at a time over a shared session, paced by a rate limit and
+    retried on failure. Each download is decoded once in memory and encoded to WebP,
+    along with the 64x64 and 80x80 variants the wiki markup uses, by a pool of
+    processes running alongside the downloads. Finished images are recorded in a
+    journal in the images folder, so an interrupted run carries on where it stopped.
+    
+    If Pillow isn't installed, the images are saved as PNGs without conversion.
+    
+    Args:
+        items (list): The items to download images for.
+        base_url (str): The site to download from, which can be pointed at a local server.
+            Defaults to image_downloader.default_base_url.
+        concurrency (int): The most downloads to run at the same time.
+        rate (float): The most downloads to start per second.
+        encode_workers (int): The number of processes encoding images. Defaults to the number of CPUs.
+    """
+    # requests and Pillow are slow to import, so only load them when there are images to get
+    import image_downloader
+    import image_pipeline
+    
+    if base_url is None:
+        base_url = image_downloader.default_base_url
     
-    """Download the images for the items in the items list."""
+    has_pillow = image_pipeline.has_pillow()
+    if not has_pillow:
+        log.info('Pillow is not installed. Skipping webp conversion.')
+    
+    jobs = []
     for item in items:
-        if not should_download:
-            return
-        
         save_path = os.path.join(f'images/{item.type.lower()}')
         if not os.path.exists(save_path):
             os.makedirs(save_path)
-        save_path = os.path.join(save_path, f'{item.name_formatted}.png')
+        
+        # replace ? with - in the name
+        save_path = os.path.join(save_path, f'{item.name_formatted}.png').replace('?', '-')
         save_path_webp = save_path.replace('.png', '.webp')
         
         if not os.path.exists(save_path) and not os.path.exists(save_path_webp):
-            print(f'Downloading {item.name}...')
-            # download the image by combining the UUID with the normal image path
-            # https://moonbounce.gg/images/fp/<UUID>/c/f/preview.png
-            image_path = f'https://moonbounce.gg/images/fp/{item.uuid}/c/f/preview.png'
-            
-            try:
-                # save the image into the images directory, in a folder named after the item type
-                image = requests.get(image_path, timeout=timeout)
-                
-                # replace ? with - in the name
-                save_path = save_path.replace('?', '-')
-                
-                # save the image to the save path
-                with open(save_path, 'wb') as f:
-                    f.write(image.content)
-                
-                # check if imagemagick is installed
-                if not has_magick:
-                    continue
-                
-                # convert the image to webp using imagemagick
-                os.system(f'convert "{save_path}" "{save_path_webp}"')
-                os.remove(save_path)
-
-            except requests.exceptions.Timeout:
-                print(f"Request for {image_path} timed out after {timeout} seconds")
-                print(f"The connection is likely blocked or unavailable, skipping further image downloads.")
-                should_download = False
-            except requests.exceptions.RequestException as e:
-                print(f"An error occurred: {e}")
-                
-            # wait for 1 second before downloading the next image
-            time.sleep(1)
-        # else:
-        #     print(f'{item.name} already exists.')
-            
-    print('Downloaded images.')
+            jobs.append(image_downloader.DownloadJob(item.uuid, None, save_path_webp if has_pillow else save_path, item.name))
+    
+    if not jobs:
+        log.info('Downloaded images.')
+        return
+    
+    log.info(f'Downloading {len(jobs)} images...')
+    journal_path = os.path.join('images', '.download_journal.jsonl')
+    with image_downloader.ImageDownloader(base_url, concurrency=concurrency, rate=rate, timeout=timeout, journal_path=journal_path) as downloader:
+        for job in jobs:
+            job.url = downloader.image_url(job.key)
+        
+        if not has_pillow:
+            downloaded, failed = downloader.download_all(jobs)
+            log.info(f'Downloaded {len(downloaded)} images, {len(failed)} failed.')
+            return
+        
+        # encode each image as soon as it arrives, while the rest are still downloading
+        with image_pipeline.SpriteEncoder(encode_workers) as encoder:
+            failed = downloader.fetch_all(jobs, lambda job, data: encoder.submit(job.key, data, job.path))
+            saved, failed_encodes = encoder.wait()
+        
+        for key, path in saved:
+            downloader.journal.record(key, path)
+    
+    log.info(f'Downloaded {len(saved)} images, {len(failed) + len(failed_encodes)} failed.')
 
 #endregion
 
-def replace_template(template, item):
-    """Replace the placeholders in the template with the actual data."""
-    new_template = template
-    new_template = replace_text(new_template, '<NAME>', item.name)
-    new_template = replace_text(new_template, '<ID>', item.id)
+def replace_template(template, item, values=None):
+    """Render the page template with the item's data.
+    
+    Args:
+        template (Template): The compiled page template to render.
+        item (Item): The item to render the page for.
+        values (dict): Any extra placeholder values, such as <AAN>.
+    """
+    values = dict(values) if values else {}
+    values['NAME'] = item.name
+    values['ID'] = item.id
     
-    new_template = replace_text(new_template, '<NAMEHYPHENED>', item.name_formatted)
+    values['NAMEHYPHENED'] = item.name_formatted
     
-    new_template = replace_text(new_template, '<RARITY>', item.rarity)
-    new_template = replace_text(new_template, '<TYPE>', item.type)
-    new_template = replace_text(new_template, '<TYPES>', type_to_types_dict[item.type.lower()])
-    new_template = replace_text(new_template, '<DESCRIPTION>', item.description)
+    values['RARITY'] = item.rarity
+    values['TYPE'] = item.type
+    values['TYPES'] = type_to_types_dict[item.type.lower()]
+    values['DESCRIPTION'] = item.description
     
-    new_template = replace_text(new_template, '<PROMOCATEGORY>', '[[Category:Promos]]' if item.promo else '')
+    values['PROMOCATEGORY'] = '[[Category:Promos]]' if item.promo else ''
     categories = ''
     if item.categories:
         categories = ''.join([f'[[Category:{category}]]' for category in item.categories])
-    new_template = replace_text(new_template, '<EXTRACATEGORIES>', categories)
+    values['EXTRACATEGORIES'] = categories
     
-    value_string = f'{item.value} MP' if item.value != None else 'Cannot be Diffused'
-    new_template = replace_text(new_template, '<VALUE>', value_string)
+    values['VALUE'] = f'{item.value} MP' if item.value != None else 'Cannot be Diffused'
     
     # if the source is an empty array, then set DROPS to No
-    drops_string = 'No' if len(item.sources) == 0 else 'Yes'
-    new_template = replace_text(new_template, '<DROPS>', drops_string)
+    values['DROPS'] = 'No' if len(item.sources) == 0 else 'Yes'
     
-    if len(item.sources) == 0:
-        item.sources.append(Source('Nothing'))
+    # work on a copy so the item's own sources aren't changed by rendering the page
+    item_sources = list(item.sources)
+    if len(item_sources) == 0:
+        item_sources.append(Source('Nothing'))
     
-    foundin_string = ', '.join([source.name for source in item.sources])
-    new_template = replace_text(new_template, '<FOUNDIN>', foundin_string)
+    values['FOUNDIN'] = ', '.join([source.name for source in item_sources])
     
-    # check if the item is a quest reward
-    rewarding_quest = None
-    for quest in quest_data:
-        if item.name in [item.item_name for item in quest.rewards]:
-            rewarding_quest = quest.quest_name
-            break
-        
-    if rewarding_quest != None:
-        print(f'(#{item.id}) {item.name} is a reward from {rewarding_quest}')
-        quest_source = Source(rewarding_quest)
+    # add every quest that rewards the item
+    for rewarding_quest in catalog.quests_rewarding(item.name):
+        if log.enabled(DEBUG):
+            log.debug(f'(#{item.id}) {item.name} is a reward from {rewarding_quest.quest_name}')
+        quest_source = Source(rewarding_quest.quest_name)
         quest_source.is_quest = True
-        item.sources.append(quest_source)
+        item_sources.append(quest_source)
     
-    if item.sources[0].name == 'Nothing' and len(item.sources) == 1:
+    if item_sources[0].name == 'Nothing' and len(item_sources) == 1:
         if item.type == 'Character':
             foundin_block = "This character cannot be obtained as a drop."
         else:
             foundin_block = "This item cannot be obtained as a drop."
     else:
-        foundin_block = "<div class=\"card-container left-align\">"
+        foundin_cards = []
         
-        for source in item.sources:
+        for source in item_sources:
             # if the source is nothing, skip it
             if source.name == 'Nothing':
                 continue
             
-            source_card = card_template
-            source_card = replace_text(source_card, '<NAME>', source.name)
-            if source.is_quest:
-                source_card = replace_text(source_card, '<IMAGE>', 'Quest')
-                source_card = replace_text(source_card, '<NAMEHYPHENED>', format_name(source.name))
-            else:
-                source_card = replace_text(source_card, '<IMAGE>', format_name(source.name))
-                source_card = replace_text(source_card, '<NAMEHYPHENED>', format_name(source.name))
-            foundin_block += source_card
+            foundin_cards.append(render_card(source.name, 'Quest' if source.is_quest else None))
         
-        foundin_block += "\n</div>"
+        foundin_block = "<div class=\"card-container left-align\">" + ''.join(foundin_cards) + "\n</div>"
     
-    new_template = replace_text(new_template, '<FOUNDINBLOCK>', foundin_block)
+    values['FOUNDINBLOCK'] = foundin_block
     
     # check if the item has a recipe
     item_has_recipe = has_recipe(item.name)
-    new_template = replace_text(new_template, '<HAS_RECIPE>', item_has_recipe)
+    values['HAS_RECIPE'] = item_has_recipe
     
     if recipes_enabled:
-        recipe_block = "== Recipe ==\n\n"
+        recipe_block = ["== Recipe ==\n\n"]
         
         if item_has_recipe == 'Yes':
-            for recipe in recipes:
-                if recipe.result == item.name:
+            for recipe in catalog.recipes_for(item.name):
+                recipe_block.append("=== Ingredients ===\n\n")
+                recipe_block.append("<div class=\"card-container left-align\">")
+    
+                for ingredient in recipe.ingredients:
+                    recipe_block.append(render_card(ingredient))
                     
-                    recipe_block += "=== Ingredients ===\n\n"
-                    recipe_block += "<div class=\"card-container left-align\">"
-        
-                    for ingredient in recipe.ingredients:
-                        ingredient_card = card_template
-                        ingredient_card = replace_text(ingredient_card, '<NAME>', ingredient)
-                        ingredient_card = replace_text(ingredient_card, '<IMAGE>', format_name(ingredient))
-                        ingredient_card = replace_text(ingredient_card, '<NAMEHYPHENED>', format_name(ingredient))
-                        recipe_block += ingredient_card
+                recipe_block.append("\n</div>\n\n")
+                
+                if len(recipe.tools) > 0:
+                    recipe_block.append("=== Tools ===\n\n")
+                    recipe_block.append("<div class=\"card-container left-align\">")
+                
+                    for tool in recipe.tools:
+                        recipe_block.append(render_card(tool))
                         
-                    recipe_block += "\n</div>\n\n"
-                    
-                    if len(recipe.tools) > 0:
-                        recipe_block += "=== Tools ===\n\n"
-                        recipe_block += "<div class=\"card-container left-align\">"
-                    
-                        for tool in recipe.tools:
-                            tool_card = card_template
-                            tool_card = replace_text(tool_card, '<NAME>', tool)
-                            tool_card = replace_text(tool_card, '<IMAGE>', format_name(tool))
-                            tool_card = replace_text(tool_card, '<NAMEHYPHENED>', format_name(tool))
-                            recipe_block += tool_card
-                            
-                        recipe_block += "\n</div>"
+                    recipe_block.append("\n</div>")
                         
         elif item_has_recipe == 'No':
             if item.type == 'Character':
-                recipe_block += "This character cannot be crafted."
+                recipe_block.append("This character cannot be crafted.")
             else:
-                recipe_block += "This item cannot be crafted."
+                recipe_block.append("This item cannot be crafted.")
+        
+        recipe_block = ''.join(recipe_block)
     else:
         recipe_block = ""
         
-    new_template = replace_text(new_template, '<RECIPEBLOCK>', recipe_block)
+    values['RECIPEBLOCK'] = recipe_block
+    
+    # the raw materials the item is ultimately crafted from, if the section is enabled
+    values['TOTALMATERIALSBLOCK'] = render_total_materials(item.name) if recipe_graph is not None else ''
     
 
     # create a list of recipes and quests that use the item
     
     if usages_enabled:
-        usage_block = f"== Used In ==\n\n"
+        usage_block = ["== Used In ==\n\n"]
         
         # check if the item has a usage (a recipe that uses it)
-        used_recipes = []
-        used_quests = []
-        
-        for recipe in recipes:
-            if item.name in recipe.ingredients:
-                used_recipes.append(recipe)
-            if item.name in recipe.tools:
-                used_recipes.append(recipe)
-                
-        for quest in quest_data:
-            for required_item in quest.required_items:
-                if item.name == required_item.item_name:
-                    used_quests.append(quest)
+        used_recipes = catalog.recipes_using(item.name)
+        used_quests = catalog.quests_requiring(item.name)
         
         has_usages = False
         if len(used_recipes) > 0 or len(used_quests) > 0:
@@ -681,84 +936,69 @@ def replace_template(template, item):
 
         if has_usages:
             if len(used_recipes) > 0:
-                usage_block += "=== Recipes ===\n\n"
+                usage_block.append("=== Recipes ===\n\n")
                 
-                usage_block += "<div class=\"card-container left-align\">"
+                usage_block.append("<div class=\"card-container left-align\">")
                 
                 for recipe in used_recipes:
-                    usage_card = card_template
-                    usage_card = replace_text(usage_card, '<NAME>', recipe.result)
-                    usage_card = replace_text(usage_card, '<IMAGE>', format_name(recipe.result))
-                    usage_card = replace_text(usage_card, '<NAMEHYPHENED>', format_name(recipe.result))
-                    usage_block += usage_card
+                    usage_block.append(render_card(recipe.result))
                     
-                usage_block += "\n</div>\n\n"
+                usage_block.append("\n</div>\n\n")
             
             if len(used_quests) > 0:
-                usage_block += "=== Quests ===\n\n"
+                usage_block.append("=== Quests ===\n\n")
                 
-                usage_block += "<div class=\"card-container left-align\">"
+                usage_block.append("<div class=\"card-container left-align\">")
                 
                 for quest in used_quests:
-                    usage_card = card_template
-                    usage_card = replace_text(usage_card, '<NAME>', quest.quest_name)
-                    usage_card = replace_text(usage_card, '<IMAGE>', 'Quest')
-                    usage_card = replace_text(usage_card, '<NAMEHYPHENED>', format_name(quest.quest_name))
-                    usage_block += usage_card
+                    usage_block.append(render_card(quest.quest_name, 'Quest'))
                     
-                usage_block += "\n</div>"
-                
-            new_template = replace_text(new_template, '<USAGEBLOCK>', usage_block)
+                usage_block.append("\n</div>")
         else:
-            usage_block += "This item is not used in any recipes or quests."
+            usage_block.append("This item is not used in any recipes or quests.")
+        
+        usage_block = ''.join(usage_block)
     else:
         usage_block = ""
         
-    new_template = replace_text(new_template, '<USAGEBLOCK>', usage_block)
+    values['USAGEBLOCK'] = usage_block
     
     # replace the trivia text with the actual trivia or "Lorem upsum" if there is none
     trivia_text = '* Lorem ipsum'
     if len(item.trivia) > 0:
         trivia_text = '\n'.join(item.trivia)
-    new_template = replace_text(new_template, '<TRIVIATEXT>', trivia_text)
+    values['TRIVIATEXT'] = trivia_text
     
     # replace the gallery items with the actual gallery items or an empty string if there are none
     gallery_items = ''
     if len(item.gallery) > 0:
         gallery_items = '\n'.join(item.gallery)
-    new_template = replace_text(new_template, '<GALLERYITEMS>', gallery_items)
+    values['GALLERYITEMS'] = gallery_items
     
     # replace the appearance body with the actual appearance or an empty string if there is none
     appearance_body = ''
     if item.appearance:
         appearance_body = "== Appearance ==\n\n" + item.appearance
-    new_template = replace_text(new_template, '<APPEARANCEBODY>', appearance_body)
-            
-    # remove all multiple empty lines
-    new_template = re.sub(r'\n{3,}', '\n\n', new_template)
+    values['APPEARANCEBODY'] = appearance_body
     
-    return new_template
+    # render the page in a single pass, which also removes all multiple empty lines
+    return template.render(values)
 
 
 
 #region Main functions
 
 #region Loading Data
-def load_data(data_path, marketplace_data_path):
-    """Load the data from the specified JSON file and populate the items and recipes lists."""
+def load_data(data_path, marketplace_data_path, wiki_metadata=None):
+    """Load the data from the specified JSON files and build the Catalog of items, recipes and sources.
     
-    with open("data/wiki_data.json", "r", encoding="utf-8") as f:
-        wiki_data = json.load(f)
-        
-    wiki_item_data = wiki_data['items']
-    wiki_source_data = wiki_data['sources']
-    
-    # Initialize the lists to store the items, recipes, and sources
-    items = []
-    recipes = []
-    sources = []
-    marketplace_items = []
-    marketplace_recipes = []
+    Args:
+        data_path (str): The path of MoonbouncePlus.json.
+        marketplace_data_path (str): The path of marketplace.json.
+        wiki_metadata (WikiMetadata): The wiki data for items and sources. Defaults to the process's shared copy of wiki_data.json.
+    """
+    if wiki_metadata is None:
+        wiki_metadata = WikiMetadata.load(wiki_data_path)
     
     # Load the data from the JSON file
     with open(data_path, 'r', encoding='utf-8') as f:
@@ -768,6 +1008,61 @@ def load_data(data_path, marketplace_data_path):
     with open(marketplace_data_path, 'r', encoding='utf-8') as f:
         marketplace_data = json.load(f)
     
+    return build_catalog(data, marketplace_data, wiki_metadata)
+
+def load_recipes(data_path):
+    """Load only the recipes from the data file, for stages that don't need the rest of the catalog."""
+    with open(data_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    return [Recipe(recipe['result'], recipe['ingredients'], recipe['tools'], recipe['type']) for recipe in data['recipes']]
+
+def load_catalog(use_cache=True):
+    """Load the catalog with its quests attached, from the cache when the data files haven't changed.
+    
+    A warm start skips parsing the JSON and building the objects. The cache is
+    rebuilt whenever a data file's contents change or the code that builds the
+    catalog is edited.
+    
+    Returns the catalog and whether it came from the cache.
+    """
+    def build():
+        # parse the wiki data once for both the catalog and the quests
+        wiki_metadata = WikiMetadata.load(wiki_data_path)
+        catalog = load_data(data_path, marketplace_data_path, wiki_metadata)
+        catalog.attach_quests(quests.load_quests(quests_data_path, wiki_metadata))
+        return catalog
+    
+    if not use_cache:
+        return build(), False
+    
+    version = code_version([__file__, quests.__file__, os.path.join(script_dir, 'records.py'), os.path.join(script_dir, 'wiki_metadata.py')])
+    cache = DataCache(cache_path, version)
+    return cache.load_or_build('catalog', [data_path, marketplace_data_path, wiki_data_path, quests_data_path], build)
+
+def write_sources_list(sources):
+    """Write each source and the items it drops to data/sources.txt."""
+    lines = []
+    for source in sources:
+        lines.append(f'{source.name}\n\t' + "\n\t".join(source.drops) + '\n\n')
+    output.write(os.path.join(script_dir, '..', 'data', 'sources.txt'), ''.join(lines), pages=0)
+
+def build_catalog(data, marketplace_data, wiki_metadata):
+    """Build the Catalog of items, recipes and sources from the already loaded JSON data.
+    
+    Args:
+        data (dict): The items and recipes, as in MoonbouncePlus.json.
+        marketplace_data (dict): The marketplace items and recipes, as in marketplace.json.
+        wiki_metadata (WikiMetadata): The extra wiki data for items and sources, from wiki_data.json.
+    """
+    
+    # Initialize the lists to store the items, recipes, and sources
+    items = []
+    recipes = []
+    sources = []
+    marketplace_items = []
+    marketplace_recipes = []
+    
     # load the marketplace items and recipes
     for item in marketplace_data['marketplace']['items']:
         mp_item = MarketplaceItem(item['name'], item['section'], item['cost'], item.get('info', None))
@@ -780,34 +1075,41 @@ def load_data(data_path, marketplace_data_path):
     marketplace_source = Source('Marketplace')
     marketplace_source.drops = [mp_item.name for mp_item in marketplace_items]
     sources.append(marketplace_source)
+    
+    sources_by_name = {marketplace_source.name: marketplace_source}
+    marketplace_by_name = {}
+    for mp_item in marketplace_items:
+        marketplace_by_name.setdefault(mp_item.name, mp_item)
    
     # Go through the items in the JSON file and create a new Item object for each one
     for item in data['items']:
+        item_name = intern_name(item['name'])
         item_sources = []
         for source_name in item['sources']:
-            source = next((s for s in sources if s.name == source_name), None)              # Try and find the source in the sources list
+            source = sources_by_name.get(source_name)                                       # Try and find the source in the sources list
             if not source:                                                                  # If it doesn't exist...
                 source = Source(source_name)                                                # Create a new source
                 
                 # find the source in the wiki data
-                wiki_source = next((s for s in wiki_source_data if s['name'] == source_name), None)
+                wiki_source = wiki_metadata.source(source_name)
                 if wiki_source:
                     source.promo = wiki_source['promo']
                     source.trivia = wiki_source['trivia']
                     source.categories = wiki_source['categories']
                 
                 sources.append(source)                                                      # Add it to the sources list
+                sources_by_name[source_name] = source
             item_sources.append(source)                                                     # Add the source to the item_sources list   
-            source.drops.append(item['name'])                                               # Add the item to the source's drops list
+            source.drops.append(item_name)                                                  # Add the item to the source's drops list
                     
         # check if the item is in the marketplace
-        if check_if_in_marketplace(item['name'], marketplace_items):
+        if check_if_in_marketplace(item['name'], marketplace_by_name):
             item_sources.append(marketplace_source)
             
         new_item = Item(item['id'], item['name'], item['description'], item['type'], item['value'], item['rarity'], item_sources, item['uuid'])
         
         # check if the item is a promo item
-        wiki_item = next((i for i in wiki_item_data if i['name'] == item['name']), None)
+        wiki_item = wiki_metadata.item(item['name'])
         if wiki_item:
             new_item.trivia = wiki_item['trivia']
             new_item.promo = wiki_item['promo']
@@ -821,77 +1123,142 @@ def load_data(data_path, marketplace_data_path):
     for recipe in data['recipes']:
         recipes.append(Recipe(recipe['result'], recipe['ingredients'], recipe['tools'], recipe['type']))
         
-    # sort the sources alphabetically then output them to a file
+    # sort the sources alphabetically
     sources.sort(key=lambda x: x.name)
-    with open(os.path.join(script_dir, '..', 'data', 'sources.txt'), 'w', encoding='utf-8') as f:
-        for source in sources:
-            output = f'{source.name}\n\t'
-            output += "\n\t".join(source.drops)
-            f.write(output + '\n\n')
     
-    return items, recipes, sources
+    return Catalog(items, recipes, sources, marketplace_items, marketplace_recipes)
 #endregion
 
 #region Generating Wiki Data
-def generate_wiki_articles(items, print_file_names=False):
-    """Generate the wiki articles for the items in the items list."""
+def render_item_page(item):
+    """Render the wiki article for a single item.
     
-    print(f'Generating wiki articles. Recipes: {recipes_enabled}, Usages: {usages_enabled}')    
+    Returns the path of the page relative to the wiki folder and the page itself,
+    or None if the item's type has no page.
+    """
+    type_path = ''
+    valid = False
+    
+    template = itemPageTemplate
+    values = {}
+    
+    if item.type.lower() == 'accessory':
+        type_path = 'accessories'
+        values['AAN'] = 'an'
+        valid = True
+    elif item.type.lower() == 'material':
+        type_path = 'materials'
+        values['AAN'] = 'a'
+        valid = True
+    elif item.type.lower() == 'pet':
+        template = characterTemplate
+        values['AAN'] = 'a'
+        type_path = 'pets'
+        valid = True
+    elif item.type.lower() == 'character':
+        template = characterTemplate
+        type_path = 'characters'
+        valid = True
+    elif item.type.lower() == 'tool':
+        type_path = 'tools'
+        values['AAN'] = 'a'
+        valid = True
+    else:
+        # validate_catalog() has already warned about every item without a page, once per type
+        log.debug(f'Uncaught Item type: {item.type} for {item.name}')
+        # # TEMPORARILY CREATE THE ITEM AS IF IT WERE AN ACCESSORY
+        # type_path = 'unknown'
+        # values['AAN'] = 'an'
+        # valid = True
+        
+    if not valid:
+        return None
     
-    for item in items:
-        new_template = ''
-        type_path = ''
-        valid = False
-        
-        new_template = itemPageTemplate
-        
-        if item.type.lower() == 'accessory':
-            type_path = 'accessories'
-            new_template = new_template.replace('<AAN>', 'an')
-            valid = True
-        elif item.type.lower() == 'material':
-            type_path = 'materials'
-            new_template = new_template.replace('<AAN>', 'a')
-            valid = True
-        elif item.type.lower() == 'pet':
-            new_template = characterTemplate
-            new_template = new_template.replace('<AAN>', 'a')
-            type_path = 'pets'
-            valid = True
-        elif item.type.lower() == 'character':
-            new_template = characterTemplate
-            type_path = 'characters'
-            valid = True
-        elif item.type.lower() == 'tool':
-            type_path = 'tools'
-            new_template = new_template.replace('<AAN>', 'a')
-            valid = True
-        else:
-            print(f'Uncaught Item type: {item.type} for {item.name}')
-            # # TEMPORARILY CREATE THE ITEM AS IF IT WERE AN ACCESSORY
-            # type_path = 'unknown'
-            # new_template = new_template.replace('<AAN>', 'an')
-            # valid = True
-            
-        if valid == True:
-            # replace the placeholders with the actual data
-            new_template = replace_template(new_template, item)
+    # replace the placeholders with the actual data
+    return f'{type_path}/{item.name_formatted}.mw', replace_template(template, item, values)
 
-            # Construct the path to the appropriate directory one level up from the script
-            wiki_type_path = os.path.join(script_dir, '..', 'wiki', type_path)
-            
-            # Check if the directory exists, and create it if it doesn't
-            if not os.path.exists(wiki_type_path):
-                os.makedirs(wiki_type_path)
-            
-            # write the new template to a file
-            with open(os.path.join(wiki_type_path, f'{item.name_formatted}.mw'), 'w', encoding='utf-8') as f:
-                f.write(new_template)
-                if print_file_names:
-                    print(f'Writing {item.name} to file')
+def write_page(path, page, title=None):
+    """Write a page to its path relative to the wiki folder, unless it hasn't changed.
+
+    Args:
+        path (str): The path of the page relative to the wiki folder.
+        page (str): The contents of the page.
+        title (str): The title of the article in a MediaWiki dump. Leave it out for fragments, which aren't dumped.
+    """
+    output.write(os.path.join(script_dir, '..', 'wiki', path), page, title=title)
+
+def write_item_page(item, print_file_names=False):
+    """Render the wiki article for a single item and write it to the wiki folder."""
+    rendered = render_item_page(item)
+    if rendered is not None:
+        write_page(*rendered, title=item.name)
+        if print_file_names:
+            log.info(f'Writing {item.name} to file')
+
+
+def _init_article_worker(shared_catalog, shared_items, shared_recipe_graph, log_level):
+    """Set up a worker process with the catalog, the recipe graph and the items to render, shipped once per worker."""
+    global catalog, article_items, recipe_graph
+    catalog = shared_catalog
+    article_items = shared_items
+    recipe_graph = shared_recipe_graph
+    # forked workers already have the parent's slug table
+    if not slugs:
+        build_slug_table(catalog)
+    log.level = log_level
+    log.discard()
+
+def _write_item_pages(start, stop, print_file_names):
+    """Write the pages for a slice of the items shipped to the worker.
+    
+    Returns how much each counter grew, for the parent process to add to its own.
+    """
+    snapshot = dict(counters)
+    for item in article_items[start:stop]:
+        write_item_page(item, print_file_names)
+    log.flush()
+    return counters_since(snapshot)
+
+def generate_wiki_articles(items, print_file_names=False, jobs=1):
+    """Generate the wiki articles for the items in the items list.
+    
+    Args:
+        items (list): The items to generate articles for.
+        print_file_names (bool): Whether to print each item as it is written.
+        jobs (int): The number of processes to render the articles with.
+    """
+    
+    log.info(f'Generating wiki articles. Recipes: {recipes_enabled}, Usages: {usages_enabled}')
+    log.flush()
+    
+    # create the folders up front, rather than checking for one before every page
+    wiki_dir = os.path.join(script_dir, '..', 'wiki')
+    output.make_dirs(sorted({os.path.join(wiki_dir, os.path.dirname(path)) for path in map(item_page_path, items) if path}))
+    
+    # an archive can only be written to by one process
+    if output.archive_path is not None:
+        jobs = 1
+    
+    if jobs <= 1 or len(items) < 2:
+        for item in items:
+            write_item_page(item, print_file_names)
+        return
+    
+    # the process pool is only needed with --jobs, so it's imported here
+    from concurrent.futures import ProcessPoolExecutor
+    
+    # every page only reads the catalog, so split the items into contiguous slices and render them side by side
+    chunk_size = max(1, -(-len(items) // (jobs * 4)))
+    starts = list(range(0, len(items), chunk_size))
+    stops = [min(start + chunk_size, len(items)) for start in starts]
+    
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_article_worker, initargs=(catalog, items, recipe_graph, log.level)) as executor:
+        # map() keeps the slices in order and raises the first error from any worker
+        for worker_counts in executor.map(_write_item_pages, starts, stops, [print_file_names] * len(starts)):
+            counters.update(worker_counts)
 
 
-recipe_table_template = """
+recipe_table_template = Template("""
 === <u><TYPENAME></u> ===
 {| class="wikitable sortable mw-collapsible" style="width: 100%; max-width: 800px;"
 |+ Recipes
@@ -901,9 +1268,9 @@ recipe_table_template = """
 !+
 ! colspan="3" | Tools
 <RECIPE_ROWS>
-|}"""
+|}""")
 
-recipe_row_template = """
+recipe_row_template = Template("""
 |-
 | <div style="text-align: center;">\
 [[File:<RESULTHYPHEN>.png|frameless|64x64px|link=[[<RESULTHYPHEN>]]]]<br>\
@@ -917,21 +1284,17 @@ recipe_row_template = """
 <TOOL1>
 <TOOL2>
 <TOOL3>
-"""
+""")
 
-recipe_use_item_template = """\
+recipe_use_item_template = Template("""\
 | <div style="text-align: center;">\
 [[File:<ITEMHYPHEN>.png|frameless|64x64px|link=[[<ITEMHYPHEN>]]]]<br>\
 '''[[<ITEM>]]'''\
-</div>"""
+</div>""")
 
 
-def generate_recipe_table(recipes):
-    """Generate the recipe table for the recipes in the recipes list."""
-    
-    # get all the types of recipe
-    types = set([recipe.type for recipe in recipes])
-    
+def sort_recipe_types(types):
+    """Sort the recipe types alphabetically, with the partnership recipes at the end."""
     # turn the set into a list
     types = list(types)
     
@@ -943,82 +1306,77 @@ def generate_recipe_table(recipes):
     types = [type for type in types if 'partnership' not in type.lower()]
     types += partnership_recipes
     
-    recipe_type_tables = []
+    return types
+
+def recipe_type_display(type):
+    """Get the name shown for a recipe type, keeping only what's inside the ( ) if there's a bracket."""
+    if '(' in type:
+        return type[type.index('(')+1:type.index(')')]
+    return type
+
+def render_recipe_row(recipe):
+    """Render the row of the recipe table for a single recipe."""
+    ingredient_sections = []
+    tool_sections = []
     
-    # create a new recipe table for each type
-    for type in types:
-        new_table = recipe_table_template
-        
-        # keep only what's inside the ( ) in the type if there's a bracket
-        type_display = type
-        if '(' in type:
-            type_display = type[type.index('(')+1:type.index(')')]
+    for ingredient in recipe.ingredients:
+        ingredient_sections.append(recipe_use_item_template.render(ITEM=ingredient, ITEMHYPHEN=slug(ingredient)))
         
-        new_table = replace_text(new_table, '<TYPENAME>', type_display)
+    for tool in recipe.tools:
+        tool_sections.append(recipe_use_item_template.render(ITEM=tool, ITEMHYPHEN=slug(tool)))
         
-        # get all the recipes of the current type
-        type_recipes = [recipe for recipe in recipes if recipe.type == type]
-        
-        recipe_rows = []
-        
-        for recipe in type_recipes:
-            new_row = recipe_row_template
-            new_row = replace_text(new_row, '<RESULT>', recipe.result)
-            new_row = replace_text(new_row, '<RESULTHYPHEN>', format_name(recipe.result))
+    if len(ingredient_sections) < 3:
+        for i in range(3 - len(ingredient_sections)):
+            ingredient_sections.append("|")
             
-            ingredient_template = recipe_use_item_template
-            tool_template = recipe_use_item_template
+    if len(tool_sections) < 3:
+        for i in range(3 - len(tool_sections)):
+            tool_sections.append("|")
             
-            ingredient_sections = []
-            tool_sections = []
-            
-            for ingredient in recipe.ingredients:
-                new_ingredient = ingredient_template
-                new_ingredient = replace_text(new_ingredient, '<ITEM>', ingredient)
-                new_ingredient = replace_text(new_ingredient, '<ITEMHYPHEN>', format_name(ingredient))
-                ingredient_sections.append(new_ingredient)
-                
-            for tool in recipe.tools:
-                new_tool = tool_template
-                new_tool = replace_text(new_tool, '<ITEM>', tool)
-                new_tool = replace_text(new_tool, '<ITEMHYPHEN>', format_name(tool))
-                tool_sections.append(new_tool)
-                
-            if len(ingredient_sections) < 3:
-                for i in range(3 - len(ingredient_sections)):
-                    ingredient_sections.append("|")
-                    
-            if len(tool_sections) < 3:
-                for i in range(3 - len(tool_sections)):
-                    tool_sections.append("|")
-                    
-            new_row = replace_text(new_row, '<INGREDIENT1>', ingredient_sections[0])
-            new_row = replace_text(new_row, '<INGREDIENT2>', ingredient_sections[1])
-            new_row = replace_text(new_row, '<INGREDIENT3>', ingredient_sections[2])
-            
-            new_row = replace_text(new_row, '<TOOL1>', tool_sections[0])
-            new_row = replace_text(new_row, '<TOOL2>', tool_sections[1])
-            new_row = replace_text(new_row, '<TOOL3>', tool_sections[2])
-            
-            recipe_rows.append(new_row)
+    return recipe_row_template.render({
+        'RESULT': recipe.result,
+        'RESULTHYPHEN': slug(recipe.result),
+        'INGREDIENT1': ingredient_sections[0],
+        'INGREDIENT2': ingredient_sections[1],
+        'INGREDIENT3': ingredient_sections[2],
+        'TOOL1': tool_sections[0],
+        'TOOL2': tool_sections[1],
+        'TOOL3': tool_sections[2],
+    })
+
+def generate_recipe_table(views):
+    """Generate the recipe table, with a section for each type of recipe.
+    
+    Args:
+        views (CatalogViews): The recipes grouped by type.
+    """
+    recipe_type_tables = []
+    
+    # create a new recipe table for each type
+    for type in views.recipe_types:
+        # get all the recipes of the current type
+        type_recipes = views.recipes_by_type[type]
+        
+        recipe_rows = [render_recipe_row(recipe) for recipe in type_recipes]
             
-        new_table = replace_text(new_table, '<RECIPE_ROWS>', ''.join(recipe_rows))
+        new_table = recipe_table_template.render(TYPENAME=recipe_type_display(type), RECIPE_ROWS=''.join(recipe_rows))
         
         recipe_type_tables.append(new_table)
         
-        
-        
-        
     recipe_table = '\n\n\n'.join(recipe_type_tables)   
     
-    with open(os.path.join(script_dir, '..', 'wiki', 'recipes.mw'), 'w', encoding='utf-8') as f:
-        f.write(recipe_table)
+    output.write(os.path.join(script_dir, '..', 'wiki', 'recipes.mw'), recipe_table)
         
-    print('Generated recipe table.')
+    log.info('Generated recipe table.')
 
 
-def generate_page_tables(items):
-    """Generate the page tables for the items in the items list."""
+def generate_page_tables(views, only=None):
+    """Generate the page tables for each type of item.
+    
+    Args:
+        views (CatalogViews): The items partitioned by type.
+        only (set): The names of the table files to write, such as 'pets-table.mw'. Writes every table if None.
+    """
     accessories_table = accessoriesPageTableTemplate
     materials_table = materialsPageTableTemplate
     pets_table = petsPageTableTemplate
@@ -1033,53 +1391,44 @@ def generate_page_tables(items):
         'character': characterPageTableItemTemplate
     }
     
-    item_lists = {
-        'accessory': [],
-        'material': [],
-        'pets': [],
-        'tool': [],
-        'character': []
-    }
-    
-    for item in items:
-        item_type = item.type.lower()
-        if item_type in item_templates:
-            new_item = item_templates[item_type]
-            new_item = replace_text(new_item, '<NAME>', item.name)
-            new_item = replace_text(new_item, '<RARITY>', item.rarity)
-            new_item = replace_text(new_item, '<NAMEFORMATTED>', format_name(item.name))
-            item_lists[item_type].append(new_item)
+    item_lists = {}
+    for item_type, template in item_templates.items():
+        item_lists[item_type] = [template.render(NAME=item.name, RARITY=item.rarity, NAMEFORMATTED=slug(item.name))
+                                 for item in views.items_of_type(item_type)]
                 
-    accessories_table = replace_text(accessories_table, '<ITEMS>', ''.join(item_lists['accessory']))
-    materials_table = replace_text(materials_table, '<ITEMS>', ''.join(item_lists['material']))
-    pets_table = replace_text(pets_table, '<ITEMS>', ''.join(item_lists['pets'])) 
-    tools_table = replace_text(tools_table, '<ITEMS>', ''.join(item_lists['tool']))
-    characters_table = replace_text(characters_table, '<ITEMS>', ''.join(item_lists['character']))
+    accessories_table = accessories_table.render(ITEMS=''.join(item_lists['accessory']))
+    materials_table = materials_table.render(ITEMS=''.join(item_lists['material']))
+    pets_table = pets_table.render(ITEMS=''.join(item_lists['pets']))
+    tools_table = tools_table.render(ITEMS=''.join(item_lists['tool']))
+    characters_table = characters_table.render(ITEMS=''.join(item_lists['character']))
+    
+    tables = {
+        'accessories-table.mw': accessories_table,
+        'materials-table.mw': materials_table,
+        'pets-table.mw': pets_table,
+        'tools-table.mw': tools_table,
+        'characters-table.mw': characters_table,
+    }
     
-    with open(os.path.join(script_dir, '..', 'wiki', 'accessories-table.mw'), 'w', encoding='utf-8') as f:
-        f.write(accessories_table)
-        
-    with open(os.path.join(script_dir, '..', 'wiki', 'materials-table.mw'), 'w', encoding='utf-8') as f:
-        f.write(materials_table)
-        
-    with open(os.path.join(script_dir, '..', 'wiki', 'pets-table.mw'), 'w', encoding='utf-8') as f:
-        f.write(pets_table)
-        
-    with open(os.path.join(script_dir, '..', 'wiki', 'tools-table.mw'), 'w', encoding='utf-8') as f:
-        f.write(tools_table)
-        
-    with open(os.path.join(script_dir, '..', 'wiki', 'characters-table.mw'), 'w', encoding='utf-8') as f:
-        f.write(characters_table)
+    for file_name, table in tables.items():
+        if only is not None and file_name not in only:
+            continue
+        output.write(os.path.join(script_dir, '..', 'wiki', file_name), table)
         
-    print('Generated page tables for accessories.')
-    print('Generated page tables for materials.')
-    print('Generated page tables for pets.')
-    print('Generated page tables for tools.')
-    print('Generated page tables for characters.')
+    log.info('Generated page tables for accessories.')
+    log.info('Generated page tables for materials.')
+    log.info('Generated page tables for pets.')
+    log.info('Generated page tables for tools.')
+    log.info('Generated page tables for characters.')
 
 
-def generate_cards_lists(items):
-    """Generate the material cards for the items in the items list."""
+def generate_cards_lists(views, only=None):
+    """Generate the card lists for each type of item.
+    
+    Args:
+        views (CatalogViews): The items partitioned by type.
+        only (set): The names of the card files to write, such as 'pets-cards.mw'. Writes every card list if None.
+    """
     accessory_card_body = accessoryCardBodyTemplate
     accessoryItems = []
 
@@ -1103,61 +1452,50 @@ def generate_cards_lists(items):
         'character': (characterCardItemTemplate, characterItems)
     }
     
-    for item in items:
-        item_type = item.type.lower()
-        if item_type in item_templates:
-            template, item_list = item_templates[item_type]
-            new_item = replace_text(template, '<NAME>', item.name)
-            new_item = replace_text(new_item, '<RARITY>', item.rarity.lower())
-            new_item = replace_text(new_item, '<NAMEHYPHENED>', format_name(item.name))
+    for item_type, (template, item_list) in item_templates.items():
+        # the characters are listed by id, the rest by name
+        type_items = views.characters_by_id if item_type == 'character' else views.items_of_type(item_type)
+        
+        for item in type_items:
+            values = {
+                'NAME': item.name,
+                'RARITY': item.rarity.lower(),
+                'NAMEHYPHENED': slug(item.name),
+            }
             
             if item_type == 'character':
-                new_item = replace_text(new_item, '<DESCRIPTION>', item.description)
-                new_item = replace_text(new_item, '<ID>', item.id)
+                values['DESCRIPTION'] = item.description
+                values['ID'] = item.id
                 
-                # find a recipe that creates the character
-                for recipe in recipes:
-                    if recipe.result == item.name:
-                        new_item = replace_text(new_item, '<HAS_RECIPE>', '|craftable=Yes')
-                        break
-                else:
-                    new_item = replace_text(new_item, '<HAS_RECIPE>', '')
-                    
+                # check for a recipe that creates the character
+                values['HAS_RECIPE'] = '|craftable=Yes' if catalog.has_recipe(item.name) else ''
 
-            item_list.append(new_item)
-            
-    # get all the characters from the item list to sort the generated cards by id
-    characters = [item for item in items if item.type.lower() == 'character']
-    characters.sort(key=lambda x: int(x.id))
-    # sort each generated card by the id of the character
-    characterItems = [item for character in characters for item in characterItems if character.name in item]
+            item_list.append(template.render(values))
             
-    accessory_card_body = replace_text(accessory_card_body, '<ITEMS>', ''.join(accessoryItems))
-    material_card_body = replace_text(material_card_body, '<ITEMS>', ''.join(materialItems))
-    pet_card_body = replace_text(pet_card_body, '<ITEMS>', ''.join(petItems))
-    tool_card_body = replace_text(tool_card_body, '<ITEMS>', ''.join(toolItems))
-    character_card_body = replace_text(character_card_body, '<ITEMS>', ''.join(characterItems))
-    
-    with open(os.path.join(script_dir, '..', 'wiki', 'accessories-cards.mw'), 'w', encoding='utf-8') as f:
-        f.write(accessory_card_body)
+    accessory_card_body = accessory_card_body.render(ITEMS=''.join(accessoryItems))
+    material_card_body = material_card_body.render(ITEMS=''.join(materialItems))
+    pet_card_body = pet_card_body.render(ITEMS=''.join(petItems))
+    tool_card_body = tool_card_body.render(ITEMS=''.join(toolItems))
+    character_card_body = character_card_body.render(ITEMS=''.join(characterItems))
+    
+    card_bodies = {
+        'accessories-cards.mw': accessory_card_body,
+        'materials-cards.mw': material_card_body,
+        'pets-cards.mw': pet_card_body,
+        'tools-cards.mw': tool_card_body,
+        'characters-cards.mw': character_card_body,
+    }
     
-    with open(os.path.join(script_dir, '..', 'wiki', 'materials-cards.mw'), 'w', encoding='utf-8') as f:
-        f.write(material_card_body)
-        
-    with open(os.path.join(script_dir, '..', 'wiki', 'pets-cards.mw'), 'w', encoding='utf-8') as f:
-        f.write(pet_card_body)
-        
-    with open(os.path.join(script_dir, '..', 'wiki', 'tools-cards.mw'), 'w', encoding='utf-8') as f:
-        f.write(tool_card_body)
-        
-    with open(os.path.join(script_dir, '..', 'wiki', 'characters-cards.mw'), 'w', encoding='utf-8') as f:
-        f.write(character_card_body)
+    for file_name, card_body in card_bodies.items():
+        if only is not None and file_name not in only:
+            continue
+        output.write(os.path.join(script_dir, '..', 'wiki', file_name), card_body)
         
-    print('Generated accessory cards.')
-    print('Generated material cards.')
-    print('Generated pet cards.')
-    print('Generated tool cards.')
-    print('Generated character cards.')
+    log.info('Generated accessory cards.')
+    log.info('Generated material cards.')
+    log.info('Generated pet cards.')
+    log.info('Generated tool cards.')
+    log.info('Generated character cards.')
 
 # template is
 # Containers
@@ -1166,13 +1504,13 @@ def generate_cards_lists(items):
 #   Assorted Goodie Bag
 #   - table
 
-loot_table_template = """\
+loot_table_template = Template("""\
 = Containers =
 <CONTAINERS>
-"""
+""")
 
 # before the table is the image and name of the container
-loot_table_container_template = """\
+loot_table_container_template = Template("""\
 == <CONTAINER> ==
 
 {| class="wikitable sortable mw-collapsible" style="min-width: 300px;"
@@ -1183,17 +1521,17 @@ loot_table_container_template = """\
 <ITEMS>\
 |}
 
-"""
+""")
 
 # image and name, rarity, diffuse value
-loot_table_item_template = """\
+loot_table_item_template = Template("""\
 |-
 | {{Item | name = <NAME>}}
 | <RARITY>
 | <DIFFUSE>
-"""
+""")
 
-loot_table_card_container_template = """\
+loot_table_card_container_template = Template("""\
 == <CONTAINER> ==
 
 {| class="wikitable sortable mw-collapsible" style="width: 100%"
@@ -1201,16 +1539,16 @@ loot_table_card_container_template = """\
 <CARDS>\
 |}
 
-"""
+""")
 
-loot_table_card_card_container_template = """\
+loot_table_card_card_container_template = Template("""\
 |-
 | <div class="card-container">\
 <ITEMS>
 </div>
-"""
+""")
 
-loot_source_page_template = """\
+loot_source_page_template = Template("""\
 [[Category:Loot Sources]]<PROMOCATEGORY><EXTRACATEGORIES>
 {{Infobox
 | name = <NAME>
@@ -1223,181 +1561,652 @@ loot_source_page_template = """\
 <div class="card-container left-align">\
 <ITEMS>
 </div>
-"""
+""")
 
 
 
-def generate_loot_table_page(items):
-    """Generate the loot table page for the items in the items list based on their sources."""
-    # loot_table = loot_table_template
-    # loot_card_template = rarity_card_template
-    # containers = []
+def render_drop_cards(drops):
+    """Render the rarity card of each drop, as shown on the loot source pages.
     
-    # for source in sources:
-    #     new_container = loot_table_container_template
-    #     new_container = replace_text(new_container, '<CONTAINER>', source.name)
-    #     new_container = replace_text(new_container, '<CONTAINERHYPHEN>', format_name(source.name))
-        
-    #     items_rows = []
-        
-    #     for item in items:
-    #         if source in item.sources:
-    #             new_item = loot_card_template
-    #             new_item = replace_text(new_item, '<NAME>', item.name)
-    #             new_item = replace_text(new_item, '<RARITY>', item.rarity)
-    #             if item.value == 0 or item.value == None:
-    #                 new_item = replace_text(new_item, '<DIFFUSE>', 'Cannot be diffused')
-    #             else:
-    #                 new_item = replace_text(new_item, '<DIFFUSE>', f'{item.value} MP')
-    #             items_rows.append(new_item)
-                
-    #     new_container = replace_text(new_container, '<ITEMS>', ''.join(items_rows))
-    #     containers.append(new_container)
-        
-    # loot_table = replace_text(loot_table, '<CONTAINERS>', ''.join(containers))
+    Args:
+        drops (list): The (name, rarity) of each item a source drops, in the order to show them.
+    """
+    return [render_rarity_card(name, rarity) for name, rarity in drops]
+
+def render_loot_table_container(source_name, drops, cards=None):
+    """Render a source's section of the loot table.
     
-    # with card container instead of table
-    loot_table = loot_table_template
-    loot_card_template = rarity_card_template
-    containers = []
+    Args:
+        source_name (str): The name of the source.
+        drops (list): The (name, rarity) of each item the source drops, in the order to show them.
+        cards (list): The drops' cards from render_drop_cards(), if they're already rendered.
+    """
+    if cards is None:
+        drops = list(drops)
+        cards = render_drop_cards(drops)
     
-    for source in sources:
-        # if the source is the marketplace, skip it
-        if source.name == 'Marketplace':
-            continue
+    items_rows = []
+    for (name, rarity), card in zip(drops, cards):
+        # if the item's name is P?t Ch?ck?n, replace the name with Pet Chicken
+        if name == 'P?t Ch?ck?n':
+            card = render_rarity_card(name, rarity, 'Pet_Chicken')
+        items_rows.append(card)
         
-        new_container = loot_table_card_container_template
-        new_container = replace_text(new_container, '<CONTAINER>', source.name)
-        new_container = replace_text(new_container, '<CONTAINERHYPHEN>', format_name(source.name))
-        
-        items_rows = []
-        
-        # sort items by rarity, then by name
-        sorted_items = sorted(items, key=lambda x: (rarity_order[x.rarity.lower()], x.name))
-        
-        for item in sorted_items:
-            if source in item.sources:
-                new_item = loot_card_template
-                new_item = replace_text(new_item, '<NAME>', item.name)
-                new_item = replace_text(new_item, '<RARITY>', item.rarity)
-                # if the item's name is P?t Ch?ck?n, replace the name with Pet Chicken
-                if item.name == 'P?t Ch?ck?n':
-                    new_item = replace_text(new_item, '<NAMEHYPHENED>', 'Pet_Chicken')
-                else:
-                    new_item = replace_text(new_item, '<NAMEHYPHENED>', format_name(item.name))
-                items_rows.append(new_item)
-                
-        # merge item_rows into loot_table_card_card_container_template
-        new_container = replace_text(new_container, '<CARDS>', loot_table_card_card_container_template)
-                
-        new_container = replace_text(new_container, '<ITEMS>', ''.join(items_rows))
-        containers.append(new_container)
-        
-    loot_table = replace_text(loot_table, '<CONTAINERS>', ''.join(containers))    
+    # merge item_rows into loot_table_card_card_container_template
+    cards = loot_table_card_card_container_template.render(ITEMS=''.join(items_rows))
+    
+    return loot_table_card_container_template.render(CONTAINER=source_name, CONTAINERHYPHEN=slug(source_name), CARDS=cards)
+
+def render_loot_source_page(source, drops, cards=None):
+    """Render the page for a loot source.
     
-    with open(os.path.join(script_dir, '..', 'wiki', 'loot-table.mw'), 'w', encoding='utf-8') as f:
-        f.write(loot_table)
+    Args:
+        source (Source): The source to render the page for.
+        drops (list): The (name, rarity) of each item the source drops, in the order to show them.
+        cards (list): The drops' cards from render_drop_cards(), if they're already rendered.
+    """
+    extra_categories = ''
+    if source.categories:
+        log.debug(f'{source.name} has categories: {source.categories}')
         
-    print('Generated loot table page.')
+        extra_categories = ''.join([f'[[Category:{category}]]' for category in source.categories])
+    
+    if cards is None:
+        cards = render_drop_cards(drops)
+    
+    page = loot_source_page_template.render({
+        'NAME': source.name,
+        'NAMEHYPHENED': slug(source.name),
+        'PROMOCATEGORY': '[[Category:Promos]]' if source.promo else '',
+        'EXTRACATEGORIES': extra_categories,
+        'ITEMS': ''.join(cards),
+    })
+    
+    # add trivia to the source page
+    if source.trivia:
+        page += '\n== Trivia ==\n\n' + '\n'.join(source.trivia)
+    
+    return page
+
+def group_drops_by_source(views):
+    """Group the items by the sources that drop them.
+    
+    The items are taken already sorted by rarity and then by name, so each source's
+    drops come out in that order, in time linear in the number of drops.
+    
+    Returns a dict of the (name, rarity) of each item a source drops, keyed by Source.
+    """
+    drops_by_source = {}
+    for item in views.by_rank:
+        for source in dict.fromkeys(item.sources):
+            drops_by_source.setdefault(source, []).append((item.name, item.rarity))
+    return drops_by_source
 
-def generate_loot_source_pages(items):
-    # create the sources directory if it doesn't exist
+def generate_loot_pages(views, table=True, pages=True, only=None):
+    """Generate the loot table page and the loot source pages in one pass over the sources.
+    
+    Each source's drops are looked up in one shared grouping and their cards are
+    rendered once for both outputs.
+    
+    Args:
+        views (CatalogViews): The items sorted by rarity, to look for in each source.
+        table (bool): Whether to write the loot table page.
+        pages (bool): Whether to write the loot source pages.
+        only (set): The names of the sources to write pages for. Writes every source page if None.
+    """
+    drops_by_source = group_drops_by_source(views)
+    
     sources_dir = os.path.join(script_dir, '..', 'wiki', 'sources')
-    if not os.path.exists(sources_dir):
-        os.makedirs(sources_dir)
-        
+    
+    containers = []
     for source in sources:
         # if the source is the marketplace, skip it
         if source.name == 'Marketplace':
             continue
         
-        new_template = loot_source_page_template
-        new_template = replace_text(new_template, '<NAME>', source.name)
-        new_template = replace_text(new_template, '<NAMEHYPHENED>', format_name(source.name))
-        
-        new_template = replace_text(new_template, '<PROMOCATEGORY>', '[[Category:Promos]]' if source.promo else '')
-        
-        extra_categories = ''
-        if source.categories:
-            print(f'{source.name} has categories: {source.categories}')
-            
-            extra_categories = ''.join([f'[[Category:{category}]]' for category in source.categories])
-        new_template = replace_text(new_template, '<EXTRACATEGORIES>', extra_categories)
-        
-        items_rows = []
-        
-        # sort items by rarity, then by name
-        sorted_items = sorted(items, key=lambda x: (rarity_order[x.rarity.lower()], x.name))        
+        write_page = pages and (only is None or source.name in only)
+        if not table and not write_page:
+            continue
         
-        for item in sorted_items:
-            if source in item.sources:
-                new_item = rarity_card_template
-                new_item = replace_text(new_item, '<NAME>', item.name)
-                new_item = replace_text(new_item, '<RARITY>', item.rarity)
-                new_item = replace_text(new_item, '<NAMEHYPHENED>', format_name(item.name))
-                
-                items_rows.append(new_item)
-                
-        new_template = replace_text(new_template, '<ITEMS>', ''.join(items_rows))
+        drops = drops_by_source.get(source, [])
+        cards = render_drop_cards(drops)
         
-        # add trivia to the source page
-        trivia_text = ''
-        if source.trivia:
-            trivia_text = '\n== Trivia ==\n\n' + '\n'.join(source.trivia)
-            new_template += trivia_text
+        if table:
+            containers.append(render_loot_table_container(source.name, drops, cards))
         
-        with open(os.path.join(sources_dir, f'{format_name(source.name)}.mw'), 'w', encoding='utf-8') as f:
-            f.write(new_template)
+        if write_page:
+            output.write(os.path.join(sources_dir, f'{slug(source.name)}.mw'), render_loot_source_page(source, drops, cards), title=source.name)
+    
+    if table:
+        output.write(os.path.join(script_dir, '..', 'wiki', 'loot-table.mw'), loot_table_template.render(CONTAINERS=''.join(containers)))
         
-    print(f'Generated loot source pages for {len(sources) - 1} sources.')
+        log.info('Generated loot table page.')
+    
+    if pages:
+        log.info(f'Generated loot source pages for {len(sources) - 1} sources.')
+
+def generate_loot_table_page(views):
+    """Generate the loot table page, listing the items each source drops."""
+    generate_loot_pages(views, pages=False)
+
+def generate_loot_source_pages(views, only=None):
+    """Generate a page for every loot source, listing the items it drops.
+    
+    Args:
+        views (CatalogViews): The items sorted by rarity, to look for in each source.
+        only (set): The names of the sources to write pages for. Writes every source page if None.
+    """
+    generate_loot_pages(views, table=False, only=only)
 
 
 # generate sources.json
-def generate_sources_json():
-    # structure:
-    # {
-    #     "sources": [
-    #         {
-    #             "name": "source name",
-    #             "drops": ["item1", "item2", ...]
-    #         }
-    #     ]
-    # }
-    # output to data/generated_sources.json
+def generate_sources_json(items, sources):
+    """Write each source and the items it drops to data/sources.json, for other tools to read.
+    
+    The sources are sorted by name and their drops by rarity, then by name:
+    {"sources": [{"name": "source name", "drops": ["item1", "item2", ...]}]}
+    
+    Args:
+        items (list): The items, whose names the drops are matched against.
+        sources (list): The sources, with the names of the items they drop.
+    """
+    # an item is listed once for each item with its name, and the rarity used to sort a
+    # name is that of the first item with it
+    item_counts = {}
+    item_rarities = {}
+    for item in items:
+        item_counts[item.name] = item_counts.get(item.name, 0) + 1
+        item_rarities.setdefault(item.name, item.rarity)
+    
+    # collect the drops of each source in one pass, merging any sources with the same name
+    drops_by_source = {}
+    for source in sources:
+        counters['index_hits'] += len(source.drops)
+        drops = [name for name in dict.fromkeys(source.drops) for _ in range(item_counts.get(name, 0))]
+        if drops:
+            drops_by_source.setdefault(source.name, []).extend(drops)
+    
+    rarity_ranks = {}
+    for drops in drops_by_source.values():
+        for name in drops:
+            if name not in rarity_ranks:
+                rarity_ranks[name] = rarity_order[item_rarities[name].lower()]
+    
     sources_json = {
-        "sources": []
+        "sources": [
+            {"name": name, "drops": sorted(drops, key=lambda x: (rarity_ranks[x], x))}
+            for name, drops in sorted(drops_by_source.items(), key=lambda x: x[0])
+        ]
     }
     
-    # load moonbounceplus.json and loop through every item to get the sources
-    item_data = None
-    with open('data/moonbounceplus.json', 'r', encoding='utf-8') as f:
-        item_data = json.load(f)
-        item_data = item_data['items']
+    output.write(os.path.join(script_dir, '..', 'data', 'sources.json'), json.dumps(sources_json, indent=4), pages=0)
+
+
+#endregion
+
+#region Validation
+def validate_catalog(catalog, wiki_metadata):
+    """Check every reference between the data files in one pass over the catalog's indexes.
+    
+    Args:
+        catalog (Catalog): The catalog, with its quests attached.
+        wiki_metadata (WikiMetadata): The wiki data, to check its names against the catalog.
+    
+    Returns a ValidationReport of every problem found.
+    """
+    report = ValidationReport()
+    
+    # items
+    item_ids = {}
+    untyped = {}
+    for item in catalog.items:
+        if catalog.items_by_name[item.name] is not item:
+            report.warning(f'There is more than one item named {item.name!r}, so only the first one gets a page')
+        if item_ids.setdefault(item.id, item.name) != item.name:
+            report.warning(f'Items {item_ids[item.id]!r} and {item.name!r} share the id {item.id}')
+        if item_page_path(item) is None:
+            untyped.setdefault(item.type, []).append(item.name)
+        if item.rarity.lower() not in rarity_order:
+            report.error(f'Item {item.name!r} has the rarity {item.rarity!r}, which isn\'t one of: {", ".join(rarity_order)}')
+    for item_type, names in untyped.items():
+        report.warning(f'{len(names)} items of type {item_type!r} have no page, as the type isn\'t one of: {", ".join(page_types)}: '
+                       f'{", ".join(names)}')
+    
+    # every wiki page is named by format_name(), whichever folder it's written to
+    report.check_collisions(
+        itertools.chain((item.name for item in catalog.items if item_page_path(item)),
+                        (source.name for source in catalog.sources if source.name != 'Marketplace')),
+        format_name,
+        lambda page_name, names: f'{", ".join(map(repr, names))} all have the page name {page_name}')
+    
+    # recipes
+    for recipe in catalog.recipes:
+        if recipe.result not in catalog.items_by_name:
+            report.warning(f'The recipe for {recipe.result!r} makes something that isn\'t an item')
+        report.check_names(recipe.ingredients, catalog.items_by_name,
+                           lambda name: f'The recipe for {recipe.result!r} uses the ingredient {name!r}, which isn\'t an item')
+        report.check_names(recipe.tools, catalog.items_by_name,
+                           lambda name: f'The recipe for {recipe.result!r} uses the tool {name!r}, which isn\'t an item')
+    
+    for cycle in RecipeGraph(catalog.recipes).cycles:
+        report.warning(f'The recipes for {", ".join(map(repr, cycle))} need each other, so they can\'t be broken down into raw materials')
+    
+    # marketplace
+    report.check_names((mp_item.name for mp_item in catalog.marketplace_items), catalog.items_by_name,
+                       lambda name: f'The marketplace sells {name!r}, which isn\'t an item')
+    report.check_names((mp_recipe.name for mp_recipe in catalog.marketplace_recipes), catalog.recipes_by_result,
+                       lambda name: f'The marketplace sells the recipe for {name!r}, which no recipe makes')
+    
+    # quests
+    quests.validate_quests(catalog.quests, report, item_names=catalog.items_by_name, recipe_results=catalog.recipes_by_result)
+    
+    # wiki data, which is matched by normalized name
+    item_names = {normalize_name(item.name) for item in catalog.items}
+    source_names = {normalize_name(source.name) for source in catalog.sources}
+    quest_names = {normalize_name(quest.quest_name) for quest in catalog.quests}
+    report.check_names(wiki_metadata.items, item_names,
+                       lambda name: f'wiki_data.json has an entry for the item {name!r}, which isn\'t an item')
+    report.check_names(wiki_metadata.sources, source_names,
+                       lambda name: f'wiki_data.json has an entry for the source {name!r}, which no item drops from')
+    report.check_names(wiki_metadata.quests, quest_names,
+                       lambda name: f'wiki_data.json has an entry for the quest {name!r}, which isn\'t a quest')
+    
+    return report
+
+#endregion
+
+#region Incremental Builds
+def build_dependency_graph(catalog, include_quests=False):
+    """Build the graph of which data each wiki output is rendered from.
+    
+    Inputs are hashed per record, so a change to one item, recipe, source, quest or
+    wiki_data entry only invalidates the outputs that actually use it.
+    
+    Args:
+        catalog (Catalog): The catalog, with its quests attached.
+        include_quests (bool): Whether to add the quest pages quests.py writes. The
+            incremental build leaves them out, as it never renders them.
+    """
+    graph = DependencyGraph()
+    
+    # every output depends on the scripts that render it and their settings
+    script_hashes = {}
+    for script_name in ('generateWikiArticleTemplate.py', 'templating.py', 'recipe_graph.py'):
+        with open(os.path.join(script_dir, script_name), 'rb') as f:
+            script_hashes[script_name] = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    graph.add_input('build', {'scripts': script_hashes, 'recipes_enabled': recipes_enabled, 'usages_enabled': usages_enabled,
+                              'total_materials_enabled': total_materials_enabled})
+    
+    for item in catalog.items:
+        graph.add_input(f'item:{item.name}', {
+            'id': item.id,
+            'name': item.name,
+            'description': item.description,
+            'type': item.type,
+            'value': item.value,
+            'rarity': item.rarity,
+            'uuid': item.uuid,
+            'sources': [source.name for source in item.sources],
+        })
+        graph.add_input(f'wiki_item:{item.name}', {
+            'trivia': item.trivia,
+            'promo': item.promo,
+            'categories': item.categories,
+            'gallery': item.gallery,
+            'appearance': item.appearance,
+        })
+    
+    # recipes are keyed by their result so adding a recipe doesn't shift every other key
+    recipe_keys = {}
+    for result, result_recipes in catalog.recipes_by_result.items():
+        for index, recipe in enumerate(result_recipes):
+            key = f'recipe:{result}:{index}'
+            recipe_keys[id(recipe)] = key
+            graph.add_input(key, {'result': recipe.result, 'ingredients': recipe.ingredients, 'tools': recipe.tools, 'type': recipe.type})
+    
+    for source in catalog.sources:
+        graph.add_input(f'source:{source.name}', {'promo': source.promo, 'trivia': source.trivia, 'categories': source.categories})
+    
+    for quest in catalog.quests:
+        graph.add_input(f'quest:{quest.quest_id}', quests.convert_to_json(quest))
+    
+    # the Total Materials section depends on the whole crafting tree, so it's tracked by the bill it shows
+    bills = {}
+    if total_materials_enabled:
+        bills = (recipe_graph or RecipeGraph(catalog.recipes, {item.name: item.value for item in catalog.items})).bills()
+        for name, bill in bills.items():
+            graph.add_input(f'materials:{name}', {'materials': bill.materials, 'tools': bill.tools, 'value': bill.value, 'unvalued': bill.unvalued})
+    
+    # item pages
+    for item in catalog.items:
+        page_path = item_page_path(item)
+        if page_path is None:
+            continue
         
-    for item in items:
-        for source in sources:
-            if item.name in source.drops:
-                # check if the source is already in the sources_json
-                source_json = next((s for s in sources_json['sources'] if s['name'] == source.name), None)
-                if not source_json:
-                    source_json = {
-                        "name": source.name,
-                        "drops": []
-                    }
-                    sources_json['sources'].append(source_json)
-                
-                source_json['drops'].append(item.name)
-                
-    # sort the sources alphabetically
-    sources_json['sources'].sort(key=lambda x: x['name'])
+        keys = ['build', f'item:{item.name}', f'wiki_item:{item.name}']
+        keys += [f'source:{source.name}' for source in item.sources]
+        keys += [recipe_keys[id(recipe)] for recipe in catalog.recipes_for(item.name)]
+        if total_materials_enabled and item.name in bills:
+            keys.append(f'materials:{item.name}')
+            keys += [f'item:{tool}' for tool in bills[item.name].tools if tool in catalog.items_by_name]
+        keys += [recipe_keys[id(recipe)] for recipe in catalog.recipes_using(item.name)]
+        keys += [f'quest:{quest.quest_id}' for quest in catalog.quests_rewarding(item.name)]
+        keys += [f'quest:{quest.quest_id}' for quest in catalog.quests_requiring(item.name)]
+        graph.add_output(page_path, keys)
+    
+    graph.add_output('recipes.mw', ['build'] + list(recipe_keys.values()))
+    
+    # group the items by type and by source in one pass
+    items_by_type = {}
+    items_by_source = {}
+    for item in catalog.items:
+        items_by_type.setdefault(item.type.lower(), []).append(item)
+        for source in dict.fromkeys(item.sources):
+            items_by_source.setdefault(source.name, []).append(item)
+    
+    # tables and card lists
+    for item_type, types in type_to_types_dict.items():
+        if item_type == 'unknown':
+            continue
+        
+        type_items = items_by_type.get(item_type, [])
+        keys = ['build'] + [f'item:{item.name}' for item in type_items]
+        graph.add_output(f'{types.lower()}-table.mw', keys)
+        
+        # character cards show whether the character can be crafted
+        if item_type == 'character':
+            keys += [recipe_keys[id(recipe)] for item in type_items for recipe in catalog.recipes_for(item.name)]
+        graph.add_output(f'{types.lower()}-cards.mw', keys)
+    
+    # loot table and loot source pages
+    loot_keys = ['build']
+    for source in catalog.sources:
+        if source.name == 'Marketplace':
+            continue
+        
+        keys = ['build', f'source:{source.name}']
+        keys += [f'item:{item.name}' for item in items_by_source.get(source.name, [])]
+        graph.add_output(f'sources/{slug(source.name)}.mw', keys)
+        loot_keys += keys
+    graph.add_output('loot-table.mw', loot_keys)
+    
+    if include_quests:
+        add_quest_outputs(graph, catalog.quests)
+    
+    return graph
+
+def add_quest_outputs(graph, quest_list):
+    """Add the quest pages and the quest list to a dependency graph, along with the quests' wiki data.
+    
+    A quest page shows the names of its prerequisites, so it depends on those quests too.
+    """
+    with open(quests.__file__, 'rb') as f:
+        graph.add_input('quests_build', hashlib.blake2b(f.read(), digest_size=16).hexdigest())
     
-    # sort the drops in each source by rarity, then by name
-    for source in sources_json['sources']:
-        source['drops'].sort(key=lambda x: (rarity_order[next((i.rarity for i in items if i.name == x), 'Common').lower()], x))
+    quest_keys = {}
+    for quest in quest_list:
+        quest_keys.setdefault(quest.quest_id, f'quest:{quest.quest_id}')
+        graph.add_input(f'wiki_quest:{quest.quest_name}', {'trivia': quest.trivia, 'promo': quest.promo})
+    
+    for quest in quest_list:
+        keys = ['quests_build', f'quest:{quest.quest_id}', f'wiki_quest:{quest.quest_name}']
+        keys += [quest_keys[prerequisite] for prerequisite in quest.prerequisites if prerequisite in quest_keys]
+        graph.add_output(quests.quest_page_path(quest), keys)
+    
+    graph.add_output('quests.mw', ['quests_build'] + list(quest_keys.values()))
+
+#endregion
+
+#region Streaming Builds
+# a placeholder value that splits a rendered template around the part that is streamed into it
+stream_marker = '\0'
+
+def stream_template(f, template, key, parts, values=None):
+    """Write a template to a file with one placeholder filled by parts that are written as they're made.
+    
+    Args:
+        f (file): The file to write to.
+        template (Template): The template to render. It must not collapse blank lines.
+        key (str): The placeholder the parts go in, such as 'ITEMS'.
+        parts (iterable): The rendered parts, joined without a separator.
+        values (dict): The values of the other placeholders.
+    """
+    head, tail = template.render({**(values or {}), key: stream_marker}).split(stream_marker)
+    f.write(head)
+    for part in parts:
+        f.write(part)
+    f.write(tail)
+
+class SpillCatalog:
+    """A class with the lookups of a Catalog, answered from indexes kept on disk instead of lists in memory.
+    
+    The streaming build fills the indexes from the data files one record at a time,
+    then renders every page from them, so memory use stays flat however many items
+    there are. Only the lookups used while rendering pages are supported.
+    
+    Attributes
+        store : SpillStore
+            The database the indexes are kept in.
+        item_count : int
+            The number of items indexed.
+        recipe_count : int
+            The number of recipes indexed.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.item_count = 0
+        self.recipe_count = 0
+        
+        self.marketplace = store.index('marketplace')
+        self.wiki_items = store.index('wiki_items')
+        self.wiki_sources = store.index('wiki_sources')
+        self.recipes_by_result = store.index('recipes_by_result')
+        self.recipes_by_usage = store.index('recipes_by_usage')
+        self.recipes_by_type = store.index('recipes_by_type')
+        self.quests_by_reward = store.index('quests_by_reward')
+        self.quests_by_requirement = store.index('quests_by_requirement')
+        self.drops_by_source = store.index('drops_by_source')
+        self.items_by_type = store.index('items_by_type')
+        self.characters_by_id = store.index('characters_by_id')
+    
+    def index_data(self, data_path, marketplace_data_path, wiki_data_path, quests_data_path):
+        """Read the data files into the indexes, one record at a time."""
+        for mp_item in iter_json_array(marketplace_data_path, ('marketplace', 'items')):
+            self.marketplace.add(mp_item['name'], True)
+        
+        for wiki_item in iter_json_array(wiki_data_path, 'items'):
+            self.wiki_items.add(normalize_name(wiki_item['name']), wiki_item)
+        for wiki_source in iter_json_array(wiki_data_path, 'sources'):
+            self.wiki_sources.add(normalize_name(wiki_source['name']), wiki_source)
+        
+        # recipes are kept in file order under each key, the same as the Catalog's lists
+        for recipe in iter_json_array(data_path, 'recipes'):
+            value = [recipe['result'], recipe['ingredients'], recipe['tools'], recipe['type']]
+            self.recipes_by_result.add(recipe['result'], value)
+            self.recipes_by_type.add(recipe['type'], value)
+            for ingredient in dict.fromkeys(recipe['ingredients']):
+                self.recipes_by_usage.add(ingredient, value)
+            for tool in dict.fromkeys(recipe['tools']):
+                self.recipes_by_usage.add(tool, value)
+            self.recipe_count += 1
+        
+        for quest in iter_json_array(quests_data_path):
+            for reward_name in dict.fromkeys(reward['item_name'] for reward in quest['rewards'] or []):
+                self.quests_by_reward.add(reward_name, quest['quest_name'])
+            for required_item in quest['required_items'] or []:
+                self.quests_by_requirement.add(required_item['item_name'], quest['quest_name'])
+        
+        for item in iter_json_array(data_path, 'items'):
+            name = item['name']
+            rarity = item['rarity'].lower().capitalize()
+            item_type = item['type'].lower()
+            
+            # each source lists its drops by rarity, then by name
+            for source_name in dict.fromkeys(item['sources']):
+                self.drops_by_source.add(source_name, [name, rarity], order=(rarity_order[rarity.lower()], name))
+            
+            self.items_by_type.add(item_type, [item['id'], name, rarity, item['description']], order=(name,))
+            if item_type == 'character':
+                self.characters_by_id.add(item_type, [item['id'], name, rarity, item['description']], order=(int(item['id']), name))
+            self.item_count += 1
+        
+        self.store.flush()
+    
+    def get_source(self, name):
+        """Get a Source with its wiki data attached."""
+        source = Source(name)
+        wiki_source = self.wiki_sources.first(normalize_name(name))
+        if wiki_source:
+            source.promo = wiki_source['promo']
+            source.trivia = wiki_source['trivia']
+            source.categories = wiki_source['categories']
+        return source
+    
+    def iter_sources(self):
+        """Yield every source that drops an item, in name order."""
+        for name in self.drops_by_source.keys():
+            yield self.get_source(name)
+    
+    def drops(self, source_name):
+        """Yield the (name, rarity) of each item a source drops, by rarity and then by name."""
+        for name, rarity in self.drops_by_source.values(source_name):
+            yield name, rarity
+    
+    def iter_items(self, data_path):
+        """Yield each item in the data file as an Item, with its sources and wiki data attached."""
+        for item in iter_json_array(data_path, 'items'):
+            item_sources = [self.get_source(source_name) for source_name in item['sources']]
+            
+            # check if the item is in the marketplace
+            if item['name'] in self.marketplace:
+                item_sources.append(Source('Marketplace'))
                 
-    with open(os.path.join(script_dir, '..', 'data', 'sources.json'), 'w', encoding='utf-8') as f:
-        json.dump(sources_json, f, indent=4)
+            new_item = Item(item['id'], item['name'], item['description'], item['type'], item['value'], item['rarity'], item_sources, item['uuid'])
+            
+            wiki_item = self.wiki_items.first(normalize_name(item['name']))
+            if wiki_item:
+                new_item.trivia = wiki_item['trivia']
+                new_item.promo = wiki_item['promo']
+                new_item.categories = wiki_item['categories']
+                new_item.gallery = wiki_item['gallery']
+                new_item.appearance = wiki_item['appearance']
+            
+            yield new_item
+    
+    def iter_recipes(self, type):
+        """Yield the recipes of a type in file order."""
+        for value in self.recipes_by_type.values(type):
+            yield Recipe(*value)
+    
+    def has_recipe(self, name):
+        """Check if there is a recipe that creates the named item."""
+        counters['index_hits'] += 1
+        return name in self.recipes_by_result
+    
+    def recipes_for(self, name):
+        """Get the recipes that create the named item."""
+        counters['index_hits'] += 1
+        return [Recipe(*value) for value in self.recipes_by_result.values(name)]
+    
+    def recipes_using(self, name):
+        """Get the recipes that use the named item as an ingredient or a tool."""
+        counters['index_hits'] += 1
+        return [Recipe(*value) for value in self.recipes_by_usage.values(name)]
+    
+    def quests_rewarding(self, name):
+        """Get the quests that reward the named item."""
+        counters['index_hits'] += 1
+        return [quests.Quest(quest_name=quest_name) for quest_name in self.quests_by_reward.values(name)]
+    
+    def quests_requiring(self, name):
+        """Get the quests that require the named item, once per requirement."""
+        counters['index_hits'] += 1
+        return [quests.Quest(quest_name=quest_name) for quest_name in self.quests_by_requirement.values(name)]
+    
+    def __str__(self):
+        return f'{self.item_count} items and {self.recipe_count} recipes in {self.store.path}'
+
+# the table and card list files for each item type, as written by generate_page_tables() and generate_cards_lists()
+stream_page_tables = {
+    'accessory': ('accessories-table.mw', accessoriesPageTableTemplate, accessoriesPageTableItemTemplate),
+    'material': ('materials-table.mw', materialsPageTableTemplate, materialsPageTableItemTemplate),
+    'pets': ('pets-table.mw', petsPageTableTemplate, petsPageTableItemTemplate),
+    'tool': ('tools-table.mw', toolsPageTableTemplate, toolsPageTableItemTemplate),
+    'character': ('characters-table.mw', characterPageTableTemplate, characterPageTableItemTemplate),
+}
+stream_card_lists = {
+    'accessory': ('accessories-cards.mw', accessoryCardBodyTemplate, accessoryCardItemTemplate),
+    'material': ('materials-cards.mw', materialCardBodyTemplate, materialCardItemTemplate),
+    'pet': ('pets-cards.mw', petCardBodyTemplate, petCardItemTemplate),
+    'tool': ('tools-cards.mw', toolCardBodyTemplate, toolCardItemTemplate),
+    'character': ('characters-cards.mw', characterCardBodyTemplate, characterCardItemTemplate),
+}
 
+def stream_cards(item_type, item_template):
+    """Render the cards of an item type one at a time from the spilled catalog, ordering characters by id and the rest by name."""
+    index = catalog.characters_by_id if item_type == 'character' else catalog.items_by_type
+    for item_id, name, rarity, description in index.values(item_type):
+        values = {'NAME': name, 'RARITY': rarity.lower(), 'NAMEHYPHENED': slug(name)}
+        if item_type == 'character':
+            values['DESCRIPTION'] = description
+            values['ID'] = item_id
+            values['HAS_RECIPE'] = '|craftable=Yes' if catalog.has_recipe(name) else ''
+        yield item_template.render(values)
+
+def stream_build(data_path, marketplace_data_path, wiki_data_path, quests_data_path, spill_path=None):
+    """Build every wiki page straight from the data files, holding only one record and one page in memory at a time.
+    
+    The cross references between items, recipes, quests and sources are spilled to
+    a temporary SQLite database, and each page is written as soon as it's rendered.
+    
+    Args:
+        spill_path (str): Where to keep the database. A temporary file is used if None.
+    """
+    global catalog
+    wiki_dir = os.path.join(script_dir, '..', 'wiki')
+    
+    with SpillStore(spill_path) as store:
+        catalog = SpillCatalog(store)
+        catalog.index_data(data_path, marketplace_data_path, wiki_data_path, quests_data_path)
+        log.info(f'Indexed {catalog}.')
+        
+        log.info(f'Generating wiki articles. Recipes: {recipes_enabled}, Usages: {usages_enabled}')
+        for item in catalog.iter_items(data_path):
+            write_item_page(item)
+        
+        with output.open(os.path.join(wiki_dir, 'recipes.mw')) as f:
+            for index, type in enumerate(sort_recipe_types(catalog.recipes_by_type.keys())):
+                if index > 0:
+                    f.write('\n\n\n')
+                rows = (render_recipe_row(recipe) for recipe in catalog.iter_recipes(type))
+                stream_template(f, recipe_table_template, 'RECIPE_ROWS', rows, {'TYPENAME': recipe_type_display(type)})
+        log.info('Generated recipe table.')
+        
+        for item_type, (file_name, body_template, item_template) in stream_page_tables.items():
+            rows = (item_template.render(NAME=name, RARITY=rarity, NAMEFORMATTED=slug(name))
+                    for item_id, name, rarity, description in catalog.items_by_type.values(item_type))
+            with output.open(os.path.join(wiki_dir, file_name)) as f:
+                stream_template(f, body_template, 'ITEMS', rows)
+        log.info('Generated page tables.')
+        
+        for item_type, (file_name, body_template, item_template) in stream_card_lists.items():
+            with output.open(os.path.join(wiki_dir, file_name)) as f:
+                stream_template(f, body_template, 'ITEMS', stream_cards(item_type, item_template))
+        log.info('Generated card lists.')
+        
+        with output.open(os.path.join(wiki_dir, 'loot-table.mw')) as f:
+            containers = (render_loot_table_container(source.name, catalog.drops(source.name))
+                          for source in catalog.iter_sources() if source.name != 'Marketplace')
+            stream_template(f, loot_table_template, 'CONTAINERS', containers)
+        log.info('Generated loot table page.')
+        
+        source_count = 0
+        for source in catalog.iter_sources():
+            if source.name == 'Marketplace':
+                continue
+            write_page(f'sources/{slug(source.name)}.mw', render_loot_source_page(source, catalog.drops(source.name)), title=source.name)
+            source_count += 1
+        log.info(f'Generated loot source pages for {source_count} sources.')
 
 #endregion
 
@@ -1429,55 +2238,243 @@ def update_readme():
     if script_version == readme_version:
         return
     
-    print(f'Updating README version {readme_version} -> {script_version}')
+    log.info(f'Updating README version {readme_version} -> {script_version}')
     
     # update the version in the README.md
     readme = readme.replace(readme_version, f'{script_version}')
     
     # save the updated README.md
-    with open(os.path.join(script_dir, '..', 'README.md'), 'w', encoding='utf-8') as f:
-        f.write(readme)    
+    output.write(os.path.join(script_dir, '..', 'README.md'), readme, pages=0)
 
 #endregion
 
-#endregion
+#region Command Line
+# the stages a build can run, in the order they run in
+stage_names = ['articles', 'recipes', 'cards', 'tables', 'loot', 'quests', 'images', 'sources', 'readme']
+
+# the stages run when none are named: everything except the quest pages, which quests.py normally makes
+default_stages = ['articles', 'recipes', 'cards', 'tables', 'loot', 'images', 'sources', 'readme']
+
+# the stages that write the pages tracked by the incremental build manifest
+wiki_stages = ['articles', 'recipes', 'cards', 'tables', 'loot']
+
+# the data each stage reads: the whole catalog, the recipes alone, or nothing from the data files
+stage_data = {
+    'articles': 'catalog',
+    'recipes': 'recipes',
+    'cards': 'catalog',
+    'tables': 'catalog',
+    'loot': 'catalog',
+    'quests': None,         # quests.py loads its own data
+    'images': 'catalog',
+    'sources': 'catalog',
+    'readme': None,
+}
 
-if __name__ == '__main__':
-    # Initialize the lists to store the items, recipes, and sources
-    items, recipes, sources = load_data(data_path, marketplace_data_path)
+def generate_wiki_pages(stages, views, tracer, dirty=None, jobs=1):
+    """Run the stages that write the wiki pages, rendering only the given pages if any are given.
     
-    initial_items = items.copy()
+    Args:
+        stages (list): The names of the stages to run. Stages that aren't in wiki_stages are left to the caller.
+        views (CatalogViews): The items and recipes of the loaded catalog.
+        tracer (instrumentation.Tracer): The tracer to time each stage with.
+        dirty (set): The paths of the pages to render, relative to the wiki folder. Every page is rendered if None.
+        jobs (int): The number of processes to render the item pages with.
+    """
+    if 'articles' in stages:
+        with tracer.stage('generate_wiki_articles'):
+            if dirty is None:
+                generate_wiki_articles(items, jobs=jobs)
+            else:
+                generate_wiki_articles([item for item in items if item_page_path(item) in dirty], jobs=jobs)
     
-    # load quests from the JSON file
-    quest_data = quests.load_quests(quests_data_path)
+    if 'recipes' in stages and (dirty is None or 'recipes.mw' in dirty):
+        with tracer.stage('generate_recipe_table'):
+            generate_recipe_table(views)
     
-    print(f'Loaded {len(items)} items and {len(recipes)} recipes.')
-    print(f'Loaded {len(sources)} sources.')
+    if 'cards' in stages:
+        with tracer.stage('generate_cards_lists'):
+            generate_cards_lists(views, only=dirty)
     
-    # print the number of each type of item in the items list
-    print(f'Accessories: {len([item for item in items if item.type == "Accessory"])}')
-    print(f'Materials: {len([item for item in items if item.type == "Material"])}')
-    print(f'Pets: {len([item for item in items if item.type == "Pet"])}')
-    print(f'Tools: {len([item for item in items if item.type == "Tool"])}')
-    print(f'Characters: {len([item for item in items if item.type == "Character"])}')
+    if 'tables' in stages:
+        with tracer.stage('generate_page_tables'):
+            generate_page_tables(views, only=dirty)
     
-    generate_wiki_articles(items)
+    if 'loot' in stages:
+        with tracer.stage('generate_loot_pages'):
+            if dirty is None:
+                generate_loot_pages(views)
+            else:
+                generate_loot_pages(views, table='loot-table.mw' in dirty,
+                                    only={source.name for source in sources if f'sources/{slug(source.name)}.mw' in dirty})
+
+def build_wiki(stages, tracer, jobs=1, incremental=False, use_cache=True, validate=True):
+    """Run the given stages of the build, loading only the data they need.
     
-    generate_recipe_table(recipes)
+    Args:
+        stages (list): The names of the stages to run, from stage_names. They always run in the order of stage_names.
+        tracer (instrumentation.Tracer): The tracer to time each stage with.
+        jobs (int): The number of processes to render the item and quest pages with.
+        incremental (bool): Whether to only render the wiki pages whose data changed since the last incremental build.
+        use_cache (bool): Whether to load the catalog from the cache when the data files haven't changed.
+        validate (bool): Whether to check the data files for broken references before rendering, stopping on errors.
+    """
+    # the generators read the catalog, items and sources from the module
+    global catalog, items, sources
+    
+    needs = {stage_data[stage] for stage in stages}
+    if incremental and any(stage in wiki_stages for stage in stages):
+        # working out which pages changed needs everything they're rendered from
+        needs.add('catalog')
+    
+    if 'catalog' in needs:
+        # Build the catalog of items, recipes, sources and quests, or load it from the cache
+        with tracer.stage('load_catalog'):
+            catalog, cached = load_catalog(use_cache=use_cache)
+        items, recipes, sources = catalog.items, catalog.recipes, catalog.sources
+        build_slug_table(catalog)
+        if cached:
+            log.info('Loaded the catalog from the cache.')
+        
+        # check every reference between the data files before anything is rendered, reporting every problem at once
+        if validate:
+            with tracer.stage('validate_data'):
+                validate_catalog(catalog, WikiMetadata.load(wiki_data_path)).raise_for_errors()
+        
+        # partition the items and recipes once for every generator
+        with tracer.stage('build_views'):
+            views = CatalogViews(items, recipes)
+        
+        log.info(f'Loaded {len(items)} items and {len(recipes)} recipes.')
+        log.info(f'Loaded {len(sources)} sources.')
+        
+        # print the number of each type of item in the items list
+        log.info(f'Accessories: {len(views.items_of_type("accessory"))}')
+        log.info(f'Materials: {len(views.items_of_type("material"))}')
+        log.info(f'Pets: {len(views.items_of_type("pet"))}')
+        log.info(f'Tools: {len(views.items_of_type("tool"))}')
+        log.info(f'Characters: {len(views.items_of_type("character"))}')
+    elif 'recipes' in needs:
+        with tracer.stage('load_recipes'):
+            recipes = load_recipes(data_path)
+            views = CatalogViews([], recipes)
+        log.info(f'Loaded {len(recipes)} recipes.')
+    
+    # the Total Materials section needs every item's raw materials, worked out once for the whole build
+    if total_materials_enabled and 'articles' in stages:
+        with tracer.stage('build_recipe_graph'):
+            build_recipe_graph(catalog)
+        log.info(f'Built the recipe graph of {recipe_graph}.')
+    
+    # work out which pages need rendering, None meaning all of them
+    dirty = None
+    if incremental and 'catalog' in needs:
+        with tracer.stage('dirty_outputs'):
+            graph = build_dependency_graph(catalog)
+            manifest = BuildManifest.load(manifest_path)
+            dirty = manifest.dirty_outputs(graph, wiki_path)
+        log.info(f'Incremental build: {len(dirty)} of {len(graph.dependencies)} pages need rendering.')
+    
+    generate_wiki_pages(stages, views, tracer, dirty=dirty, jobs=jobs)
     
     # sort items by name
-    items.sort(key=lambda x: x.name)    
-    
-    # generate_page_tables(items)
-    generate_cards_lists(items)
+    if 'catalog' in needs:
+        items.sort(key=lambda x: x.name)
+    
+    if dirty is not None:
+        # the manifest records every page as up to date, so it can only be saved once they all are
+        if all(stage in stages for stage in wiki_stages):
+            with tracer.stage('save_manifest'):
+                manifest.update(graph)
+                manifest.save()
+        else:
+            log.info('Not saving the incremental build manifest, as only some of the wiki pages were rendered.')
     
-    generate_page_tables(items)
-    generate_loot_table_page(items)
+    if 'quests' in stages:
+        with tracer.stage('quests'):
+            # the catalog stages loaded the same wiki data, which the quests reuse rather than parse again,
+            # and already checked the quests if they ran
+            quests.build_quest_wiki(tracer, jobs=jobs, wiki_metadata=WikiMetadata.load(wiki_data_path),
+                                    validate=validate and 'catalog' not in needs)
     
-    generate_loot_source_pages(items)
+    if 'images' in stages:
+        with tracer.stage('download_images'):
+            download_images(items)
     
-    download_images(items)
+    if 'sources' in stages:
+        # output the sources to a file, already sorted alphabetically
+        with tracer.stage('write_sources_list'):
+            write_sources_list(sources)
+        
+        with tracer.stage('generate_sources_json'):
+            generate_sources_json(items, sources)
     
-    generate_sources_json()
+    if 'readme' in stages:
+        with tracer.stage('update_readme'):
+            update_readme()
     
-    update_readme()
\ No newline at end of file
+    rendered = counters['fragment_hits'] + counters['fragment_misses']
+    if rendered:
+        log.info(f'Took {counters["fragment_hits"]} of {rendered} cards from the fragment cache.')
+
+#endregion
+
+#endregion
+
+if __name__ == '__main__':
+    # the cached catalog pickles its classes by module name, so run as the importable module rather than __main__,
+    # letting the script and anything importing it share the cache, and unpickle into this copy of the classes
+    sys.modules.setdefault('generateWikiArticleTemplate', sys.modules['__main__'])
+    for value in list(globals().values()):
+        if isinstance(value, type) and value.__module__ == '__main__':
+            value.__module__ = 'generateWikiArticleTemplate'
+    
+    parser = argparse.ArgumentParser(description='Generate the Moonbounce wiki pages from the data files.')
+    parser.add_argument('stages', nargs='*', metavar='stage',
+                        help=f'The stages to run, any of: {", ".join(stage_names)}. Runs every stage except quests if none are given.')
+    parser.add_argument('--incremental', action='store_true', help='Only render the pages whose data changed since the last incremental build.')
+    parser.add_argument('--jobs', type=int, default=1, help='The number of processes to render pages with.')
+    parser.add_argument('--no-cache', action='store_true', help='Load the data files directly instead of using the cached catalog.')
+    parser.add_argument('--total-materials', action='store_true',
+                        help='Add a Total Materials section to the item pages, with every raw material and tool in the item\'s crafting tree.')
+    parser.add_argument('--no-validate', action='store_true', help='Render even if the data files have broken references that would normally stop the build.')
+    parser.add_argument('--stream', action='store_true', help='Render every page straight from the data files with bounded memory, for very large catalogs.')
+    output_writer.add_arguments(parser)
+    instrumentation.add_arguments(parser, os.path.join(cache_path, 'reports', 'generateWikiArticleTemplate.json'))
+    args = parser.parse_args()
+    
+    # checked here rather than with choices=, which rejects an empty list of stages
+    unknown_stages = [stage for stage in args.stages if stage not in stage_names]
+    if unknown_stages:
+        parser.error(f'unknown stage {unknown_stages[0]!r}, choose from {", ".join(stage_names)}')
+    if args.stream and args.stages:
+        parser.error('--stream always renders the whole wiki, so it can\'t be combined with stages')
+    if args.stream and args.total_materials:
+        parser.error('--total-materials needs every recipe in memory, so it can\'t be combined with --stream')
+    if args.archive and args.incremental:
+        parser.error('--incremental needs the pages of the last build in the wiki folder, so it can\'t be combined with --archive')
+    if args.archive and output_writer.archive_format_of(args.archive) is None:
+        parser.error(f'--archive must end in one of: {", ".join(output_writer.archive_formats)}')
+    
+    if args.archive:
+        output.open_archive(args.archive)
+    total_materials_enabled = args.total_materials
+    
+    # time every stage, writing the run report at the end even if a stage fails
+    tracer = instrumentation.start_run('generateWikiArticleTemplate', args)
+    try:
+        if args.stream:
+            # the streaming build writes the wiki pages only, without the images or sources.json
+            with tracer.stage('stream_build'):
+                stream_build(data_path, marketplace_data_path, wiki_data_path, quests_data_path)
+            with tracer.stage('update_readme'):
+                update_readme()
+        else:
+            build_wiki(args.stages or default_stages, tracer, jobs=args.jobs, incremental=args.incremental,
+                       use_cache=not args.no_cache, validate=not args.no_validate)
+    except ValidationError as e:
+        log.error(str(e))
+        sys.exit(1)
+    finally:
+        output.close()
+        instrumentation.finish_run(tracer, args)
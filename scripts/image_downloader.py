@@ -0,0 +1,298 @@
+# A concurrent, rate-limited image downloader for the item sprites
+
+import io
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import log
+
+# https://moonbounce.gg/images/fp/<UUID>/c/f/preview.png
+default_base_url = 'https://moonbounce.gg'
+image_path_template = '/images/fp/{uuid}/c/f/preview.png'
+
+# responses worth retrying, everything else is treated as a permanent failure
+retry_statuses = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """A thread-safe token bucket that limits how often requests are started.
+
+    Attributes
+        rate : float
+            The number of tokens added per second.
+        capacity : float
+            The most tokens the bucket can hold, which is the largest burst allowed.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, waiting until one is available."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class DownloadJournal:
+    """An append-only record of finished downloads, so an interrupted run can pick up where it stopped.
+
+    Each line is a JSON object with the key of the download and the path it was saved to.
+
+    Attributes
+        path : str
+            The path of the journal file.
+        completed : dict
+            The saved path of each finished download, keyed by download key.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.completed = {}
+        self.lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # the last line may be cut short if the run was killed mid-write
+                        continue
+                    self.completed[entry['key']] = entry['path']
+
+    def is_done(self, key):
+        """Check if the download finished in this run or an earlier one, and its file still exists."""
+        path = self.completed.get(key)
+        return path is not None and os.path.exists(path)
+
+    def record(self, key, path):
+        """Record a finished download."""
+        with self.lock:
+            self.completed[key] = path
+
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'key': key, 'path': path}) + '\n')
+
+
+class DownloadJob:
+    """A single file to download.
+
+    Attributes
+        key : str
+            A unique key for the download, such as the image's UUID.
+        url : str
+            The URL to download from.
+        path : str
+            The path to save the file to.
+        name : str
+            A readable name for the download, used in messages.
+    """
+    def __init__(self, key, url, path, name=None):
+        self.key = key
+        self.url = url
+        self.path = path
+        self.name = name if name is not None else key
+
+    def __str__(self):
+        return f'{self.name} ({self.url})'
+
+
+class ImageDownloader:
+    """A class to download many images over a pooled session with bounded concurrency.
+
+    Requests are paced by a token bucket, retried with exponential backoff, streamed
+    to disk in chunks and recorded in a journal once they finish.
+
+    Attributes
+        base_url : str
+            The site to download the images from.
+        concurrency : int
+            The most downloads running at the same time.
+        retries : int
+            How many times to retry a failed download.
+        backoff : float
+            The delay before the first retry, in seconds. It doubles with every retry.
+        timeout : float
+            The connect and read timeout for each request, in seconds.
+        chunk_size : int
+            The number of bytes written to disk at a time.
+    """
+    def __init__(self, base_url=default_base_url, concurrency=4, rate=4.0, retries=3, backoff=1.0, timeout=10, chunk_size=64 * 1024, journal_path=None):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+
+        self.bucket = TokenBucket(rate, capacity=concurrency)
+        self.journal = DownloadJournal(journal_path) if journal_path else None
+
+        # reuse connections across downloads, with one pooled connection per worker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def image_url(self, uuid):
+        """Get the URL of the preview image for a UUID."""
+        return self.base_url + image_path_template.format(uuid=uuid)
+
+    def download(self, job):
+        """Download a single job to its path, retrying on timeouts, connection errors and server errors.
+
+        Returns True if the file was downloaded or already in the journal.
+        """
+        if self.journal and self.journal.is_done(job.key):
+            return True
+
+        if not self._request(job, lambda response: self._save(response, job.path)):
+            return False
+
+        if self.journal:
+            self.journal.record(job.key, job.path)
+        return True
+
+    def fetch(self, job):
+        """Download a single job into memory, with the same pacing and retries as download().
+
+        Returns the downloaded bytes, or None if the download failed.
+        """
+        result = {}
+
+        def read(response):
+            buffer = io.BytesIO()
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                buffer.write(chunk)
+            result['data'] = buffer.getvalue()
+
+        if not self._request(job, read):
+            return None
+        return result['data']
+
+    def download_all(self, jobs):
+        """Download every job, a few at a time.
+
+        Returns the jobs that were downloaded and the jobs that failed, each in the order given.
+        """
+        jobs = list(jobs)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(self.download, jobs))
+
+        downloaded = [job for job, ok in zip(jobs, results) if ok]
+        failed = [job for job, ok in zip(jobs, results) if not ok]
+        return downloaded, failed
+
+    def fetch_all(self, jobs, handle):
+        """Download every job into memory, a few at a time, passing each one to a handler as it arrives.
+
+        Jobs already in the journal are skipped. The handler is called as handle(job, data)
+        from the download threads, so it should hand the work off rather than do it inline.
+
+        Returns the jobs that failed, in the order given.
+        """
+        jobs = [job for job in jobs if not (self.journal and self.journal.is_done(job.key))]
+
+        def fetch_and_handle(job):
+            data = self.fetch(job)
+            if data is None:
+                return False
+            handle(job, data)
+            return True
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(fetch_and_handle, jobs))
+
+        return [job for job, ok in zip(jobs, results) if not ok]
+
+    def _request(self, job, consume):
+        """Request a job's URL and pass the response to consume, retrying as needed.
+
+        Returns True if the response was consumed.
+        """
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+
+            retry_after = None
+            try:
+                with self.session.get(job.url, stream=True, timeout=self.timeout) as response:
+                    if response.status_code in retry_statuses:
+                        retry_after = response.headers.get('Retry-After')
+                        raise requests.exceptions.HTTPError(f'{response.status_code} response', response=response)
+                    response.raise_for_status()
+
+                    consume(response)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError, requests.exceptions.HTTPError) as e:
+                status = e.response.status_code if e.response is not None else None
+                if status is not None and status not in retry_statuses:
+                    log.warning(f'Failed to download {job}: {e}')
+                    return False
+                if attempt == self.retries:
+                    log.error(f'Gave up on {job} after {attempt + 1} attempts: {e}')
+                    return False
+
+                time.sleep(self._retry_delay(attempt, retry_after))
+                continue
+            except requests.exceptions.RequestException as e:
+                log.warning(f'Failed to download {job}: {e}')
+                return False
+
+            return True
+
+        return False
+
+    def close(self):
+        self.session.close()
+
+    def _save(self, response, path):
+        """Stream the response body to a temporary file, then move it into place."""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        temp_path = path + '.part'
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _retry_delay(self, attempt, retry_after=None):
+        """Get how long to wait before the next attempt, with a little jitter."""
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,127 @@
+# In-memory sprite processing: decode each download once, then write WebP and fixed-size variants
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    # Pillow is optional, download_images() falls back to saving the PNGs as they are
+    Image = None
+    ImageOps = None
+
+from instrumentation import log
+
+# the sizes the generated wiki markup asks for: 64x64 in recipe rows and 80x80 in the loot tables
+variant_sizes = {
+    '64x64': (64, 64),
+    '80x80': (80, 80),
+}
+
+
+def has_pillow():
+    """Check if Pillow is installed."""
+    return Image is not None
+
+
+def variant_path(path, variant):
+    """Get the path of a sized variant, in a folder named after the size next to the full image.
+
+    e.g. images/tool/Hammer.webp -> images/tool/64x64/Hammer.webp
+    """
+    directory, file_name = os.path.split(path)
+    return os.path.join(directory, variant, file_name)
+
+
+def encode_sprite(data, sizes=None):
+    """Decode an image once and encode it, and each sized variant, as lossless WebP.
+
+    Variants keep the sprite's aspect ratio within the size and use nearest-neighbour
+    scaling so the pixel art stays sharp.
+
+    Args:
+        data (bytes): The downloaded image.
+        sizes (dict): The variants to make, as {name: (width, height)}. Defaults to variant_sizes.
+
+    Returns a dict of encoded images, with the full size image under the key None.
+    """
+    if sizes is None:
+        sizes = variant_sizes
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert('RGBA')
+
+    encoded = {None: _encode_webp(image)}
+    for name, size in sizes.items():
+        encoded[name] = _encode_webp(ImageOps.contain(image, size, Image.Resampling.NEAREST))
+    return encoded
+
+
+def save_sprite(data, path, sizes=None):
+    """Encode a downloaded image and write the WebP and its variants to disk.
+
+    Returns the number of bytes written.
+    """
+    written = 0
+    for variant, encoded in encode_sprite(data, sizes).items():
+        save_path = path if variant is None else variant_path(path, variant)
+
+        directory = os.path.dirname(save_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        with open(save_path, 'wb') as f:
+            f.write(encoded)
+        written += len(encoded)
+
+    return written
+
+
+def _encode_webp(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='WEBP', lossless=True)
+    return buffer.getvalue()
+
+
+class SpriteEncoder:
+    """A process pool that encodes downloaded sprites in parallel with the downloads.
+
+    Attributes
+        workers : int
+            The number of encoding processes. Defaults to the number of CPUs.
+        sizes : dict
+            The variants to make for each sprite.
+    """
+    def __init__(self, workers=None, sizes=None):
+        self.workers = workers
+        self.sizes = sizes if sizes is not None else variant_sizes
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.pending = []
+
+    def submit(self, key, data, path):
+        """Queue a downloaded image to be encoded and saved to the path."""
+        self.pending.append((key, path, self.executor.submit(save_sprite, data, path, self.sizes)))
+
+    def wait(self):
+        """Wait for every queued image, returning the (key, path) of each one saved and each one that failed."""
+        saved = []
+        failed = []
+        for key, path, future in self.pending:
+            try:
+                future.result()
+                saved.append((key, path))
+            except Exception as e:
+                log.warning(f'Failed to encode {path}: {e}')
+                failed.append((key, path))
+        self.pending = []
+        return saved, failed
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,385 @@
+# Run instrumentation for the build scripts: stage timing, hot-path counters, a buffered logger and run reports
+
+import atexit
+import collections
+import contextlib
+import cProfile
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:
+    # the resource module is Unix only, so peak RSS isn't reported on Windows
+    resource = None
+
+# Counters bumped directly by the hot paths, e.g. counters['template_substitutions'] += 1.
+# Stages record how much each counter grew while they ran.
+#   pages_rendered:          wiki pages written
+#   bytes_written:           bytes written to any output file
+#   files_written:           output files written
+#   files_skipped:           output files left alone because their contents hadn't changed
+#   bytes_skipped:           bytes in the output files left alone
+#   template_substitutions:  placeholders filled in by Template.render()
+#   index_hits:              catalog, quest and wiki data lookups, all answered by a hash index rather than a list scan
+#   fragment_hits:           cards taken from a FragmentCache instead of being rendered
+#   fragment_misses:         cards rendered and added to a FragmentCache
+#   fragment_evictions:      cards dropped from a full FragmentCache
+#   warnings_logged:         warnings logged, such as failed image downloads, whether or not the log level shows them
+#   errors_logged:           errors logged, whether or not the log level shows them
+counters = collections.Counter()
+
+#region Counters
+def counters_since(snapshot):
+    """Get how much each counter has grown since a snapshot taken with dict(counters).
+
+    Worker processes return this so their counts can be added to the parent's.
+    """
+    return {key: value - snapshot.get(key, 0) for key, value in counters.items() if value != snapshot.get(key, 0)}
+
+def peak_rss():
+    """Get the most memory the process has held so far in bytes, or None if it isn't available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+#endregion
+
+#region Logging
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+level_names = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+
+
+class Logger:
+    """A class to write leveled log messages to the console in batches.
+
+    Messages below the level are dropped before they are formatted when the caller
+    checks enabled() first, and the rest are held in a buffer and written together,
+    so a run doesn't pay for a console write per message. Warnings and errors are
+    written straight away.
+
+    Attributes
+        level : int
+            The lowest level of message that is kept.
+        buffer_size : int
+            The number of messages held before they are written.
+        buffer : list
+            The messages waiting to be written.
+    """
+    def __init__(self, level=INFO, buffer_size=256):
+        self.level = level
+        self.buffer_size = buffer_size
+        self.buffer = []
+
+    def enabled(self, level):
+        """Check if messages of the given level are kept."""
+        return level >= self.level
+
+    def log(self, level, message):
+        # counted whatever the level, so the run report shows the problems a quiet run hid
+        if level >= ERROR:
+            counters['errors_logged'] += 1
+        elif level >= WARNING:
+            counters['warnings_logged'] += 1
+        if level < self.level:
+            return
+        self.buffer.append(message)
+        if level >= WARNING or len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def debug(self, message):
+        self.log(DEBUG, message)
+
+    def info(self, message):
+        self.log(INFO, message)
+
+    def warning(self, message):
+        self.log(WARNING, message)
+
+    def error(self, message):
+        self.log(ERROR, message)
+
+    @contextlib.contextmanager
+    def muted(self, level=WARNING):
+        """Drop the messages below a level inside the with block, such as the progress messages of a render nobody reads."""
+        previous = self.level
+        self.level = max(self.level, level)
+        try:
+            yield
+        finally:
+            self.level = previous
+
+    def flush(self):
+        """Write the buffered messages."""
+        if not self.buffer:
+            return
+        # swap the buffer out before writing it, so messages logged by other threads meanwhile aren't lost or written twice
+        buffer, self.buffer = self.buffer, []
+        # look the stream up now, so redirecting stdout also redirects the log
+        stream = sys.stdout
+        stream.write('\n'.join(buffer) + '\n')
+        stream.flush()
+
+    def discard(self):
+        """Drop the buffered messages, e.g. the copy a forked worker process inherits."""
+        self.buffer = []
+
+    def __str__(self):
+        return f'Logger at level {self.level} with {len(self.buffer)} buffered messages'
+
+
+log = Logger()
+atexit.register(log.flush)
+
+#endregion
+
+#region Tracing
+class Stage:
+    """A class to represent one timed run of a stage.
+
+    Attributes
+        name : str
+            The name of the stage.
+        depth : int
+            The number of stages it ran inside of.
+        start : float
+            The seconds from the start of the run to the start of the stage.
+        seconds : float
+            The wall-clock time the stage took.
+        cpu_seconds : float
+            The CPU time the process spent in the stage.
+        peak_rss : int
+            The most memory the process had held by the end of the stage, in bytes.
+        peak_traced : int
+            The most memory allocated by Python during the stage, in bytes, if memory tracing is on.
+        counters : dict
+            How much each counter grew during the stage.
+        profile : str
+            The path of the stage's cProfile output, if profiling is on.
+        status : str
+            'ok', or the error that stopped the stage.
+    """
+    __slots__ = ('name', 'depth', 'start', 'seconds', 'cpu_seconds', 'peak_rss', 'peak_traced', 'counters', 'profile', 'status')
+
+    def __init__(self, name, depth, start):
+        self.name = name
+        self.depth = depth
+        self.start = start
+        self.seconds = None
+        self.cpu_seconds = None
+        self.peak_rss = None
+        self.peak_traced = None
+        self.counters = {}
+        self.profile = None
+        self.status = 'running'
+
+    def to_json(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __str__(self):
+        return f'{self.name}: {self.seconds:.3f}s wall, {self.cpu_seconds:.3f}s CPU, {self.status}'
+
+
+class Tracer:
+    """A class to time the stages of a run and write a report of them.
+
+    Stages can be nested. Each one records its wall and CPU time, the process's peak
+    memory and how much each of the counters grew. With memory tracing on, each stage
+    also records the most memory Python allocated while it ran, at the cost of slower
+    allocations. With profiling on, each outermost stage is run under cProfile and its
+    stats are saved to a .prof file, which can be opened with pstats or snakeviz.
+
+    Attributes
+        name : str
+            The name of the run, used in the report and the profile file names.
+        trace_memory : bool
+            Whether to trace Python's allocations for each stage's peak memory.
+        profile_dir : str
+            The folder to save the profiles in, or None to not profile.
+        stages : list
+            Every finished stage, in the order they started.
+    """
+    def __init__(self, name, trace_memory=False, profile_dir=None):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.stages = []
+
+        self.started_at = datetime.now(timezone.utc)
+        self.start_time = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.start_counters = dict(counters)
+        self.open_stages = []   # (stage, peak traced so far) for each stage still running
+        self.profiler = None
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time the code run inside the with block as a stage."""
+        log.flush()
+        stage = Stage(name, len(self.open_stages), time.perf_counter() - self.start_time)
+        self.stages.append(stage)
+
+        if self.trace_memory:
+            self._carry_peak()
+            tracemalloc.reset_peak()
+        self.open_stages.append([stage, 0])
+
+        profiler = None
+        if self.profile_dir and self.profiler is None:
+            profiler = self.profiler = cProfile.Profile()
+
+        snapshot = dict(counters)
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield stage
+            stage.status = 'ok'
+        except BaseException as e:
+            stage.status = f'error: {type(e).__name__}: {e}'
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+                self.profiler = None
+                stage.profile = self._save_profile(profiler, stage)
+
+            stage.seconds = time.perf_counter() - start
+            stage.cpu_seconds = time.process_time() - cpu_start
+            stage.counters = counters_since(snapshot)
+            stage.peak_rss = peak_rss()
+            if self.trace_memory:
+                self._carry_peak()
+                tracemalloc.reset_peak()
+                stage.peak_traced = self.open_stages[-1][1]
+            self.open_stages.pop()
+
+            log.flush()
+            log.debug(f'Stage {stage}')
+
+    def _carry_peak(self):
+        """Record the traced peak so far in every running stage, before it's reset for a new measurement."""
+        peak = tracemalloc.get_traced_memory()[1]
+        for entry in self.open_stages:
+            entry[1] = max(entry[1], peak)
+
+    def _save_profile(self, profiler, stage):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        file_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', f'{self.name}-{stage.name}') + '.prof'
+        path = os.path.join(self.profile_dir, file_name)
+        profiler.dump_stats(path)
+        return path
+
+    def report(self):
+        """Get the report of the run so far as a dict that can be written as JSON."""
+        return {
+            'run': self.name,
+            'started': self.started_at.isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'seconds': time.perf_counter() - self.start_time,
+            'cpu_seconds': time.process_time() - self.start_cpu,
+            'peak_rss': peak_rss(),
+            'trace_memory': self.trace_memory,
+            'counters': counters_since(self.start_counters),
+            'stages': [stage.to_json() for stage in self.stages],
+        }
+
+    def write_report(self, path):
+        """Write the report of the run to a JSON file."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=4)
+
+    def write_chrome_trace(self, path):
+        """Write the stages as a Chrome trace event file, which can be opened in chrome://tracing or Perfetto."""
+        pid = os.getpid()
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': self.name}}]
+        for stage in self.stages:
+            if stage.seconds is None:
+                continue
+            events.append({
+                'name': stage.name,
+                'cat': 'stage',
+                'ph': 'X',
+                'ts': round(stage.start * 1e6),
+                'dur': round(stage.seconds * 1e6),
+                'pid': pid,
+                'tid': 0,
+                'args': {'cpu_seconds': stage.cpu_seconds, 'peak_rss': stage.peak_rss,
+                         'peak_traced': stage.peak_traced, 'status': stage.status, **stage.counters},
+            })
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def __str__(self):
+        return f'Tracer for {self.name} with {len(self.stages)} stages'
+
+#endregion
+
+#region Command Line
+def add_arguments(parser, report_path):
+    """Add the instrumentation options to a script's argument parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The script's parser.
+        report_path (str): Where the run report is written by default.
+    """
+    report_path = os.path.normpath(report_path)
+    group = parser.add_argument_group('instrumentation')
+    group.add_argument('--report', default=report_path, help=f'Where to write the JSON run report. Defaults to {report_path}.')
+    group.add_argument('--trace', help='Also write the stages as a Chrome trace event file to this path.')
+    group.add_argument('--trace-memory', action='store_true', help="Record each stage's peak Python memory with tracemalloc, which slows the run down.")
+    group.add_argument('--profile', nargs='?', const=os.path.join(os.path.dirname(report_path), 'profiles'), metavar='DIR',
+                       help='Run each stage under cProfile and save the stats to a folder.')
+    group.add_argument('--log-level', choices=list(level_names), default='info', help='The lowest level of message to print.')
+
+def start_run(name, args):
+    """Set the log level from the parsed arguments and start tracing the run.
+
+    Returns the Tracer, which finish_run() writes the reports of.
+    """
+    log.level = level_names[args.log_level]
+    return Tracer(name, trace_memory=args.trace_memory, profile_dir=args.profile)
+
+def finish_run(tracer, args):
+    """Write the run report, and the Chrome trace if one was asked for."""
+    if args.report:
+        tracer.write_report(args.report)
+    if args.trace:
+        tracer.write_chrome_trace(args.trace)
+
+    # only the tools that rendered pages or wrote files have anything to sum up, e.g. not a snapshot_diff without --render
+    counts = counters_since(tracer.start_counters)
+    seconds = time.perf_counter() - tracer.start_time
+    if counts.get('pages_rendered'):
+        log.info(f'Rendered {counts["pages_rendered"]} pages ({counts.get("bytes_written", 0)} bytes) in {seconds:.2f}s.')
+    elif counts.get('files_written'):
+        log.info(f'Wrote {counts["files_written"]} files ({counts.get("bytes_written", 0)} bytes) in {seconds:.2f}s.')
+    if counts.get('files_skipped'):
+        log.info(f'Left {counts["files_skipped"]} unchanged files ({counts.get("bytes_skipped", 0)} bytes) as they were.')
+    if args.report:
+        log.info(f'Wrote the run report to {os.path.normpath(args.report)}.')
+    log.flush()
+
+#endregion
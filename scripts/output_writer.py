@@ -0,0 +1,374 @@
+# The output files of the build scripts, written once each through a shared writer that skips unchanged files
+
+import contextlib
+import hashlib
+import io
+import os
+import tarfile
+import time
+import zipfile
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+from instrumentation import counters
+
+# paths are relative to the repo, so the archive members are named like the repo's folders
+repo_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+
+archive_formats = {'.zip': 'zip', '.tar': 'tar', '.tar.gz': 'tar.gz', '.tgz': 'tar.gz', '.xml': 'mediawiki'}
+
+
+def hash_bytes(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+def hash_file(path):
+    """Hash a file's contents in chunks, so large outputs are never read whole."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+def encode_text(text):
+    """Encode text the way a file opened in text mode would, with the platform's line endings."""
+    if os.linesep != '\n':
+        text = text.replace('\n', os.linesep)
+    return text.encode('utf-8')
+
+
+class OutputWriter:
+    """A class to write the output files of a build, either to their folders or into one archive.
+
+    Written to folders, a file whose contents haven't changed is left alone, so its
+    modified time stays put for anything syncing the outputs. Changed files are written
+    to a temporary file next to them and renamed over the old one, so a run that's
+    stopped part way never leaves a half written file. Each folder is only created once.
+
+    Written to a zip or tar archive, every file goes into the archive instead, named by
+    its path relative to the repo. Written to a MediaWiki XML dump, every article goes
+    into the dump as it's written, under the title it's written with. The card lists,
+    tables and other fragments written without a title aren't pages of their own, so
+    they still go to their folders, like the data files. Only one process can write to
+    an archive.
+
+    Inside capture(), files are collected in memory instead of written anywhere, so two
+    renders of the same pages can be compared.
+
+    How many files and bytes were written or skipped is kept in the run counters
+    files_written, bytes_written, files_skipped and bytes_skipped.
+
+    Attributes
+        root : str
+            The folder archive members are named relative to.
+        archive_path : str
+            The archive being written to, or None when writing to folders.
+        known_dirs : set
+            The folders already created or known to exist.
+    """
+    def __init__(self, root=repo_dir):
+        self.root = root
+        self.archive_path = None
+        self.known_dirs = set()
+        self._archive = None
+        self._captured = None
+
+    def open_archive(self, path):
+        """Write every output from now on into a zip or tar archive, chosen by the path's extension."""
+        archive_format = archive_format_of(path)
+        if archive_format is None:
+            raise ValueError(f'Unknown archive type for {path}, expected one of: {", ".join(archive_formats)}')
+
+        self.close()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if archive_format == 'mediawiki':
+            self._archive = MediaWikiDump(path)
+        elif archive_format == 'zip':
+            self._archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            self._archive = tarfile.open(path, 'w:gz' if archive_format == 'tar.gz' else 'w')
+        self.archive_path = path
+
+    def close(self):
+        """Finish the archive, if writing to one."""
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+            self.archive_path = None
+
+    def make_dirs(self, directories):
+        """Create every folder that doesn't exist yet, ahead of writing the files in them."""
+        if self._archive is not None or self._captured is not None:
+            return
+        self._make_dirs(directories)
+
+    def _make_dirs(self, directories):
+        for directory in directories:
+            if directory and directory not in self.known_dirs:
+                os.makedirs(directory, exist_ok=True)
+                self.known_dirs.add(directory)
+
+    @contextlib.contextmanager
+    def capture(self):
+        """Collect the files written inside the with block in a dict of their text, keyed by normalized path, instead of writing them."""
+        previous = self._captured
+        self._captured = {}
+        try:
+            yield self._captured
+        finally:
+            self._captured = previous
+
+    def write(self, path, text, pages=1, title=None):
+        """Write a file, unless it already holds the same text.
+
+        Args:
+            path (str): The path of the file.
+            text (str): The contents of the file.
+            pages (int): The number of wiki pages in the file, 0 for data files.
+            title (str): The title of the article in a MediaWiki dump. Pages without one are fragments,
+                         which are written to their folder instead.
+
+        Returns whether the file was written.
+        """
+        if self._captured is not None:
+            self._captured[os.path.normpath(path)] = text
+            return True
+
+        if pages:
+            counters['pages_rendered'] += pages
+
+        if isinstance(self._archive, MediaWikiDump) and pages and title is not None:
+            size = self._archive.add_page(title, text)
+            return self._count_written(size)
+
+        data = encode_text(text)
+        if self._in_archive():
+            self._add_to_archive(path, data=data)
+            return self._count_written(len(data))
+
+        if self._unchanged(path, len(data), lambda: hash_bytes(data)):
+            return self._count_skipped(len(data))
+
+        self._make_dirs([os.path.dirname(path)])
+        temp_path = self._temp_path(path)
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            self._remove(temp_path)
+            raise
+        return self._count_written(len(data))
+
+    @contextlib.contextmanager
+    def open(self, path, pages=1, title=None):
+        """Open a file to write in parts, for outputs too large to hold in memory.
+
+        The parts go to a temporary file, which replaces the file when the with block
+        ends, unless it turns out to hold the same contents.
+
+        Args:
+            path (str): The path of the file.
+            pages (int): The number of wiki pages in the file, 0 for data files.
+            title (str): The title of the article in a MediaWiki dump. Pages without one are fragments,
+                         which are written to their folder instead.
+        """
+        if self._captured is not None:
+            f = io.StringIO()
+            yield f
+            self._captured[os.path.normpath(path)] = f.getvalue()
+            return
+
+        if pages:
+            counters['pages_rendered'] += pages
+
+        to_dump = isinstance(self._archive, MediaWikiDump) and pages and title is not None
+        if self._in_archive() or to_dump:
+            temp_path = os.path.join(os.path.dirname(os.path.abspath(self.archive_path)), f'.{os.path.basename(path)}.{os.getpid()}.tmp')
+        else:
+            self._make_dirs([os.path.dirname(path)])
+            temp_path = self._temp_path(path)
+
+        try:
+            # the dump's text keeps the page's own newlines
+            with open(temp_path, 'w', encoding='utf-8', newline='\n' if to_dump else None) as f:
+                yield f
+
+            size = os.path.getsize(temp_path)
+            if to_dump:
+                self._archive.add_page_file(title, temp_path)
+                self._remove(temp_path)
+                self._count_written(size)
+            elif self._in_archive():
+                self._add_to_archive(path, file_path=temp_path)
+                self._remove(temp_path)
+                self._count_written(size)
+            elif self._unchanged(path, size, lambda: hash_file(temp_path)):
+                self._remove(temp_path)
+                self._count_skipped(size)
+            else:
+                os.replace(temp_path, path)
+                self._count_written(size)
+        except BaseException:
+            self._remove(temp_path)
+            raise
+
+    def _in_archive(self):
+        """Check if files go into a zip or tar archive rather than their folders."""
+        return self._archive is not None and not isinstance(self._archive, MediaWikiDump)
+
+    def _unchanged(self, path, size, new_hash):
+        """Check if the file at the path already has the given size and contents, reading it only when the sizes match."""
+        try:
+            if os.path.getsize(path) != size:
+                return False
+            return hash_file(path) == new_hash()
+        except OSError:
+            return False
+
+    def _add_to_archive(self, path, data=None, file_path=None):
+        name = os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, '/')
+        if isinstance(self._archive, zipfile.ZipFile):
+            if file_path is not None:
+                self._archive.write(file_path, name)
+            else:
+                self._archive.writestr(zipfile.ZipInfo(name, time.localtime()[:6]), data, zipfile.ZIP_DEFLATED)
+            return
+
+        if file_path is not None:
+            info = self._archive.gettarinfo(file_path, name)
+            with open(file_path, 'rb') as f:
+                self._archive.addfile(info, f)
+            return
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = time.time()
+        info.mode = 0o644
+        self._archive.addfile(info, io.BytesIO(data))
+
+    @staticmethod
+    def _temp_path(path):
+        # next to the file, so the rename never crosses file systems
+        return f'{path}.{os.getpid()}.tmp'
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _count_written(size):
+        counters['files_written'] += 1
+        counters['bytes_written'] += size
+        return True
+
+    @staticmethod
+    def _count_skipped(size):
+        counters['files_skipped'] += 1
+        counters['bytes_skipped'] += size
+        return False
+
+    def __str__(self):
+        if self.archive_path:
+            return f'Output writer into {self.archive_path}'
+        return f'Output writer into {self.root}'
+
+
+class MediaWikiDump:
+    """A class to stream wiki pages into a MediaWiki XML export file.
+
+    Each page is written to the file as soon as it's added, so the dump never has to
+    fit in memory. The finished file can be loaded in one go with Special:Import or
+    maintenance/importDump.php.
+
+    Attributes
+        path : str
+            The path of the dump.
+        timestamp : str
+            The revision time given to every page.
+        username : str
+            The name every revision is credited to.
+        comment : str
+            The edit summary of every revision.
+        page_count : int
+            The number of pages written so far.
+    """
+    namespace = 'http://www.mediawiki.org/xml/export-0.11/'
+
+    def __init__(self, path, username='MoonbouncePlus', comment='Generated by the MoonbouncePlus wiki scripts'):
+        self.path = path
+        self.timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        self.username = username
+        self.comment = comment
+        self.page_count = 0
+
+        self.file = open(path, 'w', encoding='utf-8', newline='\n')
+        self.file.write(f'<mediawiki xmlns="{self.namespace}" version="0.11" xml:lang="en">\n')
+
+    def add_page(self, title, text):
+        """Write a page to the dump.
+
+        Returns the size of the page's text in bytes.
+        """
+        size = len(text.encode('utf-8'))
+        self._start_page(title, size)
+        self.file.write(escape(text))
+        self._end_page()
+        return size
+
+    def add_page_file(self, title, file_path):
+        """Write a page to the dump from a file holding its text, a chunk at a time."""
+        size = os.path.getsize(file_path)
+        self._start_page(title, size)
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            for chunk in iter(lambda: f.read(1 << 20), ''):
+                self.file.write(escape(chunk))
+        self._end_page()
+        return size
+
+    def _start_page(self, title, size):
+        self.file.write(
+            '  <page>\n'
+            f'    <title>{escape(title)}</title>\n'
+            '    <ns>0</ns>\n'
+            '    <revision>\n'
+            f'      <timestamp>{self.timestamp}</timestamp>\n'
+            f'      <contributor><username>{escape(self.username)}</username></contributor>\n'
+            f'      <comment>{escape(self.comment)}</comment>\n'
+            '      <model>wikitext</model>\n'
+            '      <format>text/x-wiki</format>\n'
+            f'      <text xml:space="preserve" bytes="{size}">'
+        )
+
+    def _end_page(self):
+        self.file.write('</text>\n    </revision>\n  </page>\n')
+        self.page_count += 1
+
+    def close(self):
+        self.file.write('</mediawiki>\n')
+        self.file.close()
+
+    def __str__(self):
+        return f'MediaWiki dump of {self.page_count} pages in {self.path}'
+
+
+def archive_format_of(path):
+    """Get the archive format for a path from its extension, or None if it isn't an archive."""
+    lower = path.lower()
+    for extension in sorted(archive_formats, key=len, reverse=True):
+        if lower.endswith(extension):
+            return archive_formats[extension]
+    return None
+
+def add_arguments(parser):
+    """Add the output options to a script's argument parser."""
+    group = parser.add_argument_group('output')
+    group.add_argument('--archive', metavar='PATH',
+                       help='Write every output into one .zip, .tar or .tar.gz archive instead of the wiki and data folders, '
+                            'or every wiki article into one MediaWiki .xml import dump.')
+
+
+# the writer shared by every script in the process, like instrumentation.log
+output = OutputWriter()
@@ -0,0 +1,342 @@
+# Ponder across many inventories at once: which recipes each one can craft, how many times, and what's missing
+#
+# This is the userscript's Ponder button, server side and in bulk. The recipes are turned into a
+# sparse recipe x item matrix once, then each batch of inventories is checked against every recipe
+# with a handful of NumPy array operations, rather than a scan of every recipe per inventory.
+#
+# An inventories file is a JSON object of inventories keyed by name, or a JSON array of them.
+# Each inventory is either {item name: count}, or a list like the userscript's inventory export,
+# whose entries are item names or objects with a "name" and an optional "quantity".
+#
+# Usage:
+#   python scripts/ponder.py inventories.json                     summarise what the inventories can craft
+#   python scripts/ponder.py inventories.json --json ponder.json  also write what each one can craft
+
+import argparse
+import json
+import os
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is only needed here, so the wiki scripts run without it
+    np = None
+
+import generateWikiArticleTemplate as wiki
+import instrumentation
+from instrumentation import counters, log
+from output_writer import output
+from wiki_metadata import repo_dir
+
+# inventories are checked this many at a time, so the (inventories x recipes x ingredients)
+# arrays of one batch stay a few tens of MB with the real recipes, however many there are
+default_batch_size = 16384
+
+
+def has_numpy():
+    """Check if NumPy is installed."""
+    return np is not None
+
+
+class RecipeMatrix:
+    """A class to represent the recipes as a sparse recipe x item matrix of what each one needs.
+
+    Every row is a recipe. The items any recipe uses or makes are the columns, in the order
+    they're first seen. As no recipe needs more than a few items, each row is kept as its
+    column indices and quantities, padded to the longest row, rather than as a dense row
+    across every item. Inventories passed to ponder() have the same columns.
+
+    Ingredients are needed once for every time they're listed, and are used up. Tools are
+    needed once and kept, so they allow any number of crafts.
+
+    Attributes
+        recipes : list
+            The Recipe of each row.
+        items : list
+            The name of each column.
+        columns : dict
+            The column of each item, keyed by name.
+        ingredients : numpy.ndarray
+            The columns of each recipe's ingredients, shape (recipes, most ingredients).
+        quantities : numpy.ndarray
+            How many of each ingredient the recipe uses, 0 for padding.
+        tools : numpy.ndarray
+            The columns of each recipe's tools, shape (recipes, most tools).
+        tool_mask : numpy.ndarray
+            Which entries of tools are real tools rather than padding.
+        results : numpy.ndarray
+            The column of each recipe's result.
+    """
+    def __init__(self, recipes):
+        if np is None:
+            raise RuntimeError('NumPy is not installed, so inventories can\'t be pondered. Install it with: pip install numpy')
+
+        self.recipes = list(recipes)
+        self.columns = {}
+        for recipe in self.recipes:
+            for name in (*recipe.ingredients, *recipe.tools, recipe.result):
+                self.columns.setdefault(name, len(self.columns))
+        self.items = list(self.columns)
+
+        # the ingredients of each recipe with how many times they're listed, and its tools once each
+        needs = [self._count(recipe.ingredients) for recipe in self.recipes]
+        tools = [list(dict.fromkeys(self.columns[tool] for tool in recipe.tools)) for recipe in self.recipes]
+
+        self.ingredients, self.quantities = self._pad([list(need) for need in needs], [list(need.values()) for need in needs])
+        self.tools, tool_counts = self._pad(tools, [[1] * len(row) for row in tools])
+        self.tool_mask = tool_counts > 0
+        self.results = np.array([self.columns[recipe.result] for recipe in self.recipes], dtype=np.intp)
+
+        self._ingredient_mask = self.quantities > 0
+        # dividing padding by 1 keeps the division free of zeros, and its result is masked out anyway
+        self._divisors = np.maximum(self.quantities, 1)
+        self._repeats = bool((self.quantities > 1).any())
+
+    def _count(self, names):
+        """Count how many times each name is listed, as column indices."""
+        counts = {}
+        for name in names:
+            column = self.columns[name]
+            counts[column] = counts.get(column, 0) + 1
+        return counts
+
+    @staticmethod
+    def _pad(columns, quantities):
+        """Pad every row to the longest one, with column 0 and a quantity of 0."""
+        width = max((len(row) for row in columns), default=0)
+        column_array = np.zeros((len(columns), width), dtype=np.intp)
+        quantity_array = np.zeros((len(columns), width), dtype=np.int64)
+        for index, (row, quantity_row) in enumerate(zip(columns, quantities)):
+            column_array[index, :len(row)] = row
+            quantity_array[index, :len(quantity_row)] = quantity_row
+        return column_array, quantity_array
+
+    @classmethod
+    def load(cls, data_path=None):
+        """Build the matrix from the recipes in MoonbouncePlus.json."""
+        return cls(wiki.load_recipes(data_path or wiki.data_path))
+
+    def inventory_matrix(self, inventories, dtype=None):
+        """Turn inventories into an (inventories x items) array of counts, with the matrix's columns.
+
+        Items no recipe uses or makes are left out, as they can't change what's craftable.
+
+        Args:
+            inventories (list): Each inventory as {item name: count}, or a list of item names or
+                                objects with a "name" and an optional "quantity", each counting 1
+                                by default.
+            dtype (numpy.dtype): The type of the counts. Defaults to int32.
+        """
+        matrix = np.zeros((len(inventories), len(self.items)), dtype=dtype or np.int32)
+        for row, inventory in enumerate(inventories):
+            for name, count in iter_inventory(inventory):
+                column = self.columns.get(name)
+                if column is not None:
+                    matrix[row, column] += count
+        return matrix
+
+    def ponder(self, inventory, batch_size=default_batch_size):
+        """Work out what every inventory can craft.
+
+        Args:
+            inventory (numpy.ndarray): The counts of each inventory, shape (inventories, items),
+                                       as made by inventory_matrix().
+            batch_size (int): The number of inventories to check at a time.
+
+        Returns a PonderResult.
+        """
+        inventory = np.asarray(inventory)
+        if inventory.ndim != 2 or inventory.shape[1] != len(self.items):
+            raise ValueError(f'Expected inventories of shape (n, {len(self.items)}), got {inventory.shape}')
+
+        if not np.issubdtype(inventory.dtype, np.integer):
+            raise ValueError(f'Expected inventory counts as integers, got {inventory.dtype}')
+
+        # the counts keep the inventory's own type, so a batch of int32 counts is never widened
+        crafts = np.zeros((len(inventory), len(self.recipes)), dtype=inventory.dtype)
+        missing = np.zeros((len(inventory), len(self.recipes)), dtype=inventory.dtype)
+        unlimited = np.iinfo(inventory.dtype).max
+        quantities = self.quantities.astype(inventory.dtype)
+        divisors = self._divisors.astype(inventory.dtype)
+
+        for start in range(0, len(inventory), batch_size):
+            stock = inventory[start:start + batch_size]
+
+            # (inventories, recipes, ingredients): how many of each ingredient is held, and how many crafts that covers
+            held = stock[:, self.ingredients]
+            # integer division is slow, and most recipes list each ingredient once
+            covered = held // divisors if self._repeats else held
+            times = np.where(self._ingredient_mask, covered, unlimited).min(axis=2)
+            short = np.where(self._ingredient_mask, quantities - np.minimum(held, quantities), 0).sum(axis=2, dtype=inventory.dtype)
+
+            # (inventories, recipes, tools): tools only have to be held
+            tools_missing = ((stock[:, self.tools] <= 0) & self.tool_mask).sum(axis=2, dtype=inventory.dtype)
+
+            # a recipe without ingredients can't be crafted from an inventory
+            times[times == unlimited] = 0
+            times[tools_missing > 0] = 0
+            crafts[start:start + batch_size] = times
+            missing[start:start + batch_size] = short + tools_missing
+
+        counters['inventories_pondered'] += len(inventory)
+        held_results = inventory[:, self.results] > 0
+        return PonderResult(self, crafts, missing, held_results)
+
+    def shortfall(self, inventory_row, recipe_index):
+        """Get what one inventory is missing for one craft of a recipe, as {item name: count}.
+
+        Args:
+            inventory_row (numpy.ndarray): One row of an inventory matrix.
+            recipe_index (int): The row of the recipe.
+        """
+        missing = {}
+        for column, quantity in zip(self.ingredients[recipe_index], self.quantities[recipe_index]):
+            if quantity and inventory_row[column] < quantity:
+                missing[self.items[column]] = int(quantity - inventory_row[column])
+        for column, is_tool in zip(self.tools[recipe_index], self.tool_mask[recipe_index]):
+            if is_tool and inventory_row[column] <= 0:
+                missing[self.items[column]] = 1
+        return missing
+
+    def __str__(self):
+        return f'{len(self.recipes)} recipes x {len(self.items)} items'
+
+
+class PonderResult:
+    """A class to hold what a batch of inventories can craft.
+
+    Attributes
+        matrix : RecipeMatrix
+            The recipes the inventories were checked against.
+        crafts : numpy.ndarray
+            How many times each inventory can craft each recipe, shape (inventories, recipes).
+        missing : numpy.ndarray
+            How many items each inventory is short of for one craft of each recipe, counting
+            each missing tool as one.
+        held_results : numpy.ndarray
+            Whether each inventory already holds each recipe's result.
+    """
+    def __init__(self, matrix, crafts, missing, held_results):
+        self.matrix = matrix
+        self.crafts = crafts
+        self.missing = missing
+        self.held_results = held_results
+
+    @property
+    def craftable(self):
+        """Whether each inventory can craft each recipe at least once."""
+        return self.crafts > 0
+
+    @property
+    def new(self):
+        """Whether each inventory can craft each recipe and doesn't hold its result yet, as Ponder suggests."""
+        return (self.crafts > 0) & ~self.held_results
+
+    def crafts_for(self, row):
+        """Get the recipes an inventory can craft, as (recipe, times) pairs."""
+        return [(self.matrix.recipes[index], int(self.crafts[row, index])) for index in np.flatnonzero(self.crafts[row])]
+
+    def near_misses(self, row, most_missing=1):
+        """Get the recipe indices an inventory can't craft but is at most most_missing items short of."""
+        return np.flatnonzero((self.crafts[row] == 0) & (self.missing[row] <= most_missing))
+
+    def __str__(self):
+        craftable = self.craftable
+        return (f'{craftable.any(axis=1).sum()} of {len(self.crafts)} inventories can craft something, '
+                f'{self.new.any(axis=1).sum()} something new')
+
+
+def iter_inventory(inventory):
+    """Get the (item name, count) pairs of an inventory in any of the accepted forms."""
+    if isinstance(inventory, dict):
+        yield from inventory.items()
+        return
+    for entry in inventory:
+        if isinstance(entry, str):
+            yield entry, 1
+        else:
+            yield entry['name'], entry.get('quantity', 1)
+
+def load_inventories(path):
+    """Load an inventories file.
+
+    Returns the name of each inventory and the inventories, in the same order.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return list(data), list(data.values())
+    return [str(index) for index in range(len(data))], data
+
+def report_json(names, matrix, inventory, result):
+    """Get what each inventory can craft as a JSON-serialisable dict, keyed by inventory name."""
+    report = {}
+    new = result.new
+    for row, name in enumerate(names):
+        report[name] = {
+            'craftable': {recipe.result: times for recipe, times in result.crafts_for(row)},
+            'new': [matrix.recipes[index].result for index in np.flatnonzero(new[row])],
+            'one_item_short': {matrix.recipes[index].result: matrix.shortfall(inventory[row], index)
+                               for index in result.near_misses(row)},
+        }
+    return report
+
+def print_summary(matrix, result, top=10):
+    """Print how many inventories can craft anything, and the recipes the most inventories can craft."""
+    print(result)
+    craftable_by = result.craftable.sum(axis=0)
+    new_by = result.new.sum(axis=0)
+    near_by = ((result.crafts == 0) & (result.missing == 1)).sum(axis=0)
+    order = np.argsort(-craftable_by, kind='stable')[:top]
+    if len(order) and craftable_by[order[0]]:
+        print('\nThe recipes the most inventories can craft:')
+        for index in order:
+            if not craftable_by[index]:
+                break
+            print(f'  {matrix.recipes[index]}: {craftable_by[index]} inventories, {new_by[index]} of them new, '
+                  f'{near_by[index]} more one item short')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Work out which recipes each of many inventories can craft.')
+    parser.add_argument('inventories', help='A JSON file of inventories, as an object keyed by name or an array.')
+    parser.add_argument('--json', metavar='PATH', help='Also write what each inventory can craft, is new to it, or is one item short of.')
+    parser.add_argument('--batch-size', type=int, default=default_batch_size, help='The number of inventories to check at a time.')
+    instrumentation.add_arguments(parser, os.path.join(repo_dir, '.cache', 'reports', 'ponder.json'))
+    args = parser.parse_args()
+
+    if not has_numpy():
+        parser.error('NumPy is not installed. Install it with: pip install numpy')
+    if args.batch_size < 1:
+        parser.error('--batch-size must be at least 1')
+
+    tracer = instrumentation.start_run('ponder', args)
+    try:
+        with tracer.stage('build_matrix'):
+            matrix = RecipeMatrix.load()
+        log.info(f'Built the recipe matrix of {matrix}.')
+
+        with tracer.stage('load_inventories'):
+            try:
+                names, inventories = load_inventories(args.inventories)
+                inventory = matrix.inventory_matrix(inventories)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                log.error(f'Could not load {args.inventories}: {e}')
+                sys.exit(1)
+
+        with tracer.stage('ponder'):
+            start = time.perf_counter()
+            result = matrix.ponder(inventory, batch_size=args.batch_size)
+        log.info(f'Pondered {len(inventory)} inventories in {time.perf_counter() - start:.2f}s.')
+        log.flush()
+
+        print_summary(matrix, result)
+
+        if args.json:
+            with tracer.stage('write_report'):
+                output.write(args.json, json.dumps(report_json(names, matrix, inventory, result), indent=4, ensure_ascii=False), pages=0)
+    finally:
+        output.close()
+        instrumentation.finish_run(tracer, args)
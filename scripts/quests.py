@@ -1,14 +1,44 @@
 # open quests.json and remove a series of fields from each quest
 
+import argparse
 import os
 import json
+import sys
 
-quests = []
+import instrumentation
+import output_writer
+from instrumentation import counters, counters_since, log
+from output_writer import output
+from records import Immutable, intern_name
+from templating import Template
+from validation import ValidationError, ValidationReport
+from wiki_metadata import WikiMetadata, repo_dir
+
+# paths are relative to the repo, so the script can be run from any folder
+quests_data_path = os.path.join(repo_dir, "data", "quests.json")
+wiki_path = os.path.join(repo_dir, "wiki")
 
 
 class Quest:
     # contains an id, a quest_id, availability_id, quest_name, quest_description, quest_instance_type, quest_quest_type, quest_tags (array), prerequisites (array containing required_quest_id), availbility (start and end epoch), recurring (boolean), recurring cooldown (hours), required_items (array containing item_id, quantity, and item_name), rewards (array containing item_id, quantity, item_name, and reward_type), and tags (array)
     # initilaise the class with the above attributes all set to None, an empty list, or false
+    __slots__ = (
+        "quest_id",
+        "quest_name",
+        "quest_description",
+        "quest_instance_type",
+        "quest_quest_type",
+        "quest_tags",
+        "prerequisites",
+        "availability",
+        "recurring",
+        "recurring_cooldown",
+        "required_items",
+        "rewards",
+        "tags",
+        "trivia",
+        "promo",
+    )
 
     def __init__(
         self,
@@ -29,7 +59,7 @@ class Quest:
         promo=None,
     ):
         self.quest_id = quest_id
-        self.quest_name = quest_name
+        self.quest_name = intern_name(quest_name)
         self.quest_description = quest_description
         self.quest_instance_type = quest_instance_type
         self.quest_quest_type = quest_quest_type
@@ -62,11 +92,13 @@ class Quest:
         return output
 
 
-class QuestRequiredItem:
+class QuestRequiredItem(Immutable):
+    __slots__ = ("item_id", "quantity", "item_name")
+
     def __init__(self, item_id=None, quantity=None, item_name=None):
-        self.item_id = item_id
-        self.quantity = quantity
-        self.item_name = item_name
+        self._set("item_id", item_id)
+        self._set("quantity", quantity)
+        self._set("item_name", intern_name(item_name))
 
     def __str__(self):
         return f"{self.item_name} x{self.quantity}"
@@ -81,7 +113,9 @@ quest_mp_sizes = {
 }
 
 
-class QuestReward:
+class QuestReward(Immutable):
+    __slots__ = ("item_id", "reward_type", "item_name", "quantity", "recipe_name")
+
     def __init__(
         self,
         item_id=None,
@@ -90,31 +124,30 @@ class QuestReward:
         quantity=None,
         recipe_name=None,
     ):
-        self.item_id = item_id
-        self.reward_type = reward_type
-        self.item_name = item_name
-        self.quantity = quantity
-        self.recipe_name = recipe_name
-
-        self.clean_name = None
-
-    def get_clean_name(self):
+        self._set("item_id", item_id)
+        self._set("reward_type", intern_name(reward_type))
+        self._set("item_name", intern_name(item_name))
+        self._set("quantity", quantity)
+        self._set("recipe_name", intern_name(recipe_name))
+
+    @property
+    def clean_name(self):
         # Change the Clean Name based on the Reward Type
         if self.reward_type == "item":
-            self.clean_name = self.item_name
+            return self.item_name
         elif self.reward_type == "recipe":
-            self.clean_name = f"{self.recipe_name} Recipe"
+            return f"{self.recipe_name} Recipe"
         elif self.reward_type == "quest":
-            self.clean_name = "New Quest!"
+            return "New Quest!"
         elif self.reward_type == "currency":
-            self.clean_name = f"{self.quantity} MP"
+            return f"{self.quantity} MP"
         else:
-            self.clean_name = "Unknown Reward Type: " + self.reward_type
+            return "Unknown Reward Type: " + self.reward_type
 
+    def get_clean_name(self):
         return self.clean_name
 
     def __str__(self):
-        self.get_clean_name()
         return self.clean_name
 
 
@@ -136,92 +169,170 @@ def clean_quests(input_file, output_file):
                 del item["collected"]
                 del item["item_details"]
 
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
+        output.write(output_file, json.dumps(data, indent=4), pages=0)
+
+
+class QuestRegistry:
+    """A class to hold the loaded quests with indexes for looking them up.
+
+    Each call to load_quests() returns a new registry, so loading the quests again
+    never adds to an earlier list.
+
+    Attributes
+        quests : list
+            The quests in the order they were loaded.
+        by_id : dict
+            The quests keyed by quest_id, keeping the first quest when an id appears more than once.
+        by_name : dict
+            The quests keyed by name, keeping the first quest when a name appears more than once.
+        rewarding : dict
+            The quests that reward each item, keyed by item name, once per quest.
+        requiring : dict
+            The quests that require each item, keyed by item name, once per requirement.
+    """
+
+    def __init__(self, quests=()):
+        self.quests = []
+        self.by_id = {}
+        self.by_name = {}
+        self.rewarding = {}
+        self.requiring = {}
+
+        for quest in quests:
+            self.add(quest)
+
+    def add(self, quest):
+        """Add a quest and index it."""
+        self.quests.append(quest)
+        self.by_id.setdefault(quest.quest_id, quest)
+        self.by_name.setdefault(quest.quest_name, quest)
+
+        for item_name in dict.fromkeys(reward.item_name for reward in quest.rewards):
+            self.rewarding.setdefault(item_name, []).append(quest)
+        for required_item in quest.required_items:
+            self.requiring.setdefault(required_item.item_name, []).append(quest)
+
+    def get(self, quest_id):
+        """Get the quest with the given id, or None if there isn't one."""
+        counters["index_hits"] += 1
+        return self.by_id.get(quest_id)
+
+    def get_by_name(self, name):
+        """Get the quest with the given name, or None if there isn't one."""
+        counters["index_hits"] += 1
+        return self.by_name.get(name)
+
+    def quests_rewarding(self, item_name):
+        """Get every quest that rewards the named item."""
+        counters["index_hits"] += 1
+        return self.rewarding.get(item_name, [])
+
+    def quests_requiring(self, item_name):
+        """Get the quests that require the named item, once per requirement."""
+        counters["index_hits"] += 1
+        return self.requiring.get(item_name, [])
+
+    def prerequisite_names(self, quest):
+        """Get the names of a quest's prerequisites, leaving out any that aren't loaded."""
+        names = []
+        for prerequisite in quest.prerequisites:
+            prerequisite_quest = self.get(prerequisite)
+            if prerequisite_quest:
+                names.append(prerequisite_quest.quest_name)
+        return names
+
+    def __iter__(self):
+        return iter(self.quests)
 
+    def __len__(self):
+        return len(self.quests)
 
-def load_quests(input_file):
+    def __str__(self):
+        return f"{len(self.quests)} quests"
+
+
+def load_quests(input_file, wiki_metadata=None):
+    """Load the quests from quests.json, with their trivia and promo from the wiki data.
 
-    # load the wiki data
-    with open("data/wiki_data.json", "r", encoding="utf-8") as f:
-        wiki_data = json.load(f)
+    Args:
+        input_file (str): The path of quests.json.
+        wiki_metadata (WikiMetadata): The wiki data to look the quests up in. Defaults to
+            the process's shared copy of data/wiki_data.json.
 
-    wiki_data = wiki_data["quests"]
+    Returns a new QuestRegistry of the quests.
+    """
+    if wiki_metadata is None:
+        wiki_metadata = WikiMetadata.load()
 
     with open(input_file, "r", encoding="utf-8") as f:
         data = json.load(f)
 
-        for quest in data:
-            new_quest = Quest()
+    return QuestRegistry(build_quest(quest, wiki_metadata) for quest in data)
 
-            new_quest.quest_id = quest["quest_id"]
-            new_quest.quest_name = quest["quest_name"]
-            new_quest.quest_description = quest["quest_description"]
-            new_quest.quest_instance_type = quest["quest_instance_type"]
-            new_quest.quest_quest_type = quest["quest_quest_type"]
 
-            new_quest.quest_tags = quest["quest_tags"]
+def build_quest(quest, wiki_metadata):
+    """Build a Quest from its entry in quests.json and its wiki data in a WikiMetadata."""
+    new_quest = Quest()
 
-            # if prerequisites is not an empty list
-            if quest["prerequisites"] != []:
-                # find all the strings values in the prerequisites list
-                new_quest.prerequisites = quest["prerequisites"]
+    new_quest.quest_id = quest["quest_id"]
+    new_quest.quest_name = intern_name(quest["quest_name"])
+    new_quest.quest_description = quest["quest_description"]
+    new_quest.quest_instance_type = quest["quest_instance_type"]
+    new_quest.quest_quest_type = quest["quest_quest_type"]
 
-            # find the start_date and end_date values in the availability list
-            new_quest.availability = (
-                quest["availability"][0]["start_date"],
-                quest["availability"][0]["end_date"],
-            )
+    new_quest.quest_tags = quest["quest_tags"]
 
-            new_quest.recurring = quest["recurring"]
-            if quest["recurring"]:
-                new_quest.recurring_cooldown = quest["recurring"][0][
-                    "cooldown_period_in_hours"
-                ]
-
-            if quest["required_items"]:
-                # get the item_id, quantity, and item_name values from the required_items list
-                required_items = []
-                for item in quest["required_items"]:
-                    new_item = QuestRequiredItem()
-                    new_item.item_id = item["item_id"]
-                    new_item.quantity = item["quantity"]
-                    new_item.item_name = item["item_name"]
-
-                    required_items.append(new_item)
-
-                new_quest.required_items = required_items
-
-            if quest["rewards"]:
-                # get the item_id, quantity, item_name, and reward_type values from the rewards list
-                rewards = []
-                for reward in quest["rewards"]:
-                    new_reward = QuestReward()
-                    new_reward.item_id = reward["item_id"]
-                    new_reward.quantity = reward["quantity"]
-                    new_reward.item_name = reward["item_name"]
-                    new_reward.reward_type = reward["reward_type"]
-                    new_reward.recipe_name = reward["recipe_name"]
-
-                    rewards.append(new_reward)
-
-                new_quest.rewards = rewards
-
-            new_quest.tags = quest["tags"]
-
-            # add the trivia and promo fields
-            # find the quest with the matching name
-            wiki_quest = next(
-                (q for q in wiki_data if q["name"] == new_quest.quest_name.strip()),
-                None,
+    # if prerequisites is not an empty list
+    if quest["prerequisites"] != []:
+        # find all the strings values in the prerequisites list
+        new_quest.prerequisites = quest["prerequisites"]
+
+    # find the start_date and end_date values in the availability list
+    new_quest.availability = (
+        quest["availability"][0]["start_date"],
+        quest["availability"][0]["end_date"],
+    )
+
+    new_quest.recurring = quest["recurring"]
+    if quest["recurring"]:
+        new_quest.recurring_cooldown = quest["recurring"][0][
+            "cooldown_period_in_hours"
+        ]
+
+    if quest["required_items"]:
+        # get the item_id, quantity, and item_name values from the required_items list
+        new_quest.required_items = [
+            QuestRequiredItem(
+                item_id=item["item_id"],
+                quantity=item["quantity"],
+                item_name=item["item_name"],
             )
-            if wiki_quest:
-                new_quest.trivia = wiki_quest["trivia"]
-                new_quest.promo = wiki_quest["promo"]
+            for item in quest["required_items"]
+        ]
+
+    if quest["rewards"]:
+        # get the item_id, quantity, item_name, and reward_type values from the rewards list
+        new_quest.rewards = [
+            QuestReward(
+                item_id=reward["item_id"],
+                quantity=reward["quantity"],
+                item_name=reward["item_name"],
+                reward_type=reward["reward_type"],
+                recipe_name=reward["recipe_name"],
+            )
+            for reward in quest["rewards"]
+        ]
+
+    new_quest.tags = quest["tags"]
 
-            quests.append(new_quest)
+    # add the trivia and promo fields
+    # find the quest with the matching name
+    wiki_quest = wiki_metadata.quest(new_quest.quest_name)
+    if wiki_quest:
+        new_quest.trivia = wiki_quest["trivia"]
+        new_quest.promo = wiki_quest["promo"]
 
-        return quests
+    return new_quest
 
 
 def convert_to_json(obj):
@@ -292,7 +403,7 @@ quest_template = """\
 |rewards={rewards}
 }}}}"""
 
-quest_page_template = """<QUEST>
+quest_page_template = Template("""<QUEST>
 
 <NAME> is <INSTANCE_TYPE> <QUEST_TYPE> [[Quest]] in Moonbounce.
 
@@ -306,31 +417,24 @@ quest_page_template = """<QUEST>
 
 <REWARDS>
 
-"""
+<TRIVIA>""", collapse_blank_lines=True)
 
-reward_card_template = """\
+reward_card_template = Template("""\
 {{Card
 |title=<NAME>
 |image=<IMAGE>.png
 |linktarget=<NAMEHYPHENED>
 }}
-"""
+""")
 
 
 # the prerequisites, required_items, and rewards fields are lists of dictionaries
-# the prerequisites should find the quest name from the quest_id
+# the prerequisites should find the quest name from the quest_id, using the registry
 # the required_items should list the item name and quantity
 # the rewards should list the clean name
-def convert_to_mediawiki(obj):
+def convert_to_mediawiki(obj, registry):
     if isinstance(obj, Quest):
-        prerequisites = []
-        for prerequisite in obj.prerequisites:
-            # find the quest with the matching quest_id
-            prerequisite_quest = next(
-                (quest for quest in quests if quest.quest_id == prerequisite), None
-            )
-            if prerequisite_quest:
-                prerequisites.append(prerequisite_quest.quest_name)
+        prerequisites = registry.prerequisite_names(obj)
 
         required_items = []
         for item in obj.required_items:
@@ -357,201 +461,458 @@ def convert_to_mediawiki(obj):
         return obj
 
 
-def create_quest_pages(quests):
-    for quest in quests:
-        page = ""
-
-        # replace the placeholders in the quest_page_template with the quest values
-        page = quest_page_template.replace("<QUEST>", convert_to_mediawiki(quest))
-        page = page.replace("<NAME>", quest.quest_name)
-        page = page.replace("<INSTANCE_TYPE>", quest.quest_instance_type)
-        page = page.replace("<QUEST_TYPE>", quest.quest_quest_type)
-        page = page.replace("<DESCRIPTION>", quest.quest_description)
-
-        # replace the <PROMOCATEGORY> placeholder with the promo category
-        is_promo = quest.promo
-        promo_category = "[[Category:Promos]]" if is_promo else ""
-        page = page.replace("<PROMOCATEGORY>", "[[Category:Promos]]")
-
-        if quest.prerequisites:
-            prerequisites = "== Prerequisites ==\n\n"
-            for prerequisite in quest.prerequisites:
-
-                prereq_quest = next(
-                    (q for q in quests if q.quest_id == prerequisite), None
-                )
+def write_quest_page(quest, registry):
+    """Render the wiki page for a single quest and write it to the wiki/quests folder.
+
+    Args:
+        quest (Quest): The quest to write the page for.
+        registry (QuestRegistry): The loaded quests, to look up the prerequisites in.
+    """
+    # collect the values for the placeholders in the quest_page_template
+    values = {
+        "NAME": quest.quest_name,
+        "INSTANCE_TYPE": quest.quest_instance_type,
+        "QUEST_TYPE": quest.quest_quest_type,
+        "DESCRIPTION": quest.quest_description,
+    }
+
+    # replace the <PROMOCATEGORY> placeholder with the promo category
+    is_promo = quest.promo
+    promo_category = "[[Category:Promos]]" if is_promo else ""
+    values["QUEST"] = convert_to_mediawiki(quest, registry).replace(
+        "<PROMOCATEGORY>", "[[Category:Promos]]"
+    )
 
-                prerequisites += f"* [[{prereq_quest.quest_name}]]\n"
-            page = page.replace("<PREREQUISITES>", prerequisites)
-        else:
-            page = page.replace("<PREREQUISITES>", "")
-
-        if quest.required_items:
-            required_items = "== Required Items ==\n\n"
-            required_items += '<div class="card-container left-align">\n'
-            for item in quest.required_items:
-                # these are always items
-                required_items += reward_card_template.replace(
-                    "<NAME>", f"{item.item_name} x{item.quantity}"
-                )
-                required_items = required_items.replace(
-                    "<NAMEHYPHENED>", f"{item.item_name.replace(' ', '_')}"
-                )
-                required_items = required_items.replace(
-                    "<IMAGE>", f"{item.item_name.replace(' ', '_')}"
+    if quest.prerequisites:
+        prerequisites = "== Prerequisites ==\n\n"
+        for prerequisite_name in registry.prerequisite_names(quest):
+            prerequisites += f"* [[{prerequisite_name}]]\n"
+        values["PREREQUISITES"] = prerequisites
+    else:
+        values["PREREQUISITES"] = ""
+
+    if quest.required_items:
+        required_items = ["== Required Items ==\n\n"]
+        required_items.append('<div class="card-container left-align">\n')
+        for item in quest.required_items:
+            # these are always items
+            required_items.append(
+                reward_card_template.render(
+                    NAME=f"{item.item_name} x{item.quantity}",
+                    NAMEHYPHENED=item.item_name.replace(" ", "_"),
+                    IMAGE=item.item_name.replace(" ", "_"),
                 )
-            required_items += "</div>"
+            )
+        required_items.append("</div>")
 
-            page = page.replace("<REQUIRED>", required_items)
-        else:
-            page = page.replace("<REQUIRED>", "")
-
-        if quest.rewards:
-            rewards = "== Rewards ==\n\n"
-            rewards += '<div class="card-container left-align">\n'
-            for reward in quest.rewards:
-                # if the reward is an item
-                if reward.reward_type == "item":
-                    rewards += reward_card_template.replace("<NAME>", reward.item_name)
-                    rewards = rewards.replace(
-                        "<NAMEHYPHENED>", reward.item_name.replace(" ", "_")
-                    )
-                    rewards = rewards.replace(
-                        "<IMAGE>", reward.item_name.replace(" ", "_")
-                    )
-
-                # if the reward is a recipe
-                elif reward.reward_type == "recipe":
-                    rewards += reward_card_template.replace(
-                        "<NAME>", f"{reward.recipe_name} Recipe"
-                    )
-                    rewards = rewards.replace(
-                        "<NAMEHYPHENED>", f"{reward.recipe_name}_Recipe"
-                    )
-                    rewards = rewards.replace("<IMAGE>", f"Recipe_Sheet")
-                # if the reward is a quest
-                elif reward.reward_type == "quest":
-                    rewards += reward_card_template.replace("<NAME>", "New Quest!")
-                    rewards = rewards.replace("<NAMEHYPHENED>", "Quests")
-                    rewards = rewards.replace("<IMAGE>", "Quest")
-                # if the reward is currency
-                elif reward.reward_type == "currency":
-                    # determine the size of the currency reward
-                    # find the key that matches the quantity
-                    currency_size = reward.quantity
-                    for key in quest_mp_sizes:
-                        if reward.quantity <= key:
-                            currency_size = quest_mp_sizes[key]
-                            break
-
-                    rewards += reward_card_template.replace(
-                        "<NAME>", f"{reward.quantity} MP"
-                    )
-                    rewards = rewards.replace("<NAMEHYPHENED>", "Quests")
-                    rewards = rewards.replace("<IMAGE>", f"MP_{currency_size}")
-                else:
-                    rewards += reward_card_template.replace("<NAME>", "Unknown Reward")
-                    rewards = rewards.replace("<NAMEHYPHENED>", "Quests")
-                    rewards = rewards.replace("<IMAGE>", "Quest.png")
-            rewards += "</div>"
-
-            page = page.replace("<REWARDS>", rewards)
-        else:
-            page = page.replace("<REWARDS>", "")
+        values["REQUIRED"] = "".join(required_items)
+    else:
+        values["REQUIRED"] = ""
+
+    if quest.rewards:
+        rewards = ["== Rewards ==\n\n"]
+        rewards.append('<div class="card-container left-align">\n')
+        for reward in quest.rewards:
+            # if the reward is an item
+            if reward.reward_type == "item":
+                card = {
+                    "NAME": reward.item_name,
+                    "NAMEHYPHENED": reward.item_name.replace(" ", "_"),
+                    "IMAGE": reward.item_name.replace(" ", "_"),
+                }
+
+            # if the reward is a recipe
+            elif reward.reward_type == "recipe":
+                card = {
+                    "NAME": f"{reward.recipe_name} Recipe",
+                    "NAMEHYPHENED": f"{reward.recipe_name}_Recipe",
+                    "IMAGE": "Recipe_Sheet",
+                }
+            # if the reward is a quest
+            elif reward.reward_type == "quest":
+                card = {
+                    "NAME": "New Quest!",
+                    "NAMEHYPHENED": "Quests",
+                    "IMAGE": "Quest",
+                }
+            # if the reward is currency
+            elif reward.reward_type == "currency":
+                # determine the size of the currency reward
+                # find the key that matches the quantity
+                currency_size = reward.quantity
+                for key in quest_mp_sizes:
+                    if reward.quantity <= key:
+                        currency_size = quest_mp_sizes[key]
+                        break
+
+                card = {
+                    "NAME": f"{reward.quantity} MP",
+                    "NAMEHYPHENED": "Quests",
+                    "IMAGE": f"MP_{currency_size}",
+                }
+            else:
+                card = {
+                    "NAME": "Unknown Reward",
+                    "NAMEHYPHENED": "Quests",
+                    "IMAGE": "Quest.png",
+                }
+            rewards.append(reward_card_template.render(card))
+        rewards.append("</div>")
 
-        if quest.trivia:
-            trivia = "== Trivia ==\n\n"
-            trivia += "\n".join(quest.trivia)
+        values["REWARDS"] = "".join(rewards)
+    else:
+        values["REWARDS"] = ""
 
-            page += trivia
+    if quest.trivia:
+        trivia = "== Trivia ==\n\n"
+        trivia += "\n".join(quest.trivia)
 
-        # remove any multiple newlines
-        while "\n\n\n" in page:
-            page = page.replace("\n\n\n", "\n")
+        values["TRIVIA"] = trivia
+    else:
+        values["TRIVIA"] = ""
 
-        # make the quests folder if it doesn't exist
-        if not os.path.exists("wiki/quests"):
-            os.makedirs("wiki/quests")
+    # render the page, removing any multiple newlines in the same pass
+    page = quest_page_template.render(values)
 
-        # remove ? from the quest name
-        quest.quest_name = quest.quest_name.replace("?", "")
+    # save the pages in the wiki/quests folder, unless they haven't changed
+    output.write(
+        os.path.join(wiki_path, quest_page_path(quest)), page, title=quest.quest_name
+    )
 
-        # save the pages in the data/quests/pages folder
-        with open(f"wiki/quests/{quest.quest_name}.mw", "w", encoding="utf-8") as f:
-            f.write(page)
 
+def quest_page_path(quest):
+    """Get the path of a quest's page relative to the wiki folder, with any ? removed from the file name."""
+    return f"quests/{quest.quest_name.replace('?', '')}.mw"
 
-def sort_quests(quests):
-    # sort the quests by quest_name, but adjust the order so that the quests with prerequisites come after the quests they require
-    sorted_quests = []
-    # first, sort the quests by quest_name and put in only the quests with no prerequisites
-    sorted_quests += sorted(
-        [quest for quest in quests if not quest.prerequisites],
-        key=lambda x: x.quest_name,
-    )
-    # then, add the quests with prerequisites after the quests they require
+
+def write_quest_list(quests, registry):
+    """Write the Quest template of every quest, in order, to wiki/quests.mw.
+
+    Args:
+        quests (list): The quests to list, sorted.
+        registry (QuestRegistry): The loaded quests, to look up the prerequisites in.
+    """
+    quest_object = [convert_to_mediawiki(quest, registry) for quest in quests]
+
+    quest_list = "".join(quest + "\n\n" for quest in quest_object)
+    output.write(os.path.join(wiki_path, "quests.mw"), quest_list)
+
+
+def _init_page_worker(shared_quests, shared_registry, log_level):
+    # ship the quests and the registry to the worker once, rather than with every slice
+    global page_quests, page_registry
+    page_quests = shared_quests
+    page_registry = shared_registry
+    log.level = log_level
+    log.discard()
+
+
+def _write_quest_pages(start, stop):
+    # return how much each counter grew, for the parent process to add to its own
+    snapshot = dict(counters)
+    for quest in page_quests[start:stop]:
+        write_quest_page(quest, page_registry)
+    log.flush()
+    return counters_since(snapshot)
+
+
+def create_quest_pages(quests, jobs=1, registry=None):
+    """Write the wiki page of each quest.
+
+    Args:
+        quests (list): The quests to write pages for.
+        jobs (int): The number of processes to render the pages with.
+        registry (QuestRegistry): The loaded quests, to look up the prerequisites in. Built from quests if not given.
+    """
+    if registry is None:
+        registry = QuestRegistry(quests)
+    quests = list(quests)
+
+    # create the folder once up front, so forked workers don't each check for it
+    output.make_dirs([os.path.join(wiki_path, "quests")])
+
+    # an archive can only be written to by one process
+    if output.archive_path is not None:
+        jobs = 1
+
+    if jobs <= 1 or len(quests) < 2:
+        for quest in quests:
+            write_quest_page(quest, registry)
+        return
+
+    # the process pool is only needed with --jobs, so it's imported here
+    from concurrent.futures import ProcessPoolExecutor
+
+    # split the quests into contiguous slices and render them side by side
+    chunk_size = max(1, -(-len(quests) // (jobs * 4)))
+    starts = list(range(0, len(quests), chunk_size))
+    stops = [min(start + chunk_size, len(quests)) for start in starts]
+
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_page_worker, initargs=(quests, registry, log.level)
+    ) as executor:
+        # map() keeps the slices in order and raises the first error from any worker
+        for worker_counts in executor.map(_write_quest_pages, starts, stops):
+            counters.update(worker_counts)
+
+
+class QuestGraph:
+    """A class to represent which quests must be completed before which, built once from the quest list.
+
+    Every prerequisite of a quest is an edge, not just the first. Prerequisites that
+    aren't in the quest list are left out of the graph, so those quests are ordered
+    as if they had none. validate_quests() reports them.
+
+    Attributes
+        quests : list
+            The quests in the order they were given.
+        order : list
+            The quests in topological order. Quests with no prerequisites come first by
+            name, and each quest is followed by the quests it unlocks, also by name, as
+            soon as all of their prerequisites have been placed.
+        depths : dict
+            The length of the longest prerequisite chain leading to each quest, keyed by
+            the quest. Quests with no prerequisites have a depth of 0.
+    """
+
+    def __init__(self, quests):
+        self.quests = list(quests)
+
+        # the graph works on positions in the quest list, so quests sharing an id stay separate
+        index_by_id = {}
+        for index, quest in enumerate(self.quests):
+            index_by_id.setdefault(quest.quest_id, index)
+
+        self.prerequisites = [[] for _ in self.quests]
+        self.dependents = [[] for _ in self.quests]
+        for index, quest in enumerate(self.quests):
+            for prerequisite in dict.fromkeys(quest.prerequisites):
+                counters["index_hits"] += 1
+                prerequisite_index = index_by_id.get(prerequisite)
+                if prerequisite_index is None:
+                    continue
+                self.prerequisites[index].append(prerequisite_index)
+                self.dependents[prerequisite_index].append(index)
+
+        self.order_indexes = self._topological_order()
+        self.order = [self.quests[index] for index in self.order_indexes]
+
+        # every prerequisite comes earlier in the order, so each depth is worked out once from finished ones
+        depths = [0] * len(self.quests)
+        for index in self.order_indexes:
+            if self.prerequisites[index]:
+                depths[index] = 1 + max(depths[prerequisite] for prerequisite in self.prerequisites[index])
+        self.depths = {quest: depth for quest, depth in zip(self.quests, depths)}
+
+    def _topological_order(self):
+        """Order the quests so each one comes after all of its prerequisites.
+
+        Ready quests are kept on a stack, so a quest's dependents are placed straight
+        after it rather than after every other ready quest, which keeps chains together.
+        """
+        def by_name(index):
+            return self.quests[index].quest_name
+
+        remaining = [len(prerequisites) for prerequisites in self.prerequisites]
+
+        # the stack is popped from the end, so push in reverse name order to place the first name first
+        stack = sorted((index for index, count in enumerate(remaining) if count == 0), key=by_name, reverse=True)
+        order = []
+        while stack:
+            index = stack.pop()
+            order.append(index)
+
+            unlocked = [dependent for dependent in self.dependents[index] if self._unlock(remaining, dependent)]
+            stack.extend(sorted(unlocked, key=by_name, reverse=True))
+
+        if len(order) < len(self.quests):
+            raise ValueError(f"The quest prerequisites form a cycle: {self._find_cycle(remaining)}")
+
+        return order
+
+    @staticmethod
+    def _unlock(remaining, index):
+        remaining[index] -= 1
+        return remaining[index] == 0
+
+    def _find_cycle(self, remaining):
+        """Describe one cycle among the quests that could never be placed."""
+        # every unplaced quest has an unplaced prerequisite, so following them must come back round
+        index = next(index for index, count in enumerate(remaining) if count > 0)
+        seen = {}
+        path = []
+        while index not in seen:
+            seen[index] = len(path)
+            path.append(index)
+            index = next(prerequisite for prerequisite in self.prerequisites[index] if remaining[prerequisite] > 0)
+
+        cycle = path[seen[index]:] + [index]
+        return " -> ".join(self.quests[index].quest_name for index in reversed(cycle))
+
+    def __str__(self):
+        return f"{len(self.quests)} quests with {sum(map(len, self.prerequisites))} prerequisites"
+
+
+def validate_quests(quests, report, item_names=None, recipe_results=None):
+    """Check the quests' references to other quests, and to items and recipes if their names are given.
+
+    Args:
+        quests (list): The quests to check.
+        report (validation.ValidationReport): The report to add the problems to.
+        item_names (dict or set): The names of every item, to check the required items and item rewards against.
+        recipe_results (dict or set): The result of every recipe, to check the recipe rewards against.
+    """
+    quest_ids = {}
     for quest in quests:
-        if quest.prerequisites:
-            # find the index of the prerequisite quest
-            index = next(
-                (
-                    i
-                    for i, q in enumerate(sorted_quests)
-                    if q.quest_id == quest.prerequisites[0]
-                ),
-                None,
+        if quest.quest_id in quest_ids:
+            report.warning(
+                f"Quests {quest_ids[quest.quest_id]!r} and {quest.quest_name!r} share the id {quest.quest_id}, "
+                "so only the first is used as a prerequisite"
             )
-            # insert the quest after the prerequisite quest
-            sorted_quests.insert(index + 1, quest)
+        else:
+            quest_ids[quest.quest_id] = quest.quest_name
 
-    return sorted_quests
+    for quest in quests:
+        report.check_names(
+            quest.prerequisites,
+            quest_ids,
+            lambda prerequisite: f"Quest {quest.quest_name!r} needs the quest {prerequisite}, which isn't a quest",
+        )
 
+    # building the graph orders the quests, which fails on a cycle
+    try:
+        QuestGraph(quests)
+    except ValueError as e:
+        report.error(str(e))
 
-def print_quests_with_deeper_bullets(quests):
-    print("== Quest List ==")
+    report.check_collisions(
+        (quest.quest_name for quest in quests),
+        lambda name: name.replace("?", ""),
+        lambda file_name, names: f"Quests {', '.join(map(repr, names))} are all written to quests/{file_name}.mw",
+    )
 
     for quest in quests:
-        bullet = "*"
-        quest_name = quest.quest_name
-        current_quest = quest
-
-        while current_quest.prerequisites:
-            bullet += "*"
-            current_quest = next(
-                (q for q in quests if q.quest_id == current_quest.prerequisites[0]),
-                None,
+        if item_names is not None:
+            report.check_names(
+                (item.item_name for item in quest.required_items),
+                item_names,
+                lambda name: f"Quest {quest.quest_name!r} requires {name!r}, which isn't an item",
+            )
+            report.check_names(
+                (reward.item_name for reward in quest.rewards if reward.reward_type == "item"),
+                item_names,
+                lambda name: f"Quest {quest.quest_name!r} rewards {name!r}, which isn't an item",
+            )
+        if recipe_results is not None:
+            report.check_names(
+                (reward.recipe_name for reward in quest.rewards if reward.reward_type == "recipe"),
+                recipe_results,
+                lambda name: f"Quest {quest.quest_name!r} rewards the recipe for {name!r}, which no recipe makes",
             )
 
-        print(f"{bullet} [[{quest_name}]]")
 
+def sort_quests(quests):
+    """Sort the quests by name, with each quest placed after all of its prerequisites and followed by the quests it unlocks."""
+    return QuestGraph(quests).order
 
-if __name__ == "__main__":
 
-    # clean_quests("quests/questsfull.json", "quests/cleaned_quests.json")
-    quests = load_quests("data/quests.json")
+def print_quests_with_deeper_bullets(quests, graph=None):
+    """Print the quest list with one more bullet for each quest in a quest's longest prerequisite chain.
 
-    # sort the quests
-    quests = sort_quests(quests)
+    Args:
+        quests (list): The quests to print, in order.
+        graph (QuestGraph): The graph of the quests, built from them if not given.
+    """
+    if graph is None:
+        graph = QuestGraph(quests)
 
-    print("\n\n")
+    print("== Quest List ==")
 
     for quest in quests:
-        print(quest)
+        bullet = "*" * (graph.depths[quest] + 1)
+        print(f"{bullet} [[{quest.quest_name}]]")
+
+
+def build_quest_wiki(tracer, jobs=1, wiki_metadata=None, validate=True):
+    """Sort the quests, save them back to data/quests.json and write the quest list and quest pages.
+
+    Args:
+        tracer (instrumentation.Tracer): The tracer to time each step as a stage with.
+        jobs (int): The number of processes to render the quest pages with.
+        wiki_metadata (WikiMetadata): The wiki data to look the quests up in, if already loaded.
+        validate (bool): Whether to check the quests' references before writing anything, stopping on errors.
+    """
+    # clean_quests("quests/questsfull.json", "quests/cleaned_quests.json")
+    with tracer.stage("load_quests"):
+        registry = load_quests(quests_data_path, wiki_metadata)
+
+    # check the quests link up before writing anything, reporting every problem at once
+    if validate:
+        with tracer.stage("validate_quests"):
+            report = ValidationReport()
+            validate_quests(registry.quests, report)
+            report.raise_for_errors()
+
+    # sort the quests, each after all of its prerequisites
+    with tracer.stage("sort_quests"):
+        graph = QuestGraph(registry)
+        quests = graph.order
+
+    log.debug("\n\n")
+
+    if log.enabled(instrumentation.DEBUG):
+        for quest in quests:
+            log.debug(str(quest))
 
     # save the Quests to a new JSON file called quests.json
-    quest_object = [convert_to_json(quest) for quest in quests]
+    with tracer.stage("write_quests_json"):
+        quest_object = [convert_to_json(quest) for quest in quests]
 
-    with open("data/quests.json", "w", encoding="utf-8") as f:
-        json.dump(quest_object, f, indent=4)
+        # quests.json is only rewritten when sorting changed it
+        output.write(quests_data_path, json.dumps(quest_object, indent=4), pages=0)
 
     # save the Quests to a new MediaWiki file called quests.mw
-    quest_object = [convert_to_mediawiki(quest) for quest in quests]
-
-    with open("wiki/quests.mw", "w", encoding="utf-8") as f:
-        for quest in quest_object:
-            f.write(quest + "\n\n")
+    with tracer.stage("write_quest_list"):
+        write_quest_list(quests, registry)
 
     # create the individual quest pages
-    create_quest_pages(quests)
+    with tracer.stage("create_quest_pages"):
+        create_quest_pages(quests, jobs=jobs, registry=registry)
+
+    with tracer.stage("print_quest_list"):
+        print_quests_with_deeper_bullets(quests, graph)
+
 
-    print_quests_with_deeper_bullets(quests)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sort the quests and generate their wiki pages.")
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="The number of processes to render pages with."
+    )
+    parser.add_argument(
+        "--no-validate",
+        action="store_true",
+        help="Write the pages even if the quests have problems that would normally stop the run.",
+    )
+    output_writer.add_arguments(parser)
+    instrumentation.add_arguments(
+        parser, os.path.join(repo_dir, ".cache", "reports", "quests.json")
+    )
+    args = parser.parse_args()
+
+    if args.archive and output_writer.archive_format_of(args.archive) is None:
+        parser.error(
+            f"--archive must end in one of: {', '.join(output_writer.archive_formats)}"
+        )
+    if args.archive:
+        output.open_archive(args.archive)
+
+    # time every stage, writing the run report at the end even if a stage fails
+    tracer = instrumentation.start_run("quests", args)
+    try:
+        build_quest_wiki(tracer, jobs=args.jobs, validate=not args.no_validate)
+    except ValidationError as e:
+        log.error(str(e))
+        sys.exit(1)
+    finally:
+        output.close()
+        instrumentation.finish_run(tracer, args)
@@ -0,0 +1,162 @@
+# The recipes as a graph, breaking every craftable item down into the raw materials it's ultimately made from
+
+from records import Immutable, intern_names
+
+
+class MaterialBill(Immutable):
+    """A class to represent everything an item is ultimately crafted from.
+
+    Attributes
+        materials : dict
+            How many of each raw material the item takes, keyed by name and sorted by name.
+            A raw material is anything without a recipe of its own.
+        tools : tuple
+            The tools needed anywhere in the item's crafting tree, sorted by name.
+        value : int
+            The total diffuse value of the raw materials that have one.
+        unvalued : tuple
+            The raw materials with no diffuse value, which the value leaves out.
+    """
+    __slots__ = ('materials', 'tools', 'value', 'unvalued')
+
+    def __init__(self, materials, tools, value, unvalued):
+        self._set('materials', materials)
+        self._set('tools', intern_names(tools))
+        self._set('value', value)
+        self._set('unvalued', intern_names(unvalued))
+
+    def __str__(self):
+        return f'{sum(self.materials.values())} raw materials worth {self.value} MP and {len(self.tools)} tools'
+
+
+class RecipeGraph:
+    """A class to represent which items are crafted from which, built once from the recipes.
+
+    Each item is broken down by its first recipe. The graph is walked once to find the
+    groups of items whose recipes need each other, which come out children first, so
+    every item's bill is worked out exactly once from the bills of its ingredients,
+    however deep the crafting trees go. Items in a cycle can't be broken down, so they
+    count as raw materials wherever they're used.
+
+    Attributes
+        recipes : dict
+            The recipe each item is broken down by, keyed by the item's name.
+        values : dict
+            The diffuse value of each item, keyed by name, None for items that have none.
+        cycles : list
+            Each group of items whose recipes need each other, sorted by name.
+        order : list
+            The items that can be broken down, each after all of its ingredients.
+    """
+    def __init__(self, recipes, values=None):
+        self.recipes = {}
+        for recipe in recipes:
+            self.recipes.setdefault(recipe.result, recipe)
+        self.values = values if values is not None else {}
+
+        self.cycles = []
+        self.order = []
+        for component in self._components():
+            node = component[0]
+            if len(component) > 1 or node in self.recipes[node].ingredients:
+                self.cycles.append(sorted(component))
+            else:
+                self.order.append(node)
+
+        self._bills = None
+
+    def _ingredients(self, name):
+        """Get the ingredients of an item that have recipes of their own, once each."""
+        return [ingredient for ingredient in dict.fromkeys(self.recipes[name].ingredients) if ingredient in self.recipes]
+
+    def _components(self):
+        """Find the groups of items whose recipes need each other with Tarjan's algorithm.
+
+        A group is only yielded once every group its items are made from has been, so
+        the groups come out children first. The walk keeps its own stack, as crafting
+        trees can go deeper than Python's recursion limit.
+        """
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+
+        for root in self.recipes:
+            if root in index:
+                continue
+
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self._ingredients(root)))]
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self._ingredients(child))))
+                        break
+                    if child in on_stack:
+                        low[node] = min(low[node], index[child])
+                else:
+                    # every child of the node is done, so pass its low link up and close its group if it's the root
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        yield component
+
+    def _build_bills(self):
+        """Work out the bill of every item that can be broken down, each from the finished bills of its ingredients."""
+        bills = {}
+        for name in self.order:
+            recipe = self.recipes[name]
+            materials = {}
+            tools = set(recipe.tools)
+            for ingredient in recipe.ingredients:
+                ingredient_bill = bills.get(ingredient)
+                if ingredient_bill is None:
+                    materials[ingredient] = materials.get(ingredient, 0) + 1
+                    continue
+                for material, count in ingredient_bill.materials.items():
+                    materials[material] = materials.get(material, 0) + count
+                tools.update(ingredient_bill.tools)
+
+            value = 0
+            unvalued = []
+            for material, count in materials.items():
+                material_value = self.values.get(material)
+                if material_value is None:
+                    unvalued.append(material)
+                else:
+                    value += material_value * count
+
+            bills[name] = MaterialBill({material: materials[material] for material in sorted(materials)},
+                                       sorted(tools), value, sorted(unvalued))
+        return bills
+
+    def bills(self):
+        """Get the MaterialBill of every item that can be broken down, keyed by name.
+
+        Every bill is worked out on the first call, once each.
+        """
+        if self._bills is None:
+            self._bills = self._build_bills()
+        return self._bills
+
+    def bill(self, name):
+        """Get the MaterialBill of an item, or None if it has no recipe or its recipe is part of a cycle."""
+        return self.bills().get(name)
+
+    def __str__(self):
+        return f'{len(self.recipes)} crafted items, {len(self.cycles)} recipe cycles'
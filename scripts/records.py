@@ -0,0 +1,41 @@
+# Helpers for the memory-compact data records shared by generateWikiArticleTemplate.py and quests.py
+
+import sys
+
+
+def intern_name(name):
+    """Intern a name so every record that mentions it shares one string.
+
+    Item, source and quest names are repeated across items, recipes, drops and quest
+    rewards. Interning them through the interpreter's shared table keeps one copy of
+    each name, however many records refer to it.
+    """
+    return sys.intern(name) if isinstance(name, str) else name
+
+
+def intern_names(names):
+    """Intern every name in a list, returning them as a tuple."""
+    return tuple(intern_name(name) for name in names)
+
+
+class Immutable:
+    """A base class for slotted records that can't be changed once they're created.
+
+    Subclasses declare their __slots__ and set them in __init__ with _set().
+    """
+    __slots__ = ()
+
+    def _set(self, name, value):
+        object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable, cannot set {name}')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable, cannot delete {name}')
+
+    def __setstate__(self, state):
+        # pickle restores slotted objects through setattr, so set the slots directly instead
+        _, slots = state
+        for name, value in slots.items():
+            object.__setattr__(self, name, value)
@@ -0,0 +1,338 @@
+# Compare two snapshots of the data files and work out exactly which wiki pages the changes affect
+#
+# A snapshot is a folder holding MoonbouncePlus.json, marketplace.json, quests.json and
+# wiki_data.json, or a git revision of the repo's data folder. The records of each file are
+# diffed by key, field by field, and the changes are mapped through the dependency graph of
+# the incremental build to the pages they change.
+#
+# Usage:
+#   python scripts/snapshot_diff.py HEAD                  compare the committed data files against data/
+#   python scripts/snapshot_diff.py old_data/ data/       compare two folders
+#   python scripts/snapshot_diff.py HEAD --render         also render the affected pages of data/ into wiki/
+
+import argparse
+import json
+import os
+import subprocess
+
+import generateWikiArticleTemplate as wiki
+import instrumentation
+import output_writer
+import quests
+from instrumentation import log
+from output_writer import output
+from wiki_metadata import WikiMetadata, repo_dir
+
+# the data files of a snapshot, by the name each one is kept under
+data_files = {
+    'data': 'MoonbouncePlus.json',
+    'marketplace': 'marketplace.json',
+    'quests': 'quests.json',
+    'wiki_data': 'wiki_data.json',
+}
+
+
+class Snapshot:
+    """A class to hold one copy of the data files, read from a folder or a git revision.
+
+    Attributes
+        label : str
+            The folder or revision the files were read from.
+        files : dict
+            The parsed contents of each data file, keyed by the names in data_files.
+    """
+    def __init__(self, label, files):
+        self.label = label
+        self.files = files
+        self.wiki_metadata = WikiMetadata(files['wiki_data'])
+
+    @classmethod
+    def load(cls, location):
+        """Load the data files from a folder, or from the data folder at a git revision if there's no such folder."""
+        files = {}
+        for key, file_name in data_files.items():
+            if os.path.isdir(location):
+                with open(os.path.join(location, file_name), 'r', encoding='utf-8') as f:
+                    files[key] = json.load(f)
+                continue
+
+            result = subprocess.run(['git', 'show', f'{location}:data/{file_name}'], cwd=repo_dir, capture_output=True)
+            if result.returncode != 0:
+                raise ValueError(f'{location} is not a folder, and git could not read data/{file_name} at it: '
+                                 f'{result.stderr.decode("utf-8", "replace").strip()}')
+            files[key] = json.loads(result.stdout)
+        return cls(location, files)
+
+    def records(self):
+        """Get the records of each data file keyed the way the dependency graph keys them, keeping the first record for each key."""
+        # recipes are keyed by their result and their place among the recipes for it
+        recipes = {}
+        recipe_counts = {}
+        for recipe in self.files['data']['recipes']:
+            index = recipe_counts.get(recipe['result'], 0)
+            recipe_counts[recipe['result']] = index + 1
+            recipes[f'{recipe["result"]}:{index}'] = recipe
+
+        marketplace = self.files['marketplace']['marketplace']
+        return {
+            'items': index_records(self.files['data']['items'], 'name'),
+            'recipes': recipes,
+            'marketplace items': index_records(marketplace['items'], 'name'),
+            'marketplace recipes': index_records(marketplace['recipes'], 'name'),
+            'quests': index_records(self.files['quests'], 'quest_id'),
+            'wiki items': self.wiki_metadata.items,
+            'wiki sources': self.wiki_metadata.sources,
+            'wiki quests': self.wiki_metadata.quests,
+        }
+
+    def load_catalog(self):
+        """Build the catalog of the snapshot with its quests attached.
+
+        Returns the catalog and the quest registry.
+        """
+        catalog = wiki.build_catalog(self.files['data'], self.files['marketplace'], self.wiki_metadata)
+        registry = quests.QuestRegistry(quests.build_quest(quest, self.wiki_metadata) for quest in self.files['quests'])
+        catalog.attach_quests(registry)
+        return catalog, registry
+
+    def __str__(self):
+        return f'Snapshot of {self.label}'
+
+
+class RecordDiff:
+    """A class to hold the differences between the old and new records of one data file.
+
+    Attributes
+        added : list
+            The keys of the records only in the new snapshot.
+        removed : list
+            The keys of the records only in the old snapshot.
+        changed : dict
+            The fields that differ in each record in both snapshots, keyed by record key,
+            as a list of (field, old value, new value).
+    """
+    def __init__(self, old, new):
+        self.added = [key for key in new if key not in old]
+        self.removed = [key for key in old if key not in new]
+        self.changed = {}
+        for key, new_record in new.items():
+            old_record = old.get(key)
+            if old_record is None or old_record == new_record:
+                continue
+            fields = dict.fromkeys([*old_record, *new_record])
+            self.changed[key] = [(field, old_record.get(field), new_record.get(field))
+                                 for field in fields if old_record.get(field) != new_record.get(field)]
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __str__(self):
+        return f'{len(self.added)} added, {len(self.removed)} removed, {len(self.changed)} changed'
+
+
+class PageDiff:
+    """A class to hold the wiki pages affected by the changes between two catalogs.
+
+    The inputs of both dependency graphs are compared, and each changed input is
+    walked back to the pages that depend on it in either graph, so a page that stops
+    depending on an input is caught too. The graph tracks whole records, so some of
+    those pages may not show the field that changed; compare_renders() renders them
+    from both catalogs to keep only the pages whose text really changes.
+
+    Attributes
+        changed_inputs : set
+            The dependency graph inputs that were added, removed or changed.
+        added : list
+            The pages only the new catalog has.
+        removed : list
+            The pages only the old catalog had. They're left in the wiki folder.
+        changed : list
+            The pages both catalogs have whose contents change.
+        unchanged : int
+            The number of pages the graph flagged that compare_renders() found unchanged.
+        total : int
+            The number of pages the new catalog has.
+    """
+    def __init__(self, old_catalog, new_catalog):
+        # page names come from the slug table, so each graph is built with its own catalog's table
+        wiki.build_slug_table(old_catalog)
+        old_graph = wiki.build_dependency_graph(old_catalog, include_quests=True)
+        wiki.build_slug_table(new_catalog)
+        new_graph = wiki.build_dependency_graph(new_catalog, include_quests=True)
+
+        self.changed_inputs = {key for key, digest in new_graph.inputs.items() if old_graph.inputs.get(key) != digest}
+        self.changed_inputs |= old_graph.inputs.keys() - new_graph.inputs.keys()
+
+        pages = new_graph.invalidated_by(self.changed_inputs) | old_graph.invalidated_by(self.changed_inputs)
+        self.added = sorted(page for page in pages if page not in old_graph.dependencies)
+        self.removed = sorted(page for page in pages if page not in new_graph.dependencies)
+        self.changed = sorted(page for page in pages if page in old_graph.dependencies and page in new_graph.dependencies)
+        self.unchanged = 0
+        self.total = len(new_graph.dependencies)
+
+    def compare_renders(self, old_catalog, old_registry, new_catalog, new_registry, tracer):
+        """Render the changed pages from both catalogs in memory, dropping the ones whose text comes out the same."""
+        candidates = set(self.changed)
+        # the renders are only compared, so their progress messages would just bury the report
+        with log.muted(), output.capture() as old_pages:
+            render_pages(candidates, old_catalog, old_registry, tracer)
+        with log.muted(), output.capture() as new_pages:
+            render_pages(candidates, new_catalog, new_registry, tracer)
+
+        def text(pages, page):
+            return pages.get(os.path.normpath(os.path.join(wiki.wiki_path, page)))
+
+        changed = [page for page in self.changed if text(old_pages, page) != text(new_pages, page)]
+        self.unchanged = len(self.changed) - len(changed)
+        self.changed = changed
+
+    def to_render(self):
+        """Get the pages of the new catalog that need rendering."""
+        return set(self.added) | set(self.changed)
+
+    def __str__(self):
+        return f'{len(self.added)} added, {len(self.removed)} removed and {len(self.changed)} changed of {self.total} pages'
+
+
+def index_records(records, key):
+    """Key a list of records by one of their fields, keeping the first record for each key."""
+    index = {}
+    for record in records:
+        index.setdefault(record[key], record)
+    return index
+
+def diff_records(old_records, new_records):
+    """Diff the records of every data file in two snapshots, as returned by Snapshot.records(), returning a RecordDiff for each."""
+    return {name: RecordDiff(old_records[name], new_records[name]) for name in old_records}
+
+def format_value(value):
+    return json.dumps(value, ensure_ascii=False)
+
+def print_report(record_diffs, page_diff, old_records, new_records):
+    """Print the records that were added, removed or changed, field by field, and the pages they affect."""
+    for name, record_diff in record_diffs.items():
+        if not record_diff:
+            continue
+
+        print(f'{name.capitalize()}: {record_diff}')
+        for key in record_diff.added:
+            print(f'  + {record_label(name, key, new_records)}')
+        for key in record_diff.removed:
+            print(f'  - {record_label(name, key, old_records)}')
+        for key, fields in record_diff.changed.items():
+            print(f'  ~ {record_label(name, key, new_records)}')
+            for field, old_value, new_value in fields:
+                print(f'      {field}: {format_value(old_value)} -> {format_value(new_value)}')
+        print()
+
+    print(f'Pages: {page_diff}')
+    for mark, pages in (('+', page_diff.added), ('-', page_diff.removed), ('~', page_diff.changed)):
+        for page in pages:
+            print(f'  {mark} {page}')
+
+def record_label(name, key, records):
+    # quests are keyed by id, but are easier to recognise by name
+    if name == 'quests':
+        return f'{records[name][key]["quest_name"]} ({key})'
+    return key
+
+def report_json(old, new, record_diffs, page_diff):
+    """Get the report as a JSON-serialisable dict, for tools reviewing a data update."""
+    return {
+        'old': old.label,
+        'new': new.label,
+        'records': {
+            name: {
+                'added': record_diff.added,
+                'removed': record_diff.removed,
+                'changed': {key: {field: [old_value, new_value] for field, old_value, new_value in fields}
+                            for key, fields in record_diff.changed.items()},
+            }
+            for name, record_diff in record_diffs.items()
+        },
+        'pages': {'added': page_diff.added, 'removed': page_diff.removed, 'changed': page_diff.changed},
+    }
+
+def render_pages(pages, catalog, registry, tracer, jobs=1):
+    """Render only the given pages of a catalog into the wiki folder.
+
+    Args:
+        pages (set): The paths of the pages to render, relative to the wiki folder.
+        catalog (Catalog): The catalog to render them from, with its quests attached.
+        registry (quests.QuestRegistry): The catalog's quests.
+        tracer (instrumentation.Tracer): The tracer to time each stage with.
+        jobs (int): The number of processes to render the item and quest pages with.
+    """
+    # the generators read the catalog, items and sources from the module, as build_wiki sets them
+    wiki.catalog = catalog
+    wiki.items, wiki.sources = catalog.items, catalog.sources
+    wiki.build_slug_table(catalog)
+
+    with tracer.stage('build_views'):
+        views = wiki.CatalogViews(catalog.items, catalog.recipes)
+    wiki.generate_wiki_pages(wiki.wiki_stages, views, tracer, dirty=pages, jobs=jobs)
+
+    quest_pages = [quest for quest in registry if quests.quest_page_path(quest) in pages]
+    if quest_pages:
+        with tracer.stage('create_quest_pages'):
+            quests.create_quest_pages(quest_pages, jobs=jobs, registry=registry)
+    if 'quests.mw' in pages:
+        with tracer.stage('write_quest_list'):
+            quests.write_quest_list(quests.sort_quests(registry), registry)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Report which records and wiki pages change between two snapshots of the data files.')
+    parser.add_argument('old', help='The old snapshot: a folder holding the data files, or a git revision of the data folder.')
+    parser.add_argument('new', nargs='?', default=os.path.join(repo_dir, 'data'),
+                        help='The new snapshot, in the same form. Defaults to the data folder.')
+    parser.add_argument('--render', action='store_true', help="Render the new snapshot's added and changed pages into the wiki folder.")
+    parser.add_argument('--json', metavar='PATH', help='Also write the report to a JSON file.')
+    parser.add_argument('--jobs', type=int, default=1, help='The number of processes to render pages with.')
+    output_writer.add_arguments(parser)
+    instrumentation.add_arguments(parser, os.path.join(repo_dir, '.cache', 'reports', 'snapshot_diff.json'))
+    args = parser.parse_args()
+
+    if args.archive and not args.render:
+        parser.error('--archive holds the rendered pages, so it needs --render')
+    if args.archive and output_writer.archive_format_of(args.archive) is None:
+        parser.error(f'--archive must end in one of: {", ".join(output_writer.archive_formats)}')
+
+    try:
+        old = Snapshot.load(args.old)
+        new = Snapshot.load(args.new)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    tracer = instrumentation.start_run('snapshot_diff', args)
+    try:
+        with tracer.stage('diff_records'):
+            old_records, new_records = old.records(), new.records()
+            record_diffs = diff_records(old_records, new_records)
+
+        with tracer.stage('load_catalogs'):
+            old_catalog, old_registry = old.load_catalog()
+            new_catalog, new_registry = new.load_catalog()
+
+        with tracer.stage('affected_pages'):
+            page_diff = PageDiff(old_catalog, new_catalog)
+        with tracer.stage('compare_renders'):
+            page_diff.compare_renders(old_catalog, old_registry, new_catalog, new_registry, tracer)
+        log.info(f'{len(page_diff.changed_inputs)} changed inputs affect {len(page_diff.to_render()) + len(page_diff.removed)} pages. '
+                 f'Rendering them ruled out {page_diff.unchanged} more pages that depend on the changed records.')
+        log.flush()
+
+        print_report(record_diffs, page_diff, old_records, new_records)
+
+        if args.json:
+            output.write(args.json, json.dumps(report_json(old, new, record_diffs, page_diff), indent=4, ensure_ascii=False), pages=0)
+
+        if args.render:
+            if args.archive:
+                output.open_archive(args.archive)
+            # the report has already listed every page, so the render's progress messages would only repeat it
+            with log.muted():
+                render_pages(page_diff.to_render(), new_catalog, new_registry, tracer, jobs=args.jobs)
+    finally:
+        output.close()
+        instrumentation.finish_run(tracer, args)
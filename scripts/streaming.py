@@ -0,0 +1,259 @@
+# Bounded-memory building blocks for the streaming build: an incremental JSON array reader and on-disk indexes
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+whitespace = ' \t\n\r'
+number_characters = '0123456789.eE+-'
+
+
+class JsonReader:
+    """A class to read JSON values one at a time from a file, holding only a small window of it in memory.
+
+    Values are decoded with the standard library's decoder as soon as the whole
+    value is in the buffer, and the buffer is refilled a chunk at a time.
+
+    Attributes
+        file : file
+            The open text file to read from.
+        chunk_size : int
+            The number of characters read at a time.
+    """
+    def __init__(self, file, chunk_size=64 * 1024):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def _fill(self):
+        """Read another chunk into the buffer, dropping what has been consumed. Returns False at the end of the file."""
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        """Get the next character that isn't whitespace without consuming it, or '' at the end of the file."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in whitespace:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                return ''
+
+    def expect(self, characters):
+        """Consume the next character that isn't whitespace, which must be one of the given characters."""
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f'Expected one of {characters!r} but found {character!r} in {self.file.name}')
+        self.position += 1
+        return character
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+
+            # a number cut off by the end of the buffer can still decode, e.g. '2.' as 2,
+            # so make sure the next character can't carry it on
+            if end == len(self.buffer) or (isinstance(value, (int, float)) and self.buffer[end] in number_characters):
+                if self._fill():
+                    continue
+
+            self.position = end
+            return value
+
+    def array(self):
+        """Yield each element of the next JSON array."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+    def find(self, key):
+        """Move into the next JSON object, up to the value of the given key."""
+        self.expect('{')
+        if self.peek() == '}':
+            raise KeyError(key)
+
+        while True:
+            name = self.value()
+            self.expect(':')
+            if name == key:
+                return
+
+            self.skip()
+            if self.expect(',}') == '}':
+                raise KeyError(key)
+
+    def skip(self):
+        """Skip the next JSON value, reading arrays an element at a time so large ones are never held whole."""
+        if self.peek() == '[':
+            for _ in self.array():
+                pass
+        else:
+            self.value()
+
+
+def iter_json_array(path, key=None, chunk_size=64 * 1024):
+    """Yield the elements of a JSON array in a file one at a time.
+
+    Args:
+        path (str): The path of the JSON file.
+        key (str or tuple): The key of the array in the file's top level object, such as 'items',
+            or a tuple of keys for an array in nested objects, such as ('marketplace', 'items').
+            The file itself must be an array if None.
+        chunk_size (int): The number of characters read at a time.
+    """
+    keys = () if key is None else (key,) if isinstance(key, str) else tuple(key)
+
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = JsonReader(f, chunk_size)
+        for name in keys:
+            reader.find(name)
+        yield from reader.array()
+
+
+class SpillStore:
+    """A class to hold the on-disk indexes of a streaming build in a temporary SQLite database.
+
+    Attributes
+        path : str
+            The path of the database file.
+        batch_size : int
+            The number of rows buffered by each index before they are written.
+    """
+    def __init__(self, path=None, batch_size=10000):
+        self.directory = None
+        if path is None:
+            self.directory = tempfile.mkdtemp(prefix='moonbounce-spill-')
+            path = os.path.join(self.directory, 'spill.sqlite')
+
+        self.path = path
+        self.batch_size = batch_size
+        self.indexes = {}
+
+        self.connection = sqlite3.connect(path)
+        # the database is thrown away after the build, so there's nothing to recover after a crash
+        self.connection.execute('PRAGMA journal_mode = OFF')
+        self.connection.execute('PRAGMA synchronous = OFF')
+
+    def index(self, name):
+        """Get the index with the given name, creating it if it doesn't exist."""
+        if name not in self.indexes:
+            self.indexes[name] = SpillIndex(self, name)
+        return self.indexes[name]
+
+    def flush(self):
+        """Write every index's buffered rows."""
+        for index in self.indexes.values():
+            index.flush()
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __str__(self):
+        return f'{len(self.indexes)} indexes in {self.path}'
+
+
+class SpillIndex:
+    """A class to map keys to lists of JSON values in a table of a SpillStore.
+
+    The values for a key come back sorted by the order given when they were added,
+    then in the order they were added.
+
+    Attributes
+        name : str
+            The name of the index, which is also the name of its table.
+    """
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.pending = []
+
+        connection = store.connection
+        connection.execute(f'CREATE TABLE IF NOT EXISTS "{name}" (key TEXT, sort1, sort2, value TEXT)')
+        connection.execute(f'CREATE INDEX IF NOT EXISTS "{name}_key" ON "{name}" (key, sort1, sort2)')
+
+    def add(self, key, value, order=()):
+        """Add a value under a key.
+
+        Args:
+            key (str): The key to add the value under.
+            value: Any JSON-serialisable value.
+            order (tuple): Up to two values to sort the key's values by.
+        """
+        sort1, sort2 = (tuple(order) + (None, None))[:2]
+        self.pending.append((key, sort1, sort2, json.dumps(value, ensure_ascii=False)))
+        if len(self.pending) >= self.store.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows to the database."""
+        if self.pending:
+            self.store.connection.executemany(f'INSERT INTO "{self.name}" VALUES (?, ?, ?, ?)', self.pending)
+            self.pending = []
+
+    def values(self, key):
+        """Yield the values under a key, reading them from the database as they are needed."""
+        self.flush()
+        cursor = self.store.connection.execute(
+            f'SELECT value FROM "{self.name}" WHERE key = ? ORDER BY sort1, sort2, rowid', (key,))
+        for (value,) in cursor:
+            yield json.loads(value)
+
+    def get(self, key):
+        """Get a list of the values under a key."""
+        return list(self.values(key))
+
+    def first(self, key):
+        """Get the first value added under a key, or None if there isn't one."""
+        self.flush()
+        row = self.store.connection.execute(
+            f'SELECT value FROM "{self.name}" WHERE key = ? ORDER BY rowid LIMIT 1', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def keys(self):
+        """Yield every key in sorted order."""
+        self.flush()
+        for (key,) in self.store.connection.execute(f'SELECT DISTINCT key FROM "{self.name}" ORDER BY key'):
+            yield key
+
+    def __contains__(self, key):
+        self.flush()
+        return self.store.connection.execute(
+            f'SELECT 1 FROM "{self.name}" WHERE key = ? LIMIT 1', (key,)).fetchone() is not None
+
+    def __str__(self):
+        return f'Spill index {self.name}'
@@ -0,0 +1,176 @@
+# A small compiled template engine shared by generateWikiArticleTemplate.py and quests.py
+
+import collections
+import re
+
+from instrumentation import counters
+
+# placeholders are upper case names wrapped in angle brackets, e.g. <NAME> or <INGREDIENT1>
+placeholder_pattern = re.compile(r'<([A-Z][A-Z0-9_]*)>')
+blank_lines_pattern = re.compile(r'\n{3,}')
+
+# the most newlines allowed in a row when collapsing blank lines
+max_newlines = 2
+
+_missing = object()
+
+
+class Template:
+    """A template parsed once into literal segments and placeholder names.
+
+    Rendering is a single join over a dict of values. Values are inserted as-is,
+    so backslashes and other regex characters in the data are never mangled.
+    Placeholders with no value are left in the output untouched.
+
+    Attributes
+        text : str
+            The original template text.
+        collapse_blank_lines : bool
+            Whether runs of blank lines are collapsed to a single blank line while rendering.
+        literals : list
+            The literal text around the placeholders, one more than there are keys.
+        keys : list
+            The placeholder names in the order they appear.
+    """
+    def __init__(self, text, collapse_blank_lines=False):
+        self.text = text
+        self.collapse_blank_lines = collapse_blank_lines
+
+        self.literals = []
+        self.keys = []
+        position = 0
+        for match in placeholder_pattern.finditer(text):
+            self.literals.append(text[position:match.start()])
+            self.keys.append(match.group(1))
+            position = match.end()
+        self.literals.append(text[position:])
+
+        # the literals never change, so collapse them once up front
+        if collapse_blank_lines:
+            self.literals = [blank_lines_pattern.sub('\n' * max_newlines, literal) for literal in self.literals]
+
+    def render(self, values=None, **kwargs):
+        """Render the template with the given values.
+
+        Args:
+            values (dict): The values to insert, keyed by placeholder name.
+            **kwargs: More values, for convenience when there are only a few.
+        """
+        if values is None:
+            values = kwargs
+        elif kwargs:
+            values = {**values, **kwargs}
+
+        counters['template_substitutions'] += len(self.keys)
+
+        if self.collapse_blank_lines:
+            return self._render_collapsed(values)
+
+        literals = self.literals
+        parts = [literals[0]]
+        for index, key in enumerate(self.keys):
+            value = values.get(key, _missing)
+            if value is _missing:
+                parts.append(f'<{key}>')
+            else:
+                parts.append(value if isinstance(value, str) else str(value))
+            parts.append(literals[index + 1])
+
+        return ''.join(parts)
+
+    def _render_collapsed(self, values):
+        """Render the template while collapsing blank lines in the same pass.
+
+        The result is the same as rendering and then replacing every run of three
+        or more newlines with two, but the page is only walked once.
+        """
+        literals = self.literals
+        parts = []
+        trailing = 0    # the number of newlines at the end of the output so far
+
+        for index in range(len(literals) + len(self.keys)):
+            if index % 2 == 0:
+                piece = literals[index // 2]
+            else:
+                key = self.keys[index // 2]
+                piece = values.get(key, _missing)
+                if piece is _missing:
+                    piece = f'<{key}>'
+                elif not isinstance(piece, str):
+                    piece = str(piece)
+                if '\n\n\n' in piece:
+                    piece = blank_lines_pattern.sub('\n' * max_newlines, piece)
+
+            if not piece:
+                continue
+
+            # trim leading newlines that would join a run already at the end of the output
+            if piece[0] == '\n':
+                body = piece.lstrip('\n')
+                leading = len(piece) - len(body)
+                allowed = max_newlines - trailing
+                if not body:
+                    if allowed > 0:
+                        kept = min(leading, allowed)
+                        parts.append('\n' * kept)
+                        trailing += kept
+                    continue
+                if leading > allowed:
+                    piece = piece[leading - allowed:]
+
+            parts.append(piece)
+            trailing = len(piece) - len(piece.rstrip('\n'))
+
+        return ''.join(parts)
+
+    def __str__(self):
+        return self.text
+
+
+class FragmentCache:
+    """A class to keep the most recently rendered fragments, so a fragment shown on many pages is only rendered once.
+
+    Fragments are keyed by their template and a key standing for the values they're
+    rendered with, e.g. (name, rarity) for an item's rarity card. When the cache is full,
+    the fragment used longest ago is dropped to make room.
+
+    Attributes
+        max_size : int
+            The most fragments kept.
+        fragments : OrderedDict
+            The rendered fragments keyed by (template, key), the most recently used last.
+    """
+    def __init__(self, max_size=8192):
+        self.max_size = max_size
+        self.fragments = collections.OrderedDict()
+
+    def render(self, template, key, values):
+        """Get a rendered fragment from the cache, rendering it if it isn't there.
+
+        Args:
+            template (Template): The template of the fragment.
+            key (tuple): Identifies the values, so the same key must always come with the same values.
+            values (dict): The values to render the template with.
+        """
+        cache_key = (template, key)
+        fragment = self.fragments.get(cache_key)
+        if fragment is not None:
+            counters['fragment_hits'] += 1
+            self.fragments.move_to_end(cache_key)
+            return fragment
+
+        counters['fragment_misses'] += 1
+        fragment = self.fragments[cache_key] = template.render(values)
+        if len(self.fragments) > self.max_size:
+            self.fragments.popitem(last=False)
+            counters['fragment_evictions'] += 1
+        return fragment
+
+    def clear(self):
+        self.fragments.clear()
+
+    def __len__(self):
+        return len(self.fragments)
+
+    def __str__(self):
+        return f'{len(self.fragments)} of {self.max_size} fragments cached'
@@ -0,0 +1,74 @@
+# Collects the broken references found in the data files, so every problem is reported at once before rendering starts
+
+from instrumentation import log
+
+
+class ValidationError(Exception):
+    """Raised when the data files have problems the build can't render around."""
+
+
+class ValidationReport:
+    """A class to collect the problems found while checking the data files.
+
+    Errors are problems the build can't render around, such as two pages written to
+    the same file or a rarity the pages can't be sorted by. Warnings are references
+    the pages will show as dead links or leave out, such as a recipe ingredient that
+    isn't an item.
+
+    Attributes
+        errors : list
+            The messages of the problems that stop the build.
+        warnings : list
+            The messages of the problems the build renders around.
+    """
+    def __init__(self):
+        self.errors = []
+        self.warnings = []
+
+    def error(self, message):
+        self.errors.append(message)
+
+    def warning(self, message):
+        self.warnings.append(message)
+
+    def check_names(self, names, index, describe):
+        """Warn about every name that isn't a key of the index.
+
+        Args:
+            names (iterable): The names referred to.
+            index (dict or set): The names that exist.
+            describe (callable): Makes the warning for a missing name.
+        """
+        for name in names:
+            if name not in index:
+                self.warning(describe(name))
+
+    def check_collisions(self, names, key, describe):
+        """Report an error for every group of different names that share a key, such as a page's file name.
+
+        Args:
+            names (iterable): The names to check, repeats allowed.
+            key (callable): Gets the key of a name.
+            describe (callable): Makes the error for a key and the sorted names sharing it.
+        """
+        by_key = {}
+        for name in names:
+            by_key.setdefault(key(name), set()).add(name)
+        for shared_key, shared_names in by_key.items():
+            if len(shared_names) > 1:
+                self.error(describe(shared_key, sorted(shared_names)))
+
+    def raise_for_errors(self):
+        """Log every problem found, then raise a ValidationError if any of them are errors."""
+        for message in self.warnings:
+            log.warning(f'Warning: {message}')
+        for message in self.errors:
+            log.error(f'Error: {message}')
+        if self.errors:
+            raise ValidationError(f'The data files have {len(self.errors)} errors and {len(self.warnings)} warnings, listed above.')
+
+    def __bool__(self):
+        return bool(self.errors or self.warnings)
+
+    def __str__(self):
+        return f'{len(self.errors)} errors and {len(self.warnings)} warnings'
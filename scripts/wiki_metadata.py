@@ -0,0 +1,89 @@
+# The hand-written wiki data (trivia, promos, categories, galleries) from data/wiki_data.json, parsed once and looked up by name
+
+import json
+import os
+import unicodedata
+
+from instrumentation import counters
+
+# paths are relative to the repo, so the scripts can be run from any folder
+repo_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+default_path = os.path.join(repo_dir, 'data', 'wiki_data.json')
+
+# the stores loaded so far, keyed by absolute path
+_loaded = {}
+
+
+def normalize_name(name):
+    """Normalize a name for matching, so the same name typed with stray spaces or composed differently still matches."""
+    if not isinstance(name, str):
+        return name
+    return unicodedata.normalize('NFC', name).strip()
+
+
+class WikiMetadata:
+    """A class to hold the entries of wiki_data.json keyed by normalized name.
+
+    Load it with WikiMetadata.load() to share one parsed copy of the file between
+    everything in the process that needs it.
+
+    Attributes
+        path : str
+            The file the entries were loaded from, or None if they were given directly.
+        items : dict
+            The wiki data for each item, keeping the first entry for each name.
+        sources : dict
+            The wiki data for each source, keeping the first entry for each name.
+        quests : dict
+            The wiki data for each quest, keeping the first entry for each name.
+    """
+    def __init__(self, wiki_data, path=None):
+        self.path = path
+        self.items = self._index(wiki_data.get('items', []))
+        self.sources = self._index(wiki_data.get('sources', []))
+        self.quests = self._index(wiki_data.get('quests', []))
+
+    @classmethod
+    def load(cls, path=None):
+        """Load the store for a file, reusing the one already loaded unless the file has changed since.
+
+        Args:
+            path (str): The path of the wiki data file. Defaults to data/wiki_data.json in the repo.
+        """
+        path = os.path.abspath(path or default_path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        loaded = _loaded.get(path)
+        if loaded is not None and loaded[0] == version:
+            return loaded[1]
+
+        with open(path, 'r', encoding='utf-8') as f:
+            metadata = cls(json.load(f), path)
+        _loaded[path] = (version, metadata)
+        return metadata
+
+    @staticmethod
+    def _index(entries):
+        index = {}
+        for entry in entries:
+            index.setdefault(normalize_name(entry['name']), entry)
+        return index
+
+    def item(self, name):
+        """Get the wiki data for the named item, or None if there isn't any."""
+        counters['index_hits'] += 1
+        return self.items.get(normalize_name(name))
+
+    def source(self, name):
+        """Get the wiki data for the named source, or None if there isn't any."""
+        counters['index_hits'] += 1
+        return self.sources.get(normalize_name(name))
+
+    def quest(self, name):
+        """Get the wiki data for the named quest, or None if there isn't any."""
+        counters['index_hits'] += 1
+        return self.quests.get(normalize_name(name))
+
+    def __str__(self):
+        return f'Wiki data for {len(self.items)} items, {len(self.sources)} sources and {len(self.quests)} quests'